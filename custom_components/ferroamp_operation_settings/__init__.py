@@ -7,24 +7,33 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import MAJOR_VERSION, MINOR_VERSION
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.device_registry import async_get as async_device_registry_get
-from homeassistant.helpers.device_registry import DeviceRegistry, DeviceEntry
-from homeassistant.helpers.entity_registry import async_get as async_entity_registry_get
-from homeassistant.helpers.entity_registry import (
-    EntityRegistry,
-    async_entries_for_config_entry,
-)
+from homeassistant.helpers.storage import Store
 
 from custom_components.ferroamp_operation_settings.helpers.api import FerroampApiClient
-from custom_components.ferroamp_operation_settings.helpers.general import get_parameter
+from custom_components.ferroamp_operation_settings.helpers.config_flow import (
+    ValidatedClientCache,
+)
+from custom_components.ferroamp_operation_settings.helpers.general import (
+    get_domain_data,
+    get_parameter,
+)
+from custom_components.ferroamp_operation_settings.helpers.rate_limiter import (
+    RateLimiter,
+)
+from custom_components.ferroamp_operation_settings.helpers.request_scheduler import (
+    RequestScheduler,
+)
 
 from .coordinator import FerroampOperationSettingsCoordinator
+from .services import async_setup_services
 from .const import (
     CONF_LOGIN_EMAIL,
     CONF_LOGIN_PASSWORD,
     CONF_SYSTEM_ID,
     DOMAIN,
     STARTUP_MESSAGE,
+    STORAGE_KEY,
+    STORAGE_VERSION,
     PLATFORMS,
 )
 
@@ -42,9 +51,25 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     system_id = get_parameter(entry, CONF_SYSTEM_ID)
     email = get_parameter(entry, CONF_LOGIN_EMAIL)
     password = get_parameter(entry, CONF_LOGIN_PASSWORD)
-    client = FerroampApiClient(system_id, email, password, session)
+    # Reuse the client, if the login information was just validated in a flow.
+    client = ValidatedClientCache.pop(hass, system_id, email, password)
+    if client is None:
+        client = FerroampApiClient(system_id, email, password, session)
+    # Requests of the same account share one scheduler and rate limiter.
+    client.scheduler = get_domain_data(hass, "request_schedulers").setdefault(
+        email, RequestScheduler()
+    )
+    client.rate_limiter = get_domain_data(hass, "rate_limiters").setdefault(
+        email, RateLimiter()
+    )
     coordinator = FerroampOperationSettingsCoordinator(hass, entry, client)
-    await coordinator.async_config_entry_first_refresh()
+    validated = client.data is not None
+    if validated:
+        await coordinator.async_seed_data(client.data)
+    else:
+        # Do not wait for the Ferroamp cloud. Start with the last fetched
+        # configuration and fetch the current one in the background.
+        await coordinator.async_restore_data()
     hass.data[DOMAIN][entry.entry_id] = coordinator
 
     for platform in PLATFORMS:
@@ -59,25 +84,20 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
 
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
+    if not validated:
+        coordinator.refresh_task = hass.async_create_task(
+            coordinator.async_background_refresh()
+        )
+
     # If the name of the integration (config_entry.title) has changed,
     # update the device name.
-    entity_registry: EntityRegistry = async_entity_registry_get(hass)
-    all_entities = async_entries_for_config_entry(entity_registry, entry.entry_id)
-    if all_entities:
-        device_id = all_entities[0].device_id
-        device_registry: DeviceRegistry = async_device_registry_get(hass)
-        device: DeviceEntry = device_registry.async_get(device_id)
-        if device:
-            if device.name_by_user is not None:
-                if entry.title != device.name_by_user:
-                    device_registry.async_update_device(
-                        device.id, name_by_user=entry.title
-                    )
-            else:
-                if entry.title != device.name:
-                    device_registry.async_update_device(
-                        device.id, name_by_user=entry.title
-                    )
+    coordinator.update_device_name()
+    coordinator.apply_reconcile_interval()
+    coordinator.apply_solar_planner()
+    await coordinator.async_apply_peak_tracker()
+    coordinator.apply_reference_controller()
+    await coordinator.async_restore_schedule()
+    await async_setup_services(hass)
 
     return True
 
@@ -98,13 +118,54 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if unloaded:
         for unsub in coordinator.listeners:
             unsub()
+        if coordinator.reconciler is not None:
+            coordinator.reconciler.stop()
+        coordinator.stop_schedule()
+        coordinator.stop_plan()
+        coordinator.stop_solar_planner()
+        coordinator.stop_peak_tracker()
+        coordinator.stop_reference_controller()
+        for task in (coordinator.refresh_task, coordinator.confirm_task):
+            if task is not None and not task.done():
+                task.cancel()
+        await coordinator.async_save_data()
         hass.data[DOMAIN].pop(entry.entry_id)
 
     return unloaded
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored configuration, schedule and peaks when an entry is removed."""
+    for key in (
+        f"{STORAGE_KEY}.{entry.entry_id}",
+        f"{STORAGE_KEY}.{entry.entry_id}.schedule",
+        f"{STORAGE_KEY}.{entry.entry_id}.peaks",
+    ):
+        await Store(hass, STORAGE_VERSION, key).async_remove()
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload config entry."""
+    coordinator: FerroampOperationSettingsCoordinator = hass.data.get(DOMAIN, {}).get(
+        entry.entry_id
+    )
+    if coordinator is not None and coordinator.api.has_credentials(
+        get_parameter(entry, CONF_SYSTEM_ID),
+        get_parameter(entry, CONF_LOGIN_EMAIL),
+        get_parameter(entry, CONF_LOGIN_PASSWORD),
+    ):
+        # The client, its tokens and the entities can be kept.
+        _LOGGER.debug("async_reload_entry() applies changes without reload")
+        # A client that was validated with the same login information is not used.
+        ValidatedClientCache.pop(
+            hass,
+            get_parameter(entry, CONF_SYSTEM_ID),
+            get_parameter(entry, CONF_LOGIN_EMAIL),
+            get_parameter(entry, CONF_LOGIN_PASSWORD),
+        )
+        await coordinator.async_apply_options()
+        return
+
     await async_unload_entry(hass, entry)
     await async_setup_entry(hass, entry)
 
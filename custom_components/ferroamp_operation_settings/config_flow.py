@@ -1,17 +1,55 @@
 """Adds config flow for Ferroamp Operation Settings."""
+
+from collections.abc import Mapping
 import logging
+from typing import Any
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.config_entries import ConfigEntryState
 from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers import selector
 
 from .const import (
+    CONF_AUTH_RATE_LIMIT,
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_POWER,
+    CONF_CONFIRM_WRITES,
+    CONF_CONFLICT_MODE,
+    CONF_CONTROLLER_DEADBAND,
+    CONF_CONTROLLER_HYSTERESIS,
+    CONF_CONTROLLER_MIN_INTERVAL,
+    CONF_CONTROLLER_SENSOR,
+    CONF_CONTROLLER_SETPOINT,
     CONF_DEVICE_NAME,
+    CONF_GRID_POWER_SENSOR,
+    CONF_LOAD_SENSOR,
     CONF_LOGIN_EMAIL,
     CONF_LOGIN_PASSWORD,
+    CONF_PEAK_COUNT,
+    CONF_PRICE_SENSOR,
+    CONF_PV_FORECAST_SENSOR,
+    CONF_READ_RATE_LIMIT,
+    CONF_RECONCILE_INTERVAL,
+    CONF_SOC_RESERVE,
+    CONF_SOC_SENSOR,
     CONF_SYSTEM_ID,
+    CONF_WRITE_RATE_LIMIT,
+    CONFLICT_MODES,
+    DEFAULT_AUTH_RATE_LIMIT,
+    DEFAULT_CONFIRM_WRITES,
+    DEFAULT_CONFLICT_MODE,
+    DEFAULT_CONTROLLER_DEADBAND,
+    DEFAULT_CONTROLLER_HYSTERESIS,
+    DEFAULT_CONTROLLER_MIN_INTERVAL,
+    DEFAULT_CONTROLLER_SETPOINT,
+    DEFAULT_PEAK_COUNT,
+    DEFAULT_READ_RATE_LIMIT,
+    DEFAULT_RECONCILE_INTERVAL,
+    DEFAULT_SOC_RESERVE,
+    DEFAULT_WRITE_RATE_LIMIT,
     DOMAIN,
 )
 from .helpers.config_flow import DeviceNameCreator, FlowValidator
@@ -30,6 +68,7 @@ class FerroampOperationSettingsConfigFlow(config_entries.ConfigFlow, domain=DOMA
         _LOGGER.debug("FerroampOperationSettingsConfigFlow.__init__")
         self._errors = {}
         self.user_input = {}
+        self._reauth_entry: config_entries.ConfigEntry | None = None
 
     @staticmethod
     @callback
@@ -57,7 +96,9 @@ class FerroampOperationSettingsConfigFlow(config_entries.ConfigFlow, domain=DOMA
 
         else:
             # process user_input
-            error = await FlowValidator.validate_step_user(self.hass, user_input)
+            error = await FlowValidator.validate_step_user(
+                self.hass, user_input, self.flow_id
+            )
             if error is not None:
                 self._errors[error[0]] = error[1]
 
@@ -69,6 +110,60 @@ class FerroampOperationSettingsConfigFlow(config_entries.ConfigFlow, domain=DOMA
 
         return await self._show_config_form_user(user_input)
 
+    async def async_step_reauth(self, entry_data: Mapping[str, Any]) -> FlowResult:
+        """Handle a failed login with stored credentials."""
+        _LOGGER.debug("FerroampOperationSettingsConfigFlow.async_step_reauth")
+        self._reauth_entry = self.hass.config_entries.async_get_entry(
+            self.context["entry_id"]
+        )
+        return await self.async_step_reauth_confirm()
+
+    async def async_step_reauth_confirm(self, user_input=None) -> FlowResult:
+        """Ask for new login information."""
+        self._errors = {}
+        entry = self._reauth_entry
+
+        if user_input is not None:
+            # process user_input
+            credentials = {CONF_SYSTEM_ID: get_parameter(entry, CONF_SYSTEM_ID)}
+            credentials.update(user_input)
+            error = await FlowValidator.validate_step_user(
+                self.hass, credentials, self.flow_id
+            )
+            if error is not None:
+                self._errors[error[0]] = error[1]
+
+            if not self._errors:
+                # Options override data, so update the credentials where they are.
+                data = {**entry.data, **user_input}
+                options = {**entry.options}
+                for key, value in user_input.items():
+                    if key in options:
+                        options[key] = value
+                changed = self.hass.config_entries.async_update_entry(
+                    entry, data=data, options=options
+                )
+                # A changed and loaded entry is reloaded by its update listener.
+                if not changed or entry.state is not ConfigEntryState.LOADED:
+                    await self.hass.config_entries.async_reload(entry.entry_id)
+                return self.async_abort(reason="reauth_successful")
+
+        user_schema = {
+            vol.Required(
+                CONF_LOGIN_EMAIL,
+                default=get_parameter(entry, CONF_LOGIN_EMAIL),
+            ): cv.string,
+            vol.Required(CONF_LOGIN_PASSWORD): cv.string,
+        }
+
+        return self.async_show_form(
+            step_id="reauth_confirm",
+            data_schema=vol.Schema(user_schema),
+            errors=self._errors,
+            description_placeholders={"name": entry.title},
+            last_step=True,
+        )
+
     async def _show_config_form_user(self, user_input):
         """Show the configuration form."""
 
@@ -110,9 +205,16 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
         if user_input is not None:
             # process user_input
-            error = await FlowValidator.validate_step_user(self.hass, user_input)
-            if error is not None:
-                self._errors[error[0]] = error[1]
+            if any(
+                user_input.get(key) != get_parameter(self.config_entry, key)
+                for key in (CONF_SYSTEM_ID, CONF_LOGIN_EMAIL, CONF_LOGIN_PASSWORD)
+            ):
+                # Only new login information needs a login.
+                error = await FlowValidator.validate_step_user(
+                    self.hass, user_input, self.flow_id
+                )
+                if error is not None:
+                    self._errors[error[0]] = error[1]
 
             if not self._errors:
                 return self.async_create_entry(
@@ -132,6 +234,180 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 CONF_LOGIN_PASSWORD,
                 default=get_parameter(self.config_entry, CONF_LOGIN_PASSWORD),
             ): cv.string,
+            vol.Optional(
+                CONF_AUTH_RATE_LIMIT,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry,
+                        CONF_AUTH_RATE_LIMIT,
+                        DEFAULT_AUTH_RATE_LIMIT,
+                    )
+                },
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=60)),
+            vol.Optional(
+                CONF_READ_RATE_LIMIT,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry,
+                        CONF_READ_RATE_LIMIT,
+                        DEFAULT_READ_RATE_LIMIT,
+                    )
+                },
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=600)),
+            vol.Optional(
+                CONF_WRITE_RATE_LIMIT,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry,
+                        CONF_WRITE_RATE_LIMIT,
+                        DEFAULT_WRITE_RATE_LIMIT,
+                    )
+                },
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=60)),
+            vol.Optional(
+                CONF_CONFIRM_WRITES,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_CONFIRM_WRITES, DEFAULT_CONFIRM_WRITES
+                    )
+                },
+            ): cv.boolean,
+            vol.Optional(
+                CONF_CONFLICT_MODE,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_CONFLICT_MODE, DEFAULT_CONFLICT_MODE
+                    )
+                },
+            ): vol.In(CONFLICT_MODES),
+            vol.Optional(
+                CONF_RECONCILE_INTERVAL,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry,
+                        CONF_RECONCILE_INTERVAL,
+                        DEFAULT_RECONCILE_INTERVAL,
+                    )
+                },
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=1440)),
+            vol.Optional(
+                CONF_PRICE_SENSOR,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_PRICE_SENSOR
+                    )
+                },
+            ): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+            vol.Optional(
+                CONF_SOC_SENSOR,
+                description={
+                    "suggested_value": get_parameter(self.config_entry, CONF_SOC_SENSOR)
+                },
+            ): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+            vol.Optional(
+                CONF_BATTERY_CAPACITY,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_BATTERY_CAPACITY
+                    )
+                },
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+            vol.Optional(
+                CONF_BATTERY_POWER,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_BATTERY_POWER
+                    )
+                },
+            ): vol.All(vol.Coerce(float), vol.Range(min=1)),
+            vol.Optional(
+                CONF_PV_FORECAST_SENSOR,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_PV_FORECAST_SENSOR
+                    )
+                },
+            ): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+            vol.Optional(
+                CONF_LOAD_SENSOR,
+                description={
+                    "suggested_value": get_parameter(self.config_entry, CONF_LOAD_SENSOR)
+                },
+            ): selector.EntitySelector(
+                selector.EntitySelectorConfig(domain=["sensor", "input_number"])
+            ),
+            vol.Optional(
+                CONF_SOC_RESERVE,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_SOC_RESERVE, DEFAULT_SOC_RESERVE
+                    )
+                },
+            ): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+            vol.Optional(
+                CONF_GRID_POWER_SENSOR,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_GRID_POWER_SENSOR
+                    )
+                },
+            ): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+            vol.Optional(
+                CONF_PEAK_COUNT,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_PEAK_COUNT, DEFAULT_PEAK_COUNT
+                    )
+                },
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=24)),
+            vol.Optional(
+                CONF_CONTROLLER_SENSOR,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry, CONF_CONTROLLER_SENSOR
+                    )
+                },
+            ): selector.EntitySelector(selector.EntitySelectorConfig(domain="sensor")),
+            vol.Optional(
+                CONF_CONTROLLER_SETPOINT,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry,
+                        CONF_CONTROLLER_SETPOINT,
+                        DEFAULT_CONTROLLER_SETPOINT,
+                    )
+                },
+            ): vol.Coerce(float),
+            vol.Optional(
+                CONF_CONTROLLER_DEADBAND,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry,
+                        CONF_CONTROLLER_DEADBAND,
+                        DEFAULT_CONTROLLER_DEADBAND,
+                    )
+                },
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(
+                CONF_CONTROLLER_HYSTERESIS,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry,
+                        CONF_CONTROLLER_HYSTERESIS,
+                        DEFAULT_CONTROLLER_HYSTERESIS,
+                    )
+                },
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(
+                CONF_CONTROLLER_MIN_INTERVAL,
+                description={
+                    "suggested_value": get_parameter(
+                        self.config_entry,
+                        CONF_CONTROLLER_MIN_INTERVAL,
+                        DEFAULT_CONTROLLER_MIN_INTERVAL,
+                    )
+                },
+            ): vol.All(vol.Coerce(int), vol.Range(min=10, max=3600)),
         }
 
         return self.async_show_form(
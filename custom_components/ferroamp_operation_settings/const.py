@@ -61,15 +61,84 @@ BATTERY_POWER_MODES = [BATTERY_OFF, BATTERY_CHARGE, BATTERY_DISCHARGE]
 STATUS_READY = "Ready"
 STATUS_SUCCESS = "Success"
 STATUS_FAILED = "Failed"
+STATUS_ACCEPTED = "Accepted"
+STATUS_APPLIED = "Applied"
+STATUS_CONFLICT = "Conflict"
+
+CONFLICT_MODE_OFF = "off"
+CONFLICT_MODE_REPORT = "report"
+CONFLICT_MODE_MERGE = "merge"
+CONFLICT_MODES = [CONFLICT_MODE_OFF, CONFLICT_MODE_REPORT, CONFLICT_MODE_MERGE]
 
 # Configuration and options
 CONF_DEVICE_NAME = "device_name"
 CONF_SYSTEM_ID = "system_id"
 CONF_LOGIN_EMAIL = "login_email"
 CONF_LOGIN_PASSWORD = "login_password"
+CONF_AUTH_RATE_LIMIT = "auth_rate_limit"
+CONF_READ_RATE_LIMIT = "read_rate_limit"
+CONF_WRITE_RATE_LIMIT = "write_rate_limit"
+CONF_CONFIRM_WRITES = "confirm_writes"
+CONF_CONFLICT_MODE = "conflict_mode"
+CONF_RECONCILE_INTERVAL = "reconcile_interval"
+CONF_PRICE_SENSOR = "price_sensor"
+CONF_SOC_SENSOR = "soc_sensor"
+CONF_BATTERY_CAPACITY = "battery_capacity"
+CONF_BATTERY_POWER = "battery_power"
+CONF_PV_FORECAST_SENSOR = "pv_forecast_sensor"
+CONF_LOAD_SENSOR = "load_sensor"
+CONF_SOC_RESERVE = "soc_reserve"
+CONF_GRID_POWER_SENSOR = "grid_power_sensor"
+CONF_PEAK_COUNT = "peak_count"
+CONF_CONTROLLER_SENSOR = "controller_sensor"
+CONF_CONTROLLER_SETPOINT = "controller_setpoint"
+CONF_CONTROLLER_DEADBAND = "controller_deadband"
+CONF_CONTROLLER_HYSTERESIS = "controller_hysteresis"
+CONF_CONTROLLER_MIN_INTERVAL = "controller_min_interval"
 
 # Defaults
 DEFAULT_NAME = DOMAIN
+DEFAULT_AUTH_RATE_LIMIT = 12  # Logins per minute
+AUTH_RATE_BURST = 10
+DEFAULT_READ_RATE_LIMIT = 60  # Reads per minute
+READ_RATE_BURST = 5
+DEFAULT_WRITE_RATE_LIMIT = 6  # Updates per minute
+WRITE_RATE_BURST = 3
+DEFAULT_CONFIRM_WRITES = False
+DEFAULT_CONFLICT_MODE = CONFLICT_MODE_OFF
+DEFAULT_RECONCILE_INTERVAL = 0  # Minutes, 0 is off
+DEFAULT_SOC_RESERVE = 10  # %
+DEFAULT_PEAK_COUNT = 3
+DEFAULT_CONTROLLER_SETPOINT = 0  # W
+DEFAULT_CONTROLLER_DEADBAND = 200  # W
+DEFAULT_CONTROLLER_HYSTERESIS = 300  # W
+DEFAULT_CONTROLLER_MIN_INTERVAL = 60  # Seconds
+
+# Discharge Threshold set from the power peaks of the month
+PEAK_THRESHOLD_STEP = 100.0  # W
+PEAK_SAVE_DELAY = 60  # Seconds
+PEAK_MIN_INTERVAL = 300  # Seconds between changes of the Discharge Threshold
+SOLAR_RESTORE_MARGIN = 3600  # Seconds before sunrise that Upper Reference is restored
+
+# Peak Shaving thresholds optimized from the recorder history
+DEFAULT_OPTIMIZE_WEEKS = 4
+MIN_HISTORY_STEPS = 24 * 60  # A day of 1 minute steps
+
+# Read-back of an update until the Ferroamp system has applied it
+CONFIRM_INITIAL_DELAY = 2.0
+CONFIRM_MAX_DELAY = 30.0
+CONFIRM_TIMEOUT = 180.0
+
+# Seconds that a fetched configuration is reused instead of fetched again
+GET_DATA_MAX_AGE = 5.0
+
+# Seconds that a client validated in a config or options flow can be reused
+VALIDATED_CLIENT_MAX_AGE = 300
+
+# Storage of the last fetched configuration
+STORAGE_KEY = DOMAIN
+STORAGE_VERSION = 1
+DATA_SAVE_DELAY = 30  # Seconds
 
 STARTUP_MESSAGE = f"""
 -------------------------------------------------------------------
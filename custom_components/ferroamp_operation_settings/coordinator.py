@@ -1,9 +1,14 @@
 """Coordinator for Ferroamp Operation Settings"""
 
+import asyncio
 from datetime import datetime, timedelta
 import logging
+from time import monotonic
 from typing import Any
 from collections.abc import Callable, Coroutine
+
+import numpy as np
+
 from homeassistant.components.number import NumberEntity
 from homeassistant.components.select import SelectEntity
 from homeassistant.components.sensor import SensorEntity
@@ -12,36 +17,164 @@ from homeassistant.config_entries import (
     ConfigEntry,
 )
 from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback, Event, HassJob
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers.device_registry import EVENT_DEVICE_REGISTRY_UPDATED
 from homeassistant.helpers.device_registry import async_get as async_device_registry_get
-from homeassistant.helpers.device_registry import DeviceRegistry
-from homeassistant.helpers.entity_registry import async_get as async_entity_registry_get
-from homeassistant.helpers.entity_registry import (
-    EntityRegistry,
-    async_entries_for_config_entry,
-)
+from homeassistant.helpers.device_registry import DeviceRegistry, DeviceEntry
+from homeassistant.const import SUN_EVENT_SUNRISE, SUN_EVENT_SUNSET
 from homeassistant.helpers.event import (
     async_call_later,
+    async_track_point_in_time,
+    async_track_state_change_event,
 )
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.sun import get_astral_event_next
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
 
 
 from custom_components.ferroamp_operation_settings.const import (
     BATTERY_CHARGE,
     BATTERY_DISCHARGE,
     BATTERY_OFF,
+    AUTH_RATE_BURST,
+    CONF_AUTH_RATE_LIMIT,
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_POWER,
+    CONF_CONFIRM_WRITES,
+    CONF_CONFLICT_MODE,
+    CONF_CONTROLLER_DEADBAND,
+    CONF_CONTROLLER_HYSTERESIS,
+    CONF_CONTROLLER_MIN_INTERVAL,
+    CONF_CONTROLLER_SENSOR,
+    CONF_CONTROLLER_SETPOINT,
+    CONF_GRID_POWER_SENSOR,
+    CONF_LOGIN_EMAIL,
+    CONF_LOAD_SENSOR,
+    CONF_PEAK_COUNT,
+    CONF_PRICE_SENSOR,
+    CONF_PV_FORECAST_SENSOR,
+    CONF_READ_RATE_LIMIT,
+    CONF_RECONCILE_INTERVAL,
+    CONF_SOC_RESERVE,
+    CONF_SOC_SENSOR,
+    CONF_WRITE_RATE_LIMIT,
+    CONFIRM_INITIAL_DELAY,
+    CONFIRM_MAX_DELAY,
+    CONFIRM_TIMEOUT,
+    CONFLICT_MODE_OFF,
+    CONFLICT_MODE_REPORT,
+    DATA_SAVE_DELAY,
+    DEFAULT_AUTH_RATE_LIMIT,
+    DEFAULT_CONFIRM_WRITES,
+    DEFAULT_CONFLICT_MODE,
+    DEFAULT_CONTROLLER_DEADBAND,
+    DEFAULT_CONTROLLER_HYSTERESIS,
+    DEFAULT_CONTROLLER_MIN_INTERVAL,
+    DEFAULT_CONTROLLER_SETPOINT,
+    DEFAULT_OPTIMIZE_WEEKS,
+    DEFAULT_PEAK_COUNT,
+    DEFAULT_READ_RATE_LIMIT,
+    DEFAULT_RECONCILE_INTERVAL,
+    DEFAULT_SOC_RESERVE,
+    DEFAULT_WRITE_RATE_LIMIT,
     DOMAIN,
+    GET_DATA_MAX_AGE,
+    MIN_HISTORY_STEPS,
     MODE_DEFAULT,
     MODE_PEAK_SHAVING,
+    PEAK_MIN_INTERVAL,
+    PEAK_SAVE_DELAY,
+    SOLAR_RESTORE_MARGIN,
+    PEAK_THRESHOLD_STEP,
     MODE_SELF_CONSUMPTION,
+    READ_RATE_BURST,
+    STATUS_ACCEPTED,
+    STATUS_APPLIED,
+    STATUS_CONFLICT,
     STATUS_READY,
     STATUS_FAILED,
     STATUS_SUCCESS,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+    WRITE_RATE_BURST,
 )
 
 from custom_components.ferroamp_operation_settings.helpers.api import (
     FerroampApiClient,
 )
+from custom_components.ferroamp_operation_settings.helpers.ems_config import (
+    config_matches,
+    fingerprint,
+    get_config,
+    merge_payload,
+    merge_three_way,
+)
+from custom_components.ferroamp_operation_settings.helpers.general import (
+    get_domain_data,
+    get_parameter,
+    get_power,
+)
+from custom_components.ferroamp_operation_settings.helpers.history import (
+    async_read_power_history,
+)
+from custom_components.ferroamp_operation_settings.helpers.peak_tracker import (
+    PeakTracker,
+)
+from custom_components.ferroamp_operation_settings.helpers.poll_scheduler import (
+    PollScheduler,
+)
+from custom_components.ferroamp_operation_settings.helpers.price_planner import (
+    ACTIONS,
+    parse_prices,
+    plan_battery,
+    plan_profiles,
+    remaining,
+)
+from custom_components.ferroamp_operation_settings.helpers.profile import (
+    PROFILE_NUMBERS,
+    PROFILE_SELECTS,
+    PROFILE_SWITCHES,
+    profile_key,
+)
+from custom_components.ferroamp_operation_settings.helpers.reference_controller import (
+    ReferenceController,
+)
+from custom_components.ferroamp_operation_settings.helpers.reconciler import (
+    Reconciler,
+)
+from custom_components.ferroamp_operation_settings.helpers.rate_limiter import (
+    ENDPOINT_AUTH,
+    ENDPOINT_READ,
+    ENDPOINT_WRITE,
+)
+from custom_components.ferroamp_operation_settings.helpers.request_scheduler import (
+    PRIORITY_BACKGROUND,
+    SharedPriority,
+    request_priority,
+)
+from custom_components.ferroamp_operation_settings.helpers.schedule import (
+    SCHEDULE_SCHEMA,
+    PlanRunner,
+    ScheduleRunner,
+    compile_schedule,
+    serialize_schedule,
+)
+from custom_components.ferroamp_operation_settings.helpers.simulator import (
+    simulate_file,
+)
+from custom_components.ferroamp_operation_settings.helpers.solar_planner import (
+    SolarPlanner,
+    night_charge,
+    targets_profile,
+)
+from custom_components.ferroamp_operation_settings.helpers.threshold_optimizer import (
+    optimize_thresholds,
+)
+from custom_components.ferroamp_operation_settings.helpers.write_queue import (
+    WriteQueue,
+)
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -66,6 +199,51 @@ class FerroampOperationSettingsCoordinator(DataUpdateCoordinator):
         self.listeners = []
         self.platforms = []
         self.platforms_started = []
+        self.refresh_task = None
+        self.confirm_task: asyncio.Task | None = None
+        self.apply_latency: float | None = None
+        # Incremented each time self.data changes, also by an accepted update.
+        self.data_version = 0
+        self.conflicts = 0
+        self._optimistic_payload: dict | None = None
+        # The configuration that the entities are based on, and the fingerprints
+        # of the remote configurations that are not considered as conflicts.
+        self._base_config: dict | None = None
+        self._base_fingerprints: set[str] = set()
+        self.reconciler: Reconciler | None = None
+        self.schedule_runner: ScheduleRunner | None = None
+        self.plan_runner: PlanRunner | None = None
+        self.plan_cost: float | None = None
+        self.solar_planner = SolarPlanner()
+        self.solar_profile: dict | None = None
+        self.solar_task: asyncio.Task | None = None
+        self._solar_unsub: CALLBACK_TYPE | None = None
+        self._solar_timer_unsub: CALLBACK_TYPE | None = None
+        # The Upper Reference from before the night, restored before sunrise.
+        self._solar_restore: float | None = None
+        self.peak_tracker: PeakTracker | None = None
+        self.peak_task: asyncio.Task | None = None
+        self._peak_written: datetime | None = None
+        self._peak_unsub: CALLBACK_TYPE | None = None
+        self.reference_controller: ReferenceController | None = None
+        self.controller_task: asyncio.Task | None = None
+        self._controller_unsub: CALLBACK_TYPE | None = None
+        self._peak_store = Store(
+            hass, STORAGE_VERSION, f"{STORAGE_KEY}.{config_entry.entry_id}.peaks"
+        )
+        self._schedule_store = Store(
+            hass, STORAGE_VERSION, f"{STORAGE_KEY}.{config_entry.entry_id}.schedule"
+        )
+        self.device_id = None
+        self._last_fetch: float | None = None
+        self._fetch_task: asyncio.Task | None = None
+        self._fetch_priority = SharedPriority()
+        self._get_data_task: asyncio.Task | None = None
+        self._get_data_priority = SharedPriority()
+        self._store = Store(
+            hass, STORAGE_VERSION, f"{STORAGE_KEY}.{config_entry.entry_id}"
+        )
+        self._unsaved_data: dict | None = None
 
         self.number_ace_threshold: NumberEntity = None
         self.number_discharge_threshold: NumberEntity = None
@@ -87,46 +265,303 @@ class FerroampOperationSettingsCoordinator(DataUpdateCoordinator):
 
         self.sensor_status: SensorEntity = None
 
+        # Writes to the same system are serialized, also between config entries.
+        self.write_queue: WriteQueue = get_domain_data(hass, "write_queues").setdefault(
+            client.system_id, WriteQueue()
+        )
+        self.listeners.append(self.write_queue.add_listener(self.metrics_updated))
+        self.apply_rate_limit()
+
         # Listen for changes to the device.
         self.listeners.append(
-            hass.bus.async_listen(EVENT_DEVICE_REGISTRY_UPDATED, self.device_updated)
+            hass.bus.async_listen(
+                EVENT_DEVICE_REGISTRY_UPDATED,
+                self.device_updated,
+                event_filter=self.device_event_filter,
+            )
         )
 
     async def _async_update_data(self):
         """Update data via library."""
         try:
-            return await self.api.async_get_data()
+            data = await self.api.async_get_data()
         except Exception as exception:
             raise UpdateFailed() from exception
+        if self.api.auth_failure is not None:
+            # Raising ConfigEntryAuthFailed starts the reauth flow.
+            raise ConfigEntryAuthFailed(self.api.auth_failure)
+        if data is None:
+            # Keep the previous data
+            raise UpdateFailed("No data received")
+        self.check_conflict(data)
+        self.data_version += 1
+        self.save_data(data)
+        return data
+
+    async def async_restore_data(self) -> bool:
+        """Restore the last fetched configuration from storage."""
+        stored = await self._store.async_load()
+        if stored is None:
+            return False
+        self.data = stored
+        _LOGGER.debug("async_restore_data() restored stored configuration")
+        return True
+
+    async def async_seed_data(self, data: dict):
+        """Use a configuration that was fetched when the login was validated."""
+        self.data_version += 1
+        self.async_set_updated_data(data)
+        self.save_data(data)
+
+    @callback
+    def save_data(self, data: dict):
+        """Store a fetched configuration.
+
+        The write is delayed, so that frequent fetches, e.g. by the
+        reconciliation, only write the last configuration.
+        """
+        self._unsaved_data = data
+        self._store.async_delay_save(lambda: data, DATA_SAVE_DELAY)
+
+    async def async_save_data(self):
+        """Write a configuration that waits for a delayed write."""
+        if self._unsaved_data is not None:
+            await self._store.async_save(self._unsaved_data)
+            self._unsaved_data = None
+
+    async def async_background_refresh(self):
+        """Fetch the configuration after setup and update entities with it."""
+        _LOGGER.debug("async_background_refresh() starts")
+        with request_priority(PRIORITY_BACKGROUND):
+            fetched = await self.async_fetch()
+        if fetched and all(item in self.platforms_started for item in self.platforms):
+            await self.update_entities()
+        _LOGGER.debug("async_background_refresh() ends")
 
     def unsubscribe_listeners(self):
         """Unsubscribed to listeners"""
         for unsub in self.listeners:
             unsub()
 
+    def get_metrics(self) -> dict[str, Any]:
+        """Get metrics of the communication with the Ferroamp system."""
+        return {
+            "write_queue_depth": self.write_queue.depth,
+            "writes_sent": self.write_queue.sent,
+            "writes_dropped": self.write_queue.dropped,
+            "requests_queued": self.api.scheduler.queued,
+            "requests_shed": self.api.scheduler.shed,
+            "requests_rate_limited": self.api.rate_limiter.limited,
+            "rate_limit_wait": round(self.api.rate_limiter.wait_time, 2),
+            "data_version": self.data_version,
+            "data_optimistic": self._optimistic_payload is not None,
+            "conflicts": self.conflicts,
+            "reconcile_drift": (
+                self.reconciler.drift if self.reconciler is not None else None
+            ),
+            "reconcile_failures": (
+                self.reconciler.failures if self.reconciler is not None else None
+            ),
+            "schedule_next_transition": (
+                self.schedule_runner.next_time.isoformat()
+                if self.schedule_runner is not None
+                and self.schedule_runner.next_time is not None
+                else None
+            ),
+            "plan_next_transition": (
+                self.plan_runner.next_time.isoformat()
+                if self.plan_runner is not None
+                and self.plan_runner.next_time is not None
+                else None
+            ),
+            "plan_cost": (
+                round(self.plan_cost, 2) if self.plan_cost is not None else None
+            ),
+            "solar_upper_reference": (
+                self.solar_profile["upper_reference"]
+                if self.solar_profile is not None
+                else None
+            ),
+            "solar_night_charge": (
+                night_charge(
+                    self.solar_planner.targets,
+                    get_parameter(self.config_entry, CONF_BATTERY_CAPACITY),
+                    self.get_float_state(
+                        get_parameter(self.config_entry, CONF_SOC_SENSOR)
+                    ),
+                )
+                if self.solar_profile is not None
+                else None
+            ),
+            "peak_target": (
+                round(self.peak_tracker.target(dt_util.now()))
+                if self.peak_tracker is not None
+                and self.peak_tracker.target(dt_util.now()) is not None
+                else None
+            ),
+            "peak_projected": (
+                round(self.peak_tracker.projected(dt_util.now()))
+                if self.peak_tracker is not None
+                and self.peak_tracker.projected(dt_util.now()) is not None
+                else None
+            ),
+            **self.get_controller_metrics(),
+            "apply_latency": (
+                round(self.apply_latency, 1) if self.apply_latency is not None else None
+            ),
+            "request_latency": (
+                round(self.api.scheduler.latency, 2)
+                if self.api.scheduler.latency is not None
+                else None
+            ),
+        }
+
+    def get_controller_metrics(self) -> dict[str, Any]:
+        """Get metrics of the battery reference controller."""
+        controller = self.reference_controller
+        if controller is None:
+            return {}
+        return {
+            "controller_interval": (
+                round(controller.interval, 2)
+                if controller.interval is not None
+                else None
+            ),
+            "controller_latency": (
+                round(controller.latency, 2) if controller.latency is not None else None
+            ),
+            "controller_writes": controller.writes,
+            "controller_write_rate": round(controller.write_rate(monotonic()), 1),
+            "controller_held": controller.held,
+        }
+
+    @callback
+    def metrics_updated(self):
+        """Called when metrics are updated"""
+        if self.sensor_status is not None:
+            self.sensor_status.update_ha_state()
+
+    def get_device_id(self) -> str | None:
+        """Get the ID of the device, once it has been registered."""
+        if self.device_id is None:
+            device_registry: DeviceRegistry = async_device_registry_get(self.hass)
+            device = device_registry.async_get_device(
+                identifiers={(DOMAIN, self.config_entry.entry_id)}
+            )
+            if device:
+                self.device_id = device.id
+        return self.device_id
+
+    @callback
+    def device_event_filter(self, event_data) -> bool:
+        """Only let through name changes of the device"""
+        # Before HA 2024.4, the event filter is called with the event.
+        event_data = getattr(event_data, "data", event_data)
+        return (
+            "name_by_user" in event_data.get("changes", {})
+            and event_data.get("device_id") is not None
+            and event_data["device_id"] == self.get_device_id()
+        )
+
     @callback
     async def device_updated(self, event: Event):  # pylint: disable=unused-argument
         """Called when device is updated"""
         _LOGGER.debug("FerroampOperationSettings   Coordinator.device_updated()")
-        if "device_id" in event.data:
-            entity_registry: EntityRegistry = async_entity_registry_get(self.hass)
-            all_entities = async_entries_for_config_entry(
-                entity_registry, self.config_entry.entry_id
+        # If the device name is changed, update the integration name
+        device_registry: DeviceRegistry = async_device_registry_get(self.hass)
+        device = device_registry.async_get(event.data["device_id"])
+        if device and device.name_by_user != self.config_entry.title:
+            self.hass.config_entries.async_update_entry(
+                self.config_entry, title=device.name_by_user
             )
-            if all_entities:
-                device_id = all_entities[0].device_id
-                if event.data["device_id"] == device_id:
-                    if "changes" in event.data:
-                        if "name_by_user" in event.data["changes"]:
-                            # If the device name is changed, update the integration name
-                            device_registry: DeviceRegistry = async_device_registry_get(
-                                self.hass
-                            )
-                            device = device_registry.async_get(device_id)
-                            if device.name_by_user != self.config_entry.title:
-                                self.hass.config_entries.async_update_entry(
-                                    self.config_entry, title=device.name_by_user
-                                )
+
+    def update_device_name(self):
+        """Update the device name if the name of the integration has changed."""
+        device_id = self.get_device_id()
+        if device_id:
+            device_registry: DeviceRegistry = async_device_registry_get(self.hass)
+            device: DeviceEntry = device_registry.async_get(device_id)
+            if device:
+                if device.name_by_user is not None:
+                    if self.config_entry.title != device.name_by_user:
+                        device_registry.async_update_device(
+                            device.id, name_by_user=self.config_entry.title
+                        )
+                else:
+                    if self.config_entry.title != device.name:
+                        device_registry.async_update_device(
+                            device.id, name_by_user=self.config_entry.title
+                        )
+
+    async def async_apply_options(self):
+        """Apply changes of the config entry that do not need a new client."""
+        _LOGGER.debug("async_apply_options()")
+        self.update_device_name()
+        self.apply_rate_limit()
+        self.apply_reconcile_interval()
+        self.apply_solar_planner()
+        await self.async_apply_peak_tracker()
+        self.apply_reference_controller()
+
+    def apply_reconcile_interval(self):
+        """Start, restart or stop the reconciliation of the configuration."""
+        interval = (
+            get_parameter(
+                self.config_entry, CONF_RECONCILE_INTERVAL, DEFAULT_RECONCILE_INTERVAL
+            )
+            * 60
+        )
+        if self.reconciler is not None:
+            if self.reconciler.interval == interval:
+                return
+            self.reconciler.stop()
+            self.reconciler = None
+        if interval > 0:
+            # The reconciliations of all config entries are spread out.
+            scheduler = get_domain_data(self.hass, "poll_schedulers").setdefault(
+                "reconcile", PollScheduler()
+            )
+            self.reconciler = Reconciler(
+                self.hass,
+                interval,
+                self.async_reconcile,
+                scheduler,
+                get_parameter(self.config_entry, CONF_LOGIN_EMAIL),
+            )
+            self.reconciler.start()
+
+    def apply_rate_limit(self):
+        """Apply the configured limits of logins, reads and updates.
+
+        The rate limiter is shared by the config entries of the account, so the
+        lowest limit of the entries is used.
+        """
+        email = get_parameter(self.config_entry, CONF_LOGIN_EMAIL)
+        entries = [
+            entry
+            for entry in self.hass.config_entries.async_entries(DOMAIN)
+            if get_parameter(entry, CONF_LOGIN_EMAIL) == email
+        ] or [self.config_entry]
+        limits = {
+            ENDPOINT_AUTH: (
+                CONF_AUTH_RATE_LIMIT,
+                DEFAULT_AUTH_RATE_LIMIT,
+                AUTH_RATE_BURST,
+            ),
+            ENDPOINT_READ: (
+                CONF_READ_RATE_LIMIT,
+                DEFAULT_READ_RATE_LIMIT,
+                READ_RATE_BURST,
+            ),
+            ENDPOINT_WRITE: (
+                CONF_WRITE_RATE_LIMIT,
+                DEFAULT_WRITE_RATE_LIMIT,
+                WRITE_RATE_BURST,
+            ),
+        }
+        for endpoint_class, (key, default, burst) in limits.items():
+            per_minute = min(get_parameter(entry, key, default) for entry in entries)
+            self.api.rate_limiter.configure(endpoint_class, per_minute / 60, burst)
 
     def async_call_later_local(
         self,
@@ -143,6 +578,13 @@ class FerroampOperationSettingsCoordinator(DataUpdateCoordinator):
         """
         return async_call_later(hass, delay, action)
 
+    async def async_sleep_local(self, delay: float):
+        """
+        Sleep for <delay> seconds.
+        A local version of asyncio.sleep() that can be patched by the test framework.
+        """
+        await asyncio.sleep(delay)
+
     async def platform_started(self, platform: str):
         """Register started platforms"""
         self.platforms_started.append(platform)
@@ -160,6 +602,8 @@ class FerroampOperationSettingsCoordinator(DataUpdateCoordinator):
             _LOGGER.error("update_entities() no data!")
             return
 
+        self.rebase(get_config(self.data))
+
         if self.data["emsConfig"]["data"]["mode"] == 2:
             await self.select_mode.async_select_option(MODE_PEAK_SHAVING)
         elif self.data["emsConfig"]["data"]["mode"] == 3:
@@ -232,11 +676,49 @@ class FerroampOperationSettingsCoordinator(DataUpdateCoordinator):
         """Set status to Ready"""
         self.sensor_status.set_status(STATUS_READY)
 
+    async def async_fetch(self) -> bool:
+        """Fetch the configuration from the Ferroamp system.
+
+        Concurrent calls share one request, made with the highest priority of
+        the callers, and a configuration that was fetched less than
+        GET_DATA_MAX_AGE seconds ago is reused.
+        """
+        if self._fetch_task is None or self._fetch_task.done():
+            if (
+                self.last_update_success
+                and self.data
+                and self._last_fetch is not None
+                and monotonic() - self._last_fetch < GET_DATA_MAX_AGE
+            ):
+                _LOGGER.debug("async_fetch() reuses the fetched configuration")
+                return True
+            self._fetch_priority = SharedPriority()
+            with request_priority(self._fetch_priority):
+                self._fetch_task = self.hass.async_create_task(self._async_fetch())
+        self._fetch_priority.join()
+        return await asyncio.shield(self._fetch_task)
+
+    async def _async_fetch(self) -> bool:
+        await self.async_refresh()
+        if self.last_update_success:
+            self._last_fetch = monotonic()
+        return self.last_update_success
+
     async def get_data(self):
         """Get configuration from Ferroamp system and updated entities"""
+        # Concurrent calls, e.g. from an automation and the UI, share one update.
+        if self._get_data_task is None or self._get_data_task.done():
+            self._get_data_priority = SharedPriority()
+            with request_priority(self._get_data_priority):
+                self._get_data_task = self.hass.async_create_task(
+                    self._async_get_data()
+                )
+        self._get_data_priority.join()
+        await asyncio.shield(self._get_data_task)
+
+    async def _async_get_data(self):
         _LOGGER.debug("get_data() starts")
-        await self.async_refresh()
-        if self.last_update_success:
+        if await self.async_fetch():
             await self.update_entities()
             self.sensor_status.set_status(STATUS_SUCCESS)
             self.async_call_later_local(self.hass, 7.0, self.set_status_ready)
@@ -245,14 +727,799 @@ class FerroampOperationSettingsCoordinator(DataUpdateCoordinator):
             _LOGGER.error("Get Data failed.")
         _LOGGER.debug("get_data() ends")
 
-    async def update(self):
-        """Update the Ferroamp system with the contents of the entities"""
+    async def update(self) -> dict[str, Any]:
+        """Update the Ferroamp system with the contents of the entities
+
+        Returns whether the payload was sent, or was superseded by a later
+        update and sent with it, whether the update succeeded, and its status.
+        """
 
         _LOGGER.debug("update() starts")
 
-        if not self.last_update_success:
+        if not self.last_update_success or not self.data:
             _LOGGER.error("Get Data before Update!")
+            return {"sent": False, "updated": False, "status": None}
+
+        body = self.build_payload()
+        conflict_mode = get_parameter(
+            self.config_entry, CONF_CONFLICT_MODE, DEFAULT_CONFLICT_MODE
+        )
+        remote = None
+        if conflict_mode != CONFLICT_MODE_OFF:
+            remote = await self.async_get_remote_conflict()
+            if remote is False:
+                return {"sent": False, "updated": False, "status": STATUS_FAILED}
+            if remote is not None:
+                if conflict_mode == CONFLICT_MODE_REPORT:
+                    self.sensor_status.set_status(STATUS_CONFLICT)
+                    _LOGGER.warning("Configuration changed elsewhere. Get Data first!")
+                    return {"sent": False, "updated": False, "status": STATUS_CONFLICT}
+                body = {
+                    "payload": merge_three_way(
+                        body["payload"], self._base_config, remote
+                    )
+                }
+                _LOGGER.info("Update merged with a configuration changed elsewhere")
+
+        _LOGGER.debug("body = %s", str(body))
+        start = monotonic()
+        update_ok, sent = await self.write_queue.async_write(
+            body, self.api.async_set_data
+        )
+        confirm = get_parameter(
+            self.config_entry, CONF_CONFIRM_WRITES, DEFAULT_CONFIRM_WRITES
+        )
+        if not update_ok:
+            status = STATUS_FAILED
+        else:
+            status = STATUS_ACCEPTED if confirm else STATUS_SUCCESS
+        result = {"sent": sent, "updated": update_ok, "status": status}
+        if not sent:
+            # A later update replaced this one before it was sent, and sets
+            # the status.
+            _LOGGER.debug("update() superseded")
+            return result
+        if self.confirm_task is not None and not self.confirm_task.done():
+            # The confirmation of an earlier update is superseded.
+            self.confirm_task.cancel()
+        if update_ok:
+            # Until the system has applied the update, it may still report
+            # the previous configuration.
+            pending = (
+                {fingerprint(remote)}
+                if remote is not None
+                else set(self._base_fingerprints)
+            )
+            self.apply_optimistic(body["payload"])
+            if remote is not None:
+                await self.update_entities()
+            self.rebase(get_config(self.data), pending)
+        if update_ok and confirm:
+            self.sensor_status.set_status(STATUS_ACCEPTED)
+            self.confirm_task = self.hass.async_create_task(
+                self.async_confirm(body["payload"], start)
+            )
+            _LOGGER.debug("update() accepted")
+        elif update_ok:
+            self.sensor_status.set_status(STATUS_SUCCESS)
+            self.async_call_later_local(self.hass, 7.0, self.set_status_ready)
+            _LOGGER.debug("update() OK")
+        else:
+            self.sensor_status.set_status(STATUS_FAILED)
+            _LOGGER.error("Update failed.")
+            if self.api.auth_failure is not None:
+                self.config_entry.async_start_reauth(self.hass)
+        return result
+
+    async def async_apply_profile(self, profile: dict) -> dict[str, Any]:
+        """Set the entities of a settings profile and update the Ferroamp system.
+
+        Returns the outcome of the update.
+        """
+        _LOGGER.debug("async_apply_profile(%s)", profile)
+        for key, value in profile.items():
+            if key in PROFILE_SELECTS:
+                await getattr(self, PROFILE_SELECTS[key]).async_select_option(value)
+            elif key in PROFILE_NUMBERS:
+                await getattr(self, PROFILE_NUMBERS[key]).async_set_native_value(
+                    value
+                )
+            elif key in PROFILE_SWITCHES:
+                switch = getattr(self, PROFILE_SWITCHES[key])
+                if value:
+                    await switch.async_turn_on()
+                else:
+                    await switch.async_turn_off()
+        return await self.update()
+
+    def get_profile(self, keys) -> dict:
+        """Get the current values of the entities of profile keys."""
+        profile = {}
+        for key in keys:
+            if key in PROFILE_SELECTS:
+                profile[key] = getattr(self, PROFILE_SELECTS[key]).current_option
+            elif key in PROFILE_NUMBERS:
+                profile[key] = getattr(self, PROFILE_NUMBERS[key]).value
+            elif key in PROFILE_SWITCHES:
+                profile[key] = getattr(self, PROFILE_SWITCHES[key]).is_on
+        return profile
+
+    async def async_apply_settings(self, profile: dict) -> dict[str, Any]:
+        """Apply the settings of a profile that differ from the current ones.
+
+        All changed settings are sent in one update, and nothing is sent if
+        none were changed. Raises HomeAssistantError if a value is out of range,
+        or if there is no configuration to update.
+        Returns the changed settings, the status and the timings.
+        """
+        start = monotonic()
+        if not self.last_update_success or not self.data:
+            raise HomeAssistantError("Get Data before Update!")
+        for key, value in profile.items():
+            if key in PROFILE_NUMBERS:
+                number = getattr(self, PROFILE_NUMBERS[key])
+                if not number.native_min_value <= value <= number.native_max_value:
+                    raise HomeAssistantError(
+                        f"{key} must be between {number.native_min_value} and"
+                        f" {number.native_max_value}"
+                    )
+        current = self.get_profile(profile)
+        changed = {
+            key: value for key, value in profile.items() if current[key] != value
+        }
+        if not changed:
+            return {"changed": {}, "updated": False, "status": None, "duration": 0.0}
+        result = await self.async_apply_profile(changed)
+        return {
+            "changed": changed,
+            "updated": result["updated"],
+            "status": result["status"],
+            "duration": round(monotonic() - start, 3),
+        }
+
+    async def async_read_settings(self) -> dict:
+        """Get Data, and get the settings as a profile.
+
+        Raises HomeAssistantError if the configuration could not be fetched.
+        """
+        await self.get_data()
+        if not self.last_update_success or not self.data:
+            raise HomeAssistantError("Get Data failed")
+        return self.get_profile([*PROFILE_SELECTS, *PROFILE_NUMBERS, *PROFILE_SWITCHES])
+
+    async def async_set_schedule(self, slots: list[dict]):
+        """Replace the schedule with validated slots. No slots removes it."""
+        await self._schedule_store.async_save(serialize_schedule(slots))
+        self.start_schedule(slots, apply_current=True)
+
+    async def async_restore_schedule(self):
+        """Start the stored schedule."""
+        stored = await self._schedule_store.async_load()
+        if stored:
+            self.start_schedule(SCHEDULE_SCHEMA(stored))
+
+    def start_schedule(self, slots: list[dict], apply_current: bool = False):
+        """Start a schedule, replacing a running one."""
+        self.stop_schedule()
+        transitions = compile_schedule(slots)
+        if transitions:
+            self.schedule_runner = ScheduleRunner(
+                self.hass, transitions, self.async_apply_profile
+            )
+            self.schedule_runner.start(apply_current)
+        self.metrics_updated()
+
+    def stop_schedule(self):
+        """Stop the schedule."""
+        if self.schedule_runner is not None:
+            self.schedule_runner.stop()
+            self.schedule_runner = None
+
+    def get_float_state(self, entity_id: str | None) -> float | None:
+        """Get the state of an entity as a float, or None."""
+        if entity_id is None:
+            return None
+        state = self.hass.states.get(entity_id)
+        if state is None:
+            return None
+        try:
+            return float(state.state)
+        except ValueError:
+            return None
+
+    def plan_prices(self, price_sensor: str | None = None) -> dict[str, Any]:
+        """Plan charging and discharging from the prices of a price sensor.
+
+        Raises HomeAssistantError if the plan cannot be made.
+        """
+        if price_sensor is None:
+            price_sensor = get_parameter(self.config_entry, CONF_PRICE_SENSOR)
+        capacity = get_parameter(self.config_entry, CONF_BATTERY_CAPACITY)
+        power = get_parameter(self.config_entry, CONF_BATTERY_POWER)
+        if price_sensor is None or capacity is None or power is None:
+            raise HomeAssistantError(
+                "Price sensor, battery capacity and battery power must be configured"
+            )
+        state = self.hass.states.get(price_sensor)
+        if state is None:
+            raise HomeAssistantError(f"{price_sensor} not found")
+        try:
+            starts, prices, slot_hours = parse_prices(state.attributes)
+        except ValueError as exception:
+            raise HomeAssistantError(str(exception)) from exception
+        starts, prices = remaining(starts, prices, slot_hours, dt_util.now())
+        if len(starts) == 0:
+            raise HomeAssistantError(f"{price_sensor} has no future prices")
+
+        soc_low = self.number_lower_reference.value
+        soc_high = self.number_upper_reference.value
+        soc = self.get_float_state(get_parameter(self.config_entry, CONF_SOC_SENSOR))
+        if soc is None:
+            soc = soc_low
+        try:
+            actions, socs, cost = plan_battery(
+                prices, slot_hours, capacity, power, soc_low, soc_high, soc
+            )
+        except ValueError as exception:
+            raise HomeAssistantError(str(exception)) from exception
+        return {
+            "starts": starts,
+            "actions": actions,
+            "socs": socs,
+            "cost": cost,
+            "power": power,
+        }
+
+    async def async_plan_prices(
+        self, price_sensor: str | None = None, apply: bool = True
+    ) -> dict[str, Any]:
+        """Plan from the prices, and follow the plan if apply is True."""
+        plan = self.plan_prices(price_sensor)
+        if apply:
+            self.stop_plan()
+            self.plan_cost = plan["cost"]
+            self.plan_runner = PlanRunner(
+                self.hass,
+                plan_profiles(plan["starts"], plan["actions"], plan["power"]),
+                self.async_apply_profile,
+            )
+            self.plan_runner.start(apply_current=True)
+            self.metrics_updated()
+        return {
+            "cost": round(plan["cost"], 4),
+            "slots": [
+                {
+                    "start": start.isoformat(),
+                    "action": ACTIONS[int(action)],
+                    "soc": round(float(soc), 1),
+                }
+                for start, action, soc in zip(
+                    plan["starts"], plan["actions"], plan["socs"]
+                )
+            ],
+        }
+
+    def stop_plan(self):
+        """Stop following a plan."""
+        if self.plan_runner is not None:
+            self.plan_runner.stop()
+            self.plan_runner = None
+            self.plan_cost = None
+
+    def apply_solar_planner(self):
+        """Start or stop following the PV forecast and the load estimate."""
+        self.stop_solar_planner()
+        entity_ids = [
+            get_parameter(self.config_entry, CONF_PV_FORECAST_SENSOR),
+            get_parameter(self.config_entry, CONF_LOAD_SENSOR),
+        ]
+        if None in entity_ids or (
+            get_parameter(self.config_entry, CONF_BATTERY_CAPACITY) is None
+        ):
+            return
+        self._solar_unsub = async_track_state_change_event(
+            self.hass, entity_ids, self.solar_inputs_changed
+        )
+        self.solar_night_changed()
+
+    def stop_solar_planner(self):
+        """Stop following the PV forecast and the load estimate."""
+        if self._solar_unsub is not None:
+            self._solar_unsub()
+            self._solar_unsub = None
+        if self._solar_timer_unsub is not None:
+            self._solar_timer_unsub()
+            self._solar_timer_unsub = None
+        if self.solar_task is not None and not self.solar_task.done():
+            self.solar_task.cancel()
+        self.solar_task = None
+        self.solar_profile = None
+
+    def solar_night(self, now: datetime) -> tuple[bool, datetime]:
+        """Get if it is night, and when that changes.
+
+        The night is from sunset until SOLAR_RESTORE_MARGIN seconds before
+        sunrise, so that the battery can be charged by PV from sunrise.
+        """
+        margin = timedelta(seconds=SOLAR_RESTORE_MARGIN)
+        restore = (
+            get_astral_event_next(self.hass, SUN_EVENT_SUNRISE, now + margin) - margin
+        )
+        sunset = get_astral_event_next(self.hass, SUN_EVENT_SUNSET, now)
+        if restore < sunset:
+            return True, restore
+        return False, sunset
+
+    @callback
+    def solar_night_changed(self, _now: datetime | None = None):
+        """Called at sunset, and before sunrise"""
+        night, until = self.solar_night(dt_util.utcnow())
+        self._solar_timer_unsub = async_track_point_in_time(
+            self.hass, self.solar_night_changed, until
+        )
+        if night:
+            self.solar_inputs_changed()
+        else:
+            self.solar_task = self.hass.async_create_task(self.async_restore_solar())
+
+    @callback
+    def solar_inputs_changed(self, _event: Event | None = None):
+        """Called when the PV forecast or the load estimate is changed"""
+        self.solar_task = self.hass.async_create_task(self.async_plan_solar())
+
+    async def async_plan_solar(self) -> dict | None:
+        """Plan the socRef targets, and apply them at night if they have changed.
+
+        The targets are only computed again when the inputs have changed. The
+        lowered Upper Reference would also stop charging from PV, so the targets
+        are only applied during the night, and Upper Reference is restored
+        before sunrise.
+        """
+        pv_forecast = self.get_float_state(
+            get_parameter(self.config_entry, CONF_PV_FORECAST_SENSOR)
+        )
+        load_estimate = self.get_float_state(
+            get_parameter(self.config_entry, CONF_LOAD_SENSOR)
+        )
+        capacity = get_parameter(self.config_entry, CONF_BATTERY_CAPACITY)
+        if pv_forecast is None or load_estimate is None or capacity is None:
+            return None
+        targets, _ = self.solar_planner.plan(
+            pv_forecast,
+            load_estimate,
+            capacity,
+            get_parameter(self.config_entry, CONF_SOC_RESERVE, DEFAULT_SOC_RESERVE),
+        )
+        profile = targets_profile(targets)
+        if profile_key(profile) == profile_key(self.solar_profile):
+            return targets
+        if not self.solar_night(dt_util.utcnow())[0]:
+            # Applied at sunset
+            return targets
+        if not all(item in self.platforms_started for item in self.platforms):
+            # Applied at the next change
+            return targets
+        _LOGGER.debug("New socRef targets from the PV forecast: %s", targets)
+        if self._solar_restore is None:
+            self._solar_restore = self.number_upper_reference.value
+        self.solar_profile = profile
+        await self.async_apply_profile(profile)
+        self.metrics_updated()
+        return targets
+
+    async def async_restore_solar(self):
+        """Restore the Upper Reference from before the night."""
+        self.solar_profile = None
+        if self._solar_restore is None or not all(
+            item in self.platforms_started for item in self.platforms
+        ):
+            return
+        restore = self._solar_restore
+        self._solar_restore = None
+        _LOGGER.debug("Upper Reference restored to %s", restore)
+        await self.async_apply_profile({"upper_reference": restore})
+        self.metrics_updated()
+
+    async def async_simulate(
+        self,
+        path: str,
+        payload: dict | None = None,
+        load_entity: str | None = None,
+        pv_entity: str | None = None,
+    ) -> dict[str, Any]:
+        """Simulate the configuration of the entities on the data of a CSV file.
+
+        The payload, in the format of update(), is merged into the configuration,
+        so that changes can be evaluated before they are made.
+        Raises HomeAssistantError if the simulation cannot be made.
+        """
+        if not self.hass.config.is_allowed_path(path):
+            raise HomeAssistantError(f"{path} is not an allowed path")
+        capacity = get_parameter(self.config_entry, CONF_BATTERY_CAPACITY)
+        if capacity is None:
+            raise HomeAssistantError("Battery capacity must be configured")
+        if not all(item in self.platforms_started for item in self.platforms):
+            raise HomeAssistantError("The entities are not ready")
+        config = merge_payload(self.build_payload()["payload"], payload or {})
+        soc = self.get_float_state(get_parameter(self.config_entry, CONF_SOC_SENSOR))
+        if soc is None:
+            soc = config["battery"]["socRef"]["low"]
+        try:
+            result = await self.hass.async_add_executor_job(
+                simulate_file, path, config, capacity, soc, load_entity, pv_entity
+            )
+        except (OSError, KeyError, ValueError) as exception:
+            raise HomeAssistantError(
+                f"Could not simulate with {path}: {exception}"
+            ) from exception
+        return {
+            "imported": round(result["imported"], 2),
+            "exported": round(result["exported"], 2),
+            "curtailed": round(result["curtailed"], 2),
+            "charged": round(result["charged"], 2),
+            "discharged": round(result["discharged"], 2),
+            "grid_peak": round(result["grid_peak"]),
+            "hourly_peaks": [round(peak) for peak in result["hourly_peaks"]],
+            "ace_steps": result["ace_steps"],
+            "soc_min": round(float(result["soc"].min()), 1),
+            "soc_max": round(float(result["soc"].max()), 1),
+            "soc_end": round(float(result["soc"][-1]), 1),
+            "soc_hourly": [round(float(soc), 1) for soc in result["soc_hourly"]],
+        }
+
+    async def async_optimize_thresholds(
+        self,
+        grid_power_sensor: str | None = None,
+        weeks: int = DEFAULT_OPTIMIZE_WEEKS,
+        apply: bool = False,
+    ) -> dict[str, Any]:
+        """Find the Peak Shaving thresholds with the lowest peaks in the history.
+
+        The thresholds are set, and the Ferroamp system updated, if apply is True.
+        Raises HomeAssistantError if the thresholds cannot be found.
+        """
+        if grid_power_sensor is None:
+            grid_power_sensor = get_parameter(self.config_entry, CONF_GRID_POWER_SENSOR)
+        capacity = get_parameter(self.config_entry, CONF_BATTERY_CAPACITY)
+        if grid_power_sensor is None or capacity is None:
+            raise HomeAssistantError(
+                "Grid power sensor and battery capacity must be configured"
+            )
+        if not all(item in self.platforms_started for item in self.platforms):
+            raise HomeAssistantError("The entities are not ready")
+        end = dt_util.now()
+        grid = await async_read_power_history(
+            self.hass, grid_power_sensor, end - timedelta(weeks=weeks), end
+        )
+        if np.count_nonzero(np.isfinite(grid)) < MIN_HISTORY_STEPS:
+            raise HomeAssistantError(f"Not enough history of {grid_power_sensor}")
+        # Peak Shaving uses both References, whatever the mode is now.
+        payload = merge_payload(
+            self.build_payload()["payload"],
+            {
+                "battery": {
+                    "powerRef": {
+                        "discharge": self.number_discharge_reference.value,
+                        "charge": self.number_charge_reference.value,
+                    }
+                }
+            },
+        )
+        soc = self.get_float_state(get_parameter(self.config_entry, CONF_SOC_SENSOR))
+        if soc is None:
+            soc = payload["battery"]["socRef"]["low"]
+        result = await self.hass.async_add_executor_job(
+            optimize_thresholds,
+            grid,
+            60,
+            payload,
+            capacity,
+            soc,
+            get_parameter(self.config_entry, CONF_PEAK_COUNT, DEFAULT_PEAK_COUNT),
+        )
+        _LOGGER.debug("Optimized thresholds: %s", result)
+        if apply:
+            await self.async_apply_profile(
+                {
+                    "discharge_threshold": result["discharge_threshold"],
+                    "charge_threshold": result["charge_threshold"],
+                }
+            )
+        return {
+            "discharge_threshold": result["discharge_threshold"],
+            "charge_threshold": result["charge_threshold"],
+            "peak": round(result["peak"]),
+            "baseline_peak": round(result["baseline_peak"]),
+        }
+
+    async def async_apply_peak_tracker(self):
+        """Start or stop tracking the power peaks of the month."""
+        if self.peak_tracker is not None:
+            await self._peak_store.async_save(self.peak_tracker.as_dict())
+        self.stop_peak_tracker()
+        grid_power_sensor = get_parameter(self.config_entry, CONF_GRID_POWER_SENSOR)
+        if grid_power_sensor is None:
+            return
+        self.peak_tracker = PeakTracker(
+            get_parameter(self.config_entry, CONF_PEAK_COUNT, DEFAULT_PEAK_COUNT)
+        )
+        stored = await self._peak_store.async_load()
+        if stored:
+            self.peak_tracker.restore(stored)
+        self._peak_unsub = async_track_state_change_event(
+            self.hass, [grid_power_sensor], self.grid_power_changed
+        )
+
+    def stop_peak_tracker(self):
+        """Stop tracking the power peaks."""
+        if self._peak_unsub is not None:
+            self._peak_unsub()
+            self._peak_unsub = None
+        if self.peak_task is not None and not self.peak_task.done():
+            self.peak_task.cancel()
+        self.peak_task = None
+        self._peak_written = None
+        self.peak_tracker = None
+
+    @callback
+    def grid_power_changed(self, event: Event):
+        """Called when the grid power is changed"""
+        if self.peak_tracker is None:
+            return
+        power = get_power(event.data.get("new_state"))
+        if power is None:
+            return
+        now = dt_util.now()
+        if self.peak_tracker.add(now, power):
+            self.metrics_updated()
+        self._peak_store.async_delay_save(self.peak_tracker.as_dict, PEAK_SAVE_DELAY)
+        if self.peak_task is None or self.peak_task.done():
+            threshold = self.peak_threshold(now)
+            if threshold is not None:
+                self._peak_written = now
+                self.peak_task = self.hass.async_create_task(
+                    self.async_apply_profile({"discharge_threshold": threshold})
+                )
+
+    def peak_threshold(self, now: datetime) -> float | None:
+        """Get a new Discharge Threshold that keeps the hour out of the top peaks.
+
+        The threshold is only changed when the projected mean of the hour is
+        above the target, and not more often than every PEAK_MIN_INTERVAL
+        seconds. Returns None if the threshold is not to be changed.
+        """
+        if (
+            self.peak_tracker is None
+            or not all(item in self.platforms_started for item in self.platforms)
+            or self.select_mode.current_option != MODE_PEAK_SHAVING
+        ):
+            return None
+        if (
+            self._peak_written is not None
+            and (now - self._peak_written).total_seconds() < PEAK_MIN_INTERVAL
+        ):
+            return None
+        target = self.peak_tracker.target(now)
+        projected = self.peak_tracker.projected(now)
+        if target is None or projected is None or projected <= target:
+            return None
+        threshold = self.peak_tracker.discharge_threshold(now)
+        if threshold is None:
+            return None
+        threshold = min(
+            PEAK_THRESHOLD_STEP * (threshold // PEAK_THRESHOLD_STEP),
+            self.number_discharge_threshold.native_max_value,
+        )
+        current = self.number_discharge_threshold.native_value
+        if current is not None and abs(threshold - current) < PEAK_THRESHOLD_STEP:
+            return None
+        return threshold
+
+    def apply_reference_controller(self):
+        """Start or stop holding the grid power at the setpoint."""
+        self.stop_reference_controller()
+        controller_sensor = get_parameter(self.config_entry, CONF_CONTROLLER_SENSOR)
+        if controller_sensor is None:
+            return
+        self.reference_controller = ReferenceController(
+            get_parameter(
+                self.config_entry, CONF_CONTROLLER_SETPOINT, DEFAULT_CONTROLLER_SETPOINT
+            ),
+            get_parameter(
+                self.config_entry, CONF_CONTROLLER_DEADBAND, DEFAULT_CONTROLLER_DEADBAND
+            ),
+            get_parameter(
+                self.config_entry,
+                CONF_CONTROLLER_HYSTERESIS,
+                DEFAULT_CONTROLLER_HYSTERESIS,
+            ),
+            get_parameter(
+                self.config_entry,
+                CONF_CONTROLLER_MIN_INTERVAL,
+                DEFAULT_CONTROLLER_MIN_INTERVAL,
+            ),
+            get_parameter(self.config_entry, CONF_BATTERY_POWER),
+        )
+        self._controller_unsub = async_track_state_change_event(
+            self.hass, [controller_sensor], self.controller_power_changed
+        )
+
+    def stop_reference_controller(self):
+        """Stop holding the grid power at the setpoint."""
+        if self._controller_unsub is not None:
+            self._controller_unsub()
+            self._controller_unsub = None
+        if self.controller_task is not None and not self.controller_task.done():
+            self.controller_task.cancel()
+        self.controller_task = None
+        self.reference_controller = None
+
+    def battery_reference(self) -> float:
+        """Get the battery power (W) that is set, positive when charging."""
+        option = self.select_battery_power_mode.current_option
+        if option == BATTERY_CHARGE:
+            return self.number_charge_reference.value or 0.0
+        if option == BATTERY_DISCHARGE:
+            return -(self.number_discharge_reference.value or 0.0)
+        return 0.0
+
+    @callback
+    def controller_power_changed(self, event: Event):
+        """Called when the grid power of the controller is changed"""
+        if (
+            self.reference_controller is None
+            or not all(item in self.platforms_started for item in self.platforms)
+            or self.select_mode.current_option != MODE_DEFAULT
+            or (self.controller_task is not None and not self.controller_task.done())
+        ):
+            return
+        power = get_power(event.data.get("new_state"))
+        if power is None:
             return
+        target = self.reference_controller.step(
+            monotonic(), power, self.battery_reference()
+        )
+        if target is not None:
+            self.controller_task = self.hass.async_create_task(
+                self.async_write_reference(target)
+            )
+
+    async def async_write_reference(self, target: float):
+        """Write a new battery reference of the controller."""
+        if target > 0:
+            profile = {"battery_power_mode": BATTERY_CHARGE, "charge_reference": target}
+        elif target < 0:
+            profile = {
+                "battery_power_mode": BATTERY_DISCHARGE,
+                "discharge_reference": -target,
+            }
+        else:
+            profile = {"battery_power_mode": BATTERY_OFF}
+        _LOGGER.debug("New battery reference of the controller: %s", profile)
+        start = monotonic()
+        await self.async_apply_profile(profile)
+        if self.reference_controller is not None:
+            self.reference_controller.record_write(start, monotonic())
+        self.metrics_updated()
+
+    async def async_reconcile(self) -> bool:
+        """Correct the configuration of the Ferroamp system, if it has drifted.
+
+        The desired configuration is the contents of the entities.
+        Returns True if a drift was corrected.
+        """
+        if not self.data or not all(
+            item in self.platforms_started for item in self.platforms
+        ):
+            return False
+        desired = self.build_payload()
+        with request_priority(PRIORITY_BACKGROUND):
+            if not await self.async_fetch():
+                raise UpdateFailed("Could not read the current configuration")
+            if config_matches(desired["payload"], get_config(self.data)):
+                return False
+            _LOGGER.info("The configuration has drifted and is corrected")
+            _LOGGER.debug("body = %s", str(desired))
+            update_ok, _ = await self.write_queue.async_write(
+                desired, self.api.async_set_data
+            )
+        if not update_ok:
+            raise UpdateFailed("Could not correct the configuration")
+        self.apply_optimistic(desired["payload"])
+        self.rebase(get_config(self.data))
+        return True
+
+    def rebase(self, config: dict | None, pending: set[str] | None = None):
+        """Set the configuration that the entities are based on."""
+        self._base_config = config
+        self._base_fingerprints = set(pending) if pending else set()
+        if config is not None:
+            self._base_fingerprints.add(fingerprint(config))
+
+    async def async_get_remote_conflict(self) -> dict | None | bool:
+        """Read the remote configuration and compare it with the base configuration.
+
+        Returns the remote configuration if it was changed elsewhere, None if
+        it was not, and False if it could not be read.
+        """
+        if not self._base_fingerprints:
+            # The entities have not been set from a fetched configuration.
+            self.rebase(get_config(self.data))
+        try:
+            data = await self.api.async_get_data()
+        except Exception as exception:  # pylint: disable=broad-except
+            _LOGGER.debug("async_get_remote_conflict() read failed: %s", exception)
+            data = None
+        remote = get_config(data)
+        if remote is None:
+            self.sensor_status.set_status(STATUS_FAILED)
+            _LOGGER.error("Update failed. Could not read the current configuration.")
+            return False
+        if fingerprint(remote) in self._base_fingerprints:
+            return None
+        self.conflicts += 1
+        return remote
+
+    @callback
+    def apply_optimistic(self, payload: dict):
+        """Merge an accepted update into the fetched configuration.
+
+        The merged configuration is used until a fetch replaces it.
+        """
+        config = get_config(self.data)
+        if config is None:
+            return
+        data = dict(self.data)
+        data["emsConfig"] = dict(data["emsConfig"])
+        data["emsConfig"]["data"] = merge_payload(config, payload)
+        self._optimistic_payload = payload
+        self.data_version += 1
+        self.async_set_updated_data(data)
+        # Reads within GET_DATA_MAX_AGE use the merged configuration.
+        self._last_fetch = monotonic()
+
+    def check_conflict(self, data: dict):
+        """Check a fetched configuration against the last accepted update."""
+        if self._optimistic_payload is None:
+            return
+        if not config_matches(self._optimistic_payload, get_config(data)):
+            self.conflicts += 1
+            _LOGGER.warning(
+                "The configuration of the Ferroamp system differs from the last update"
+            )
+        self._optimistic_payload = None
+
+    async def async_confirm(self, payload: dict, start: float) -> bool:
+        """Read back the configuration until the update has been applied."""
+        delay = CONFIRM_INITIAL_DELAY
+        while monotonic() - start < CONFIRM_TIMEOUT:
+            await self.async_sleep_local(delay)
+            delay = min(delay * 2, CONFIRM_MAX_DELAY)
+            try:
+                with request_priority(PRIORITY_BACKGROUND):
+                    data = await self.api.async_get_data()
+            except Exception as exception:  # pylint: disable=broad-except
+                _LOGGER.debug("async_confirm() read failed: %s", exception)
+                continue
+            if config_matches(payload, get_config(data)):
+                self.apply_latency = monotonic() - start
+                _LOGGER.debug("Update applied after %.1f s", self.apply_latency)
+                self._optimistic_payload = None
+                await self.async_seed_data(data)
+                self._last_fetch = monotonic()
+                self.sensor_status.set_status(STATUS_APPLIED)
+                self.async_call_later_local(self.hass, 7.0, self.set_status_ready)
+                return True
+
+        _LOGGER.warning(
+            "The update was accepted but not applied within %s seconds",
+            CONFIRM_TIMEOUT,
+        )
+        self.async_call_later_local(self.hass, 7.0, self.set_status_ready)
+        return False
+
+    def build_payload(self) -> dict:
+        """Build the body of an update from the contents of the entities"""
 
         body = {}
         body["payload"] = {}
@@ -321,12 +1588,4 @@ class FerroampOperationSettingsCoordinator(DataUpdateCoordinator):
             # Default mode
             body["payload"]["mode"] = 1
 
-        _LOGGER.debug("body = %s", str(body))
-        update_ok = await self.api.async_set_data(body)
-        if update_ok:
-            self.sensor_status.set_status(STATUS_SUCCESS)
-            self.async_call_later_local(self.hass, 7.0, self.set_status_ready)
-            _LOGGER.debug("update() OK")
-        else:
-            self.sensor_status.set_status(STATUS_FAILED)
-            _LOGGER.error("Update failed.")
+        return body
@@ -1,39 +1,104 @@
 """API Client."""
 
 from copy import deepcopy
-from json import dumps as json_dumps
 import logging
 import asyncio
 import socket
-import time
 from typing import TypeVar
 from urllib.parse import urldefrag, urlencode, urlparse, parse_qs
 from uuid import uuid4
 import aiohttp
 import async_timeout
-from oauthlib.oauth2 import WebApplicationClient
 from pyquery import PyQuery as pq
 
+from custom_components.ferroamp_operation_settings.helpers.oauth import (
+    OAuthTokens,
+    create_code_challenge,
+    create_code_verifier,
+    prepare_authorization_uri,
+    prepare_refresh_body,
+    prepare_token_body,
+)
+from custom_components.ferroamp_operation_settings.helpers.rate_limiter import (
+    ENDPOINT_AUTH,
+    ENDPOINT_READ,
+    ENDPOINT_WRITE,
+    RateLimiter,
+)
+from custom_components.ferroamp_operation_settings.helpers.request_scheduler import (
+    RequestScheduler,
+    get_request_priority,
+)
+
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
 HEADERS = {"Content-type": "application/json; charset=UTF-8"}
 TIMEOUT = 60
 
+OPENID_BASEURL = "https://auth.eu.prod.ferroamp.com/realms/public/protocol/openid-connect"  # pylint: disable=line-too-long
+PORTAL_BASEURL = "https://portal.ferroamp.com"
+CLIENT_ID_FRONTEND = "portal-frontend-ng-production"
+
+# Terminal authentication failures. The user must act before a new login is tried.
+AUTH_FAILED_INVALID_CREDENTIALS = "invalid_credentials"
+AUTH_FAILED_REQUIRED_ACTION = "required_action"
+
+# Errors of the credentials in a re-rendered login form
+CREDENTIAL_ERROR_SELECTORS = (
+    "#input-error, #input-error-username, #input-error-password"
+)
+CREDENTIAL_ERROR_TEXTS = ("Invalid username or password", "Invalid username or email")
+
 _T = TypeVar("_T")
 
+# Logins clear the cookies of the session, so logins of clients that share a
+# session are made one at a time.
+_login_locks: dict[int, asyncio.Lock] = {}
+
+
+def has_credential_error(body: str | None) -> bool:
+    """Check if a login page shows that the username or password is wrong.
+
+    Other errors of the login, e.g. an expired login session, are transient.
+    """
+    if not body or "<form" not in body:
+        return False
+    d = pq(body)
+    if not d("input[type=password]"):
+        return False
+    if d(CREDENTIAL_ERROR_SELECTORS):
+        return True
+    return any(text in d.text() for text in CREDENTIAL_ERROR_TEXTS)
+
 
 class ApiClientBase:
     """API client base class."""
 
-    def __init__(self, session: aiohttp.ClientSession) -> None:
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        scheduler: RequestScheduler | None = None,
+        rate_limiter: RateLimiter | None = None,
+    ) -> None:
         """API client base class."""
         self._session = session
+        # Clients of the same account should share one scheduler and rate limiter.
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
 
     async def async_get_data(self) -> _T:
         """Get data from the API. This methid should be overloaded."""
         return None
 
+    def endpoint_class(
+        self, method: str, url: str  # pylint: disable=unused-argument
+    ) -> str:
+        """Get the rate limit class of a request. This method can be overloaded."""
+        if method.startswith("post"):
+            return ENDPOINT_WRITE
+        return ENDPOINT_READ
+
     async def api_wrapper(  # pylint: disable=dangerous-default-value
         self,
         method: str,
@@ -44,6 +109,26 @@ class ApiClientBase:
         allow_redirects: bool = True,
     ) -> dict:
         """Get information from the API."""
+        # Both waits are by priority, so that a background request does not
+        # delay an interactive one.
+        priority = get_request_priority()
+        await self.rate_limiter.async_acquire(
+            self.endpoint_class(method, url), priority
+        )
+        async with self.scheduler.slot(priority):
+            return await self._api_wrapper(
+                method, url, data, json, headers, allow_redirects
+            )
+
+    async def _api_wrapper(
+        self,
+        method: str,
+        url: str,
+        data: dict,
+        json: dict,
+        headers: dict,
+        allow_redirects: bool,
+    ) -> dict:
         try:
             async with async_timeout.timeout(TIMEOUT):
                 if method == "get_json":
@@ -227,38 +312,82 @@ class FerroampApiClient(ApiClientBase):
     """Ferroamp API client"""
 
     def __init__(
-        self, system_id: int, email: str, password: str, session: aiohttp.ClientSession
+        self,
+        system_id: int,
+        email: str,
+        password: str,
+        session: aiohttp.ClientSession,
+        scheduler: RequestScheduler | None = None,
+        rate_limiter: RateLimiter | None = None,
     ) -> None:
         """Nordpool API Client."""
-        super().__init__(session)
+        super().__init__(session, scheduler, rate_limiter)
         self._system_id = system_id
         self._email = email
         self._password = password
-        self.oauth2client = WebApplicationClient(
-            "portal-first-gen", scope="openid", code_challenge_method="S256"
-        )
-        self._tokens = None
+        self._tokens: OAuthTokens | None = None
         self._access_token = None
         self._data = None
+        self._auth_failure: str | None = None
+        # Serializes login and token refresh when the client is used concurrently.
+        self._token_lock = asyncio.Lock()
+
+    @property
+    def system_id(self) -> int:
+        """The system ID."""
+        return self._system_id
+
+    @property
+    def data(self) -> dict | None:
+        """The last fetched configuration, or None."""
+        return self._data
+
+    def has_credentials(self, system_id: int, email: str, password: str) -> bool:
+        """Check if the client uses the given system ID and login information."""
+        return (
+            self._system_id == system_id
+            and self._email == email
+            and self._password == password
+        )
+
+    @property
+    def auth_failure(self) -> str | None:
+        """The reason of a terminal authentication failure, or None."""
+        return self._auth_failure
+
+    def endpoint_class(self, method: str, url: str) -> str:
+        """Get the rate limit class of a request."""
+        if not url.startswith(PORTAL_BASEURL + "/service/"):
+            # Login and tokens
+            return ENDPOINT_AUTH
+        if "/commands/" in url:
+            return ENDPOINT_WRITE
+        return ENDPOINT_READ
 
     async def get_new_tokens(self) -> None:
         """Get new access token and refresh token"""
 
-        openid_baseurl = (
-            "https://auth.eu.prod.ferroamp.com/realms/public/protocol/openid-connect"
-        )
-        portal_baseurl = "https://portal.ferroamp.com"
+        if self._auth_failure is not None:
+            # Do not try again with credentials that are known to fail.
+            _LOGGER.debug("get_new_tokens: Skipped due to %s.", self._auth_failure)
+            return None
+
+        async with _login_locks.setdefault(id(self._session), asyncio.Lock()):
+            await self._get_new_tokens()
+        return None
+
+    async def _get_new_tokens(self) -> None:
+
+        openid_baseurl = OPENID_BASEURL
+        portal_baseurl = PORTAL_BASEURL
 
         nonce: str = str(uuid4())
         state: str = str(uuid4())
         session_state = None
         code = None
         authorization_code = None
-        code_verifier = self.oauth2client.create_code_verifier(88)
-        code_challenge = self.oauth2client.create_code_challenge(
-            code_verifier, self.oauth2client.code_challenge_method
-        )
-        self.oauth2client.client_id = "portal-first-gen"
+        code_verifier = create_code_verifier(88)
+        code_challenge = create_code_challenge(code_verifier)
 
         ###### Get the login URL ################################################
         if self._session and self._session.cookie_jar:
@@ -272,13 +401,12 @@ class FerroampApiClient(ApiClientBase):
 
         if not action:
             redirect_uri = f"{portal_baseurl}/"
-            self.oauth2client.client_id = "portal-frontend-ng-production"
-            uri = self.oauth2client.prepare_request_uri(
+            uri = prepare_authorization_uri(
                 openid_baseurl + "/auth",
+                client_id=CLIENT_ID_FRONTEND,
                 redirect_uri=redirect_uri,
                 state=state,
                 code_challenge=code_challenge,
-                code_challenge_method=self.oauth2client.code_challenge_method,
                 response_mode="fragment",
                 nonce=nonce,
             )
@@ -308,25 +436,25 @@ class FerroampApiClient(ApiClientBase):
         )
         _LOGGER.debug("get_new_tokens: After first POST.")
         if response.status != 200:
-            _LOGGER.error("Username and/or password is incorrect")
-            _LOGGER.error("Failed to receive code")
+            await self.check_login_failure(response)
             return None
         url = str(response.real_url)
-        try:
-            # Try using oauth2client.parse_request_uri_response()
-            query_params = self.oauth2client.parse_request_uri_response(url)
+        parsed_url = urlparse(url)
+        query_params = parse_qs(parsed_url.query)
+        if "code" in query_params:
+            # The code is in the query
             for key, value in query_params.items():
                 if key == "session_state":
-                    session_state = value
+                    session_state = value[0]
                 if key == "code":
-                    code = value
-        except Exception:  # pylint: disable=broad-except
-            # Try using urlparse()
-            parsed_url = urlparse(url)
+                    code = value[0]
+        else:
+            # The code is in the fragment
             if parsed_url.path == "/realms/public/login-actions/required-action":
                 _LOGGER.error(
                     "Extra action needed. Please login using a web browser once."
                 )
+                self._auth_failure = AUTH_FAILED_REQUIRED_ACTION
                 return None
             fragment = parsed_url.fragment
             fragment_params = parse_qs(fragment)
@@ -337,8 +465,7 @@ class FerroampApiClient(ApiClientBase):
                     code = value[0]
 
         if session_state is None or code is None:
-            _LOGGER.error("Username and/or password is incorrect")
-            _LOGGER.error("Failed to receive session_state and code")
+            await self.check_login_failure(response)
             return None
 
         ##### Authorization Code Request ##################################
@@ -346,13 +473,12 @@ class FerroampApiClient(ApiClientBase):
         ## Get the "code" for authorization
 
         redirect_uri = f"{portal_baseurl}/app?session_state={session_state}&code={code}"
-        self.oauth2client.client_id = "portal-frontend-ng-production"
-        uri = self.oauth2client.prepare_request_uri(
+        uri = prepare_authorization_uri(
             openid_baseurl + "/auth",
+            client_id=CLIENT_ID_FRONTEND,
             redirect_uri=redirect_uri,
             state=state,
             code_challenge=code_challenge,
-            code_challenge_method=self.oauth2client.code_challenge_method,
             response_mode="fragment",
             nonce=nonce,
         )
@@ -423,11 +549,10 @@ class FerroampApiClient(ApiClientBase):
         #
         ## Get "access_token" and "refresh token", and their expiration times
 
-        body = self.oauth2client.prepare_request_body(
+        body = prepare_token_body(
+            client_id=CLIENT_ID_FRONTEND,
             code=authorization_code,
             redirect_uri=redirect_uri,
-            body="",
-            include_client_id=True,
             code_verifier=code_verifier,
         )
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
@@ -442,14 +567,10 @@ class FerroampApiClient(ApiClientBase):
             _LOGGER.error("Failed to receive tokens")
             return None
 
-        json_data = await response.json()
-        json_data["scope"] = "openid"
         try:
-            tokens = self.oauth2client.parse_request_body_response(
-                json_dumps(json_data), "openid"
-            )
+            tokens = OAuthTokens.from_response(await response.json())
             self._tokens = tokens
-            self._access_token = tokens["access_token"]
+            self._access_token = tokens.access_token
             _LOGGER.debug("get_new_tokens: New tokens received.")
         except Exception as exception:  # pylint: disable=broad-except
             _LOGGER.error("Username and password are correct")
@@ -460,6 +581,28 @@ class FerroampApiClient(ApiClientBase):
 
         return None
 
+    async def check_login_failure(self, response: aiohttp.ClientResponse) -> None:
+        """Check why the login did not give a code.
+
+        Only an error of the credentials in the login form is terminal. Other
+        failures, e.g. an expired login session, are tried again later.
+        """
+        try:
+            body = await response.text()
+        except Exception as exception:  # pylint: disable=broad-except
+            _LOGGER.debug(
+                "check_login_failure: Could not read the body - %s", exception
+            )
+            body = None
+        if has_credential_error(body):
+            _LOGGER.error("Username and/or password is incorrect")
+            self._auth_failure = AUTH_FAILED_INVALID_CREDENTIALS
+        else:
+            _LOGGER.error(
+                "Failed to receive code, status %s. Trying again later.",
+                response.status,
+            )
+
     def get_all_cookies(self) -> str:
         """Get all cookies from the cookie jar."""
         cookies = {}
@@ -481,61 +624,50 @@ class FerroampApiClient(ApiClientBase):
     async def get_access_token(self) -> None:
         """Make sure we have a valid access token."""
 
-        current_time = time.time()
+        async with self._token_lock:
+            if self._access_token is None:
+                # No Token
+                await self.get_new_tokens()
+            elif self._tokens and self._tokens.expires_within(30):
+                # Token is about to expire, so refresh it
+                await self.refresh_tokens()
+            else:
+                # Token still valid
+                _LOGGER.debug("get_access_token: Tokens still valid.")
+            return self._access_token
 
-        if self._access_token is None:
-            # No Token
+    async def refresh_tokens(self) -> None:
+        """Refresh the access token, or get new tokens if that fails."""
+
+        url = OPENID_BASEURL + "/token"
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        body = prepare_refresh_body(
+            client_id=CLIENT_ID_FRONTEND, refresh_token=self._tokens.refresh_token
+        )
+        _LOGGER.debug("refresh_tokens: Before first POST.")
+        response = await self.api_wrapper_post_data(url=url, headers=headers, data=body)
+        _LOGGER.debug("refresh_tokens: After first POST.")
+        if response.status != 200:
+            _LOGGER.debug("Failed to refresh token. Get new tokens instead.")
+            self._access_token = None
             await self.get_new_tokens()
-            return self._access_token
-        elif (
-            self._access_token
-            and self._tokens
-            and self._tokens["expires_at"] - current_time < 30
-        ):
-            # Token is about to expire, so refresh it
-            # pylint: disable=line-too-long
-            openid_baseurl = "https://auth.eu.prod.ferroamp.com/realms/public/protocol/openid-connect"
-            token_url = openid_baseurl + "/token"
-            url, headers, body = self.oauth2client.prepare_refresh_token_request(
-                token_url,
-                refresh_token=self._tokens["refresh_token"],
-                body="",
-                scope=None,
-                client_id="portal-frontend-ng-production",
-            )
-            _LOGGER.debug("get_access_token: Before first POST.")
-            response = await self.api_wrapper_post_data(
-                url=url, headers=headers, data=body
-            )
-            _LOGGER.debug("get_access_token: After first POST.")
-            if response.status != 200:
-                _LOGGER.debug("Failed to refresh token. Get new tokens instead.")
-                self._access_token = None
-                await self.get_new_tokens()
-                return self._access_token
+            return None
 
-            json_data = await response.json()
-            json_data["scope"] = "openid"
-            try:
-                tokens = self.oauth2client.parse_request_body_response(
-                    json_dumps(json_data), "openid"
-                )
-                self._tokens = tokens
-                self._access_token = tokens["access_token"]
-                _LOGGER.debug("get_access_token: Tokens refreshed.")
-            except Exception as exception:  # pylint: disable=broad-except
-                _LOGGER.error(
-                    "get_access_token: Could not read token information - %s", exception
-                )
-        else:
-            # Token still valid
-            _LOGGER.debug("get_access_token: Tokens still valid.")
-        return self._access_token
+        try:
+            tokens = OAuthTokens.from_response(await response.json())
+            self._tokens = tokens
+            self._access_token = tokens.access_token
+            _LOGGER.debug("refresh_tokens: Tokens refreshed.")
+        except Exception as exception:  # pylint: disable=broad-except
+            _LOGGER.error(
+                "refresh_tokens: Could not read token information - %s", exception
+            )
+        return None
 
     async def async_get_data(self) -> dict:
         """Get data from the API."""
 
-        portal_baseurl = "https://portal.ferroamp.com"
+        portal_baseurl = PORTAL_BASEURL
         self._access_token = await self.get_access_token()
         if self._access_token is not None:
             url = (
@@ -556,7 +688,7 @@ class FerroampApiClient(ApiClientBase):
     async def async_set_data(self, body: dict) -> bool:
         """Set data to the API."""
 
-        portal_baseurl = "https://portal.ferroamp.com"
+        portal_baseurl = PORTAL_BASEURL
         self._access_token = await self.get_access_token()
         if self._access_token is not None:
             url = (
@@ -1,6 +1,7 @@
 """Helpers for config_flow"""
 
 import logging
+from time import monotonic
 from typing import Any
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
@@ -8,6 +9,9 @@ from homeassistant.helpers.device_registry import async_get as async_device_regi
 from homeassistant.helpers.device_registry import DeviceRegistry
 
 from custom_components.ferroamp_operation_settings.helpers.api import FerroampApiClient
+from custom_components.ferroamp_operation_settings.helpers.general import (
+    get_domain_data,
+)
 
 
 # pylint: disable=relative-beyond-top-level
@@ -17,6 +21,7 @@ from ..const import (
     CONF_SYSTEM_ID,
     DOMAIN,
     NAME,
+    VALIDATED_CLIENT_MAX_AGE,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -27,7 +32,7 @@ class FlowValidator:
 
     @staticmethod
     async def validate_step_user(
-        hass: HomeAssistant, user_input: dict[str, Any]
+        hass: HomeAssistant, user_input: dict[str, Any], flow_id: str = None
     ) -> list[str]:
         """Validate step_user"""
 
@@ -44,6 +49,43 @@ class FlowValidator:
             _LOGGER.debug("Failed to get data!")
             return ("base", "login_failed")
 
+        if flow_id is not None:
+            # Let the setup of the entry reuse the tokens and the data.
+            ValidatedClientCache.store(hass, flow_id, client)
+
+        return None
+
+
+class ValidatedClientCache:
+    """Short-lived cache of API clients that were validated in a flow"""
+
+    @staticmethod
+    def _get_cache(hass: HomeAssistant) -> dict[str, tuple[float, FerroampApiClient]]:
+        cache = get_domain_data(hass, "validated_clients")
+        now = monotonic()
+        for flow_id in [
+            flow_id
+            for flow_id, (created, _) in cache.items()
+            if now - created > VALIDATED_CLIENT_MAX_AGE
+        ]:
+            cache.pop(flow_id)
+        return cache
+
+    @staticmethod
+    def store(hass: HomeAssistant, flow_id: str, client: FerroampApiClient) -> None:
+        """Store a validated client. A later validation in the same flow replaces it."""
+        ValidatedClientCache._get_cache(hass)[flow_id] = (monotonic(), client)
+
+    @staticmethod
+    def pop(
+        hass: HomeAssistant, system_id: int, email: str, password: str
+    ) -> FerroampApiClient | None:
+        """Remove and return a validated client with the given login information."""
+        cache = ValidatedClientCache._get_cache(hass)
+        for flow_id, (_, client) in cache.items():
+            if client.has_credentials(system_id, email, password):
+                cache.pop(flow_id)
+                return client
         return None
 
 
@@ -54,20 +96,21 @@ class DeviceNameCreator:
     def create(hass: HomeAssistant) -> str:
         """Create device name"""
         device_registry: DeviceRegistry = async_device_registry_get(hass)
-        devices = device_registry.devices
-        # Find existing Ferroamp Operation Settings devices
-        ev_devices = []
-        for device in devices:
-            for item in devices[device].identifiers:
-                if item[0] == DOMAIN:
-                    ev_devices.append(device)
+        # Find existing Ferroamp Operation Settings devices. Look them up by the
+        # config entries of the integration, not by scanning all devices.
+        device_names = []
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            device = device_registry.async_get_device(
+                identifiers={(DOMAIN, entry.entry_id)}
+            )
+            if device is not None:
+                device_names.append(device.name)
         # If this is the first device. just return NAME
-        if len(ev_devices) == 0:
+        if len(device_names) == 0:
             return NAME
         # Find the highest number at the end of the name
         higest = 1
-        for device in ev_devices:
-            device_name: str = devices[device].name
+        for device_name in device_names:
             if device_name == NAME:
                 pass
             else:
@@ -75,7 +118,7 @@ class DeviceNameCreator:
                     device_number = int(device_name[len(NAME) :])
                     if device_number > higest:
                         higest = device_number
-                except ValueError:
+                except (TypeError, ValueError):
                     pass
         # Add ONE to the highest value and append after NAME
         return f"{NAME} {higest+1}"
@@ -0,0 +1,91 @@
+"""Helpers for EMS configurations and update payloads"""
+
+from hashlib import sha256
+import json
+import math
+from typing import Any
+
+
+def get_config(data: dict | None) -> dict | None:
+    """Get the EMS configuration from the data of ems-config/v1/current."""
+    if not data:
+        return None
+    try:
+        return data["emsConfig"]["data"]
+    except (KeyError, TypeError):
+        return None
+
+
+def values_equal(sent: Any, received: Any) -> bool:
+    """Compare two values of a configuration. Numbers may differ in type."""
+    if isinstance(sent, bool) or isinstance(received, bool):
+        return sent is received
+    if isinstance(sent, (int, float)) and isinstance(received, (int, float)):
+        return math.isclose(sent, received, rel_tol=1e-9, abs_tol=1e-6)
+    return sent == received
+
+
+def config_matches(payload: dict, config: dict | None) -> bool:
+    """Check if all values of a payload are found in a configuration."""
+    if not isinstance(config, dict):
+        return False
+    for key, value in payload.items():
+        if key not in config:
+            return False
+        if isinstance(value, dict):
+            if not config_matches(value, config[key]):
+                return False
+        elif not values_equal(value, config[key]):
+            return False
+    return True
+
+
+def merge_payload(config: dict, payload: dict) -> dict:
+    """Create a configuration with the values of a payload merged into it."""
+    merged = dict(config)
+    for key, value in payload.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_payload(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def fingerprint(config: dict) -> str:
+    """Create a short fingerprint of a configuration.
+
+    Numbers that only differ in type, e.g. 750 and 750.0, give the same fingerprint.
+    """
+    serialized = json.dumps(_normalize(config), sort_keys=True, separators=(",", ":"))
+    return sha256(serialized.encode("utf-8")).hexdigest()[:16]
+
+
+def merge_three_way(local: dict, base: dict | None, remote: dict) -> dict:
+    """Merge a payload with a remote configuration, field by field.
+
+    Fields that are unchanged since the base configuration take the remote value.
+    Fields that were changed locally keep the local value.
+    """
+    if not isinstance(base, dict):
+        base = {}
+    if not isinstance(remote, dict):
+        remote = {}
+    merged = {}
+    for key, value in local.items():
+        if isinstance(value, dict):
+            merged[key] = merge_three_way(value, base.get(key), remote.get(key))
+        elif key in base and key in remote and values_equal(value, base[key]):
+            merged[key] = remote[key]
+        else:
+            merged[key] = value
+    return merged
@@ -0,0 +1,58 @@
+"""Running an operation on several Ferroamp systems in parallel"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+import logging
+from time import monotonic
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+# Operations in progress per account
+DEFAULT_FLEET_CONCURRENCY = 2
+
+
+async def async_run_fleet(
+    jobs: dict[str, tuple[Hashable, Callable[[], Awaitable[Any]]]],
+    max_concurrency: int = DEFAULT_FLEET_CONCURRENCY,
+) -> dict[str, Any]:
+    """Run one job per system, in parallel.
+
+    jobs maps a system to its account and its job. At most max_concurrency jobs
+    of the same account run at a time, while jobs of different accounts do not
+    wait for each other. A failed job does not stop the others.
+    Returns the result or the error, and the latency, of each system, and the
+    number of jobs that succeeded and failed.
+    """
+    semaphores: dict[Hashable, asyncio.Semaphore] = {}
+
+    async def run(system: str, account: Hashable, job: Callable[[], Awaitable[Any]]):
+        semaphore = semaphores.setdefault(account, asyncio.Semaphore(max_concurrency))
+        async with semaphore:
+            start = monotonic()
+            try:
+                result = await job()
+            except Exception as exception:  # pylint: disable=broad-except
+                _LOGGER.warning("Fleet job of %s failed: %s", system, exception)
+                return {
+                    "success": False,
+                    "error": str(exception) or type(exception).__name__,
+                    "latency": round(monotonic() - start, 3),
+                }
+            return {
+                "success": True,
+                "result": result,
+                "latency": round(monotonic() - start, 3),
+            }
+
+    start = monotonic()
+    results = await asyncio.gather(
+        *(run(system, account, job) for system, (account, job) in jobs.items())
+    )
+    succeeded = sum(1 for result in results if result["success"])
+    return {
+        "systems": dict(zip(jobs, results)),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "duration": round(monotonic() - start, 3),
+    }
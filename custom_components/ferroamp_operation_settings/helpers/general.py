@@ -4,13 +4,15 @@
 import logging
 from typing import Any
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, State
 from homeassistant.helpers.entity_registry import async_get as async_entity_registry_get
 from homeassistant.helpers.entity_registry import (
     EntityRegistry,
     RegistryEntry,
 )
 
+from ..const import DOMAIN_DATA
+
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,3 +39,21 @@ def get_parameter(config_entry: ConfigEntry, parameter: str, default_val: Any =
     if parameter in config_entry.data.keys():
         return config_entry.data.get(parameter)
     return default_val
+
+
+def get_power(state: State | None) -> float | None:
+    """Get the power of a sensor state in W, or None if it is not a number."""
+    if state is None:
+        return None
+    try:
+        power = float(state.state)
+    except ValueError:
+        return None
+    if state.attributes.get("unit_of_measurement") == "kW":
+        power *= 1000
+    return power
+
+
+def get_domain_data(hass: HomeAssistant, key: str) -> dict:
+    """Get a dict that is shared by all config entries"""
+    return hass.data.setdefault(DOMAIN_DATA, {}).setdefault(key, {})
@@ -0,0 +1,91 @@
+"""Reading of sensor history from the recorder"""
+
+from datetime import datetime, timedelta
+import logging
+
+import numpy as np
+
+from homeassistant.core import HomeAssistant, State
+
+_LOGGER = logging.getLogger(__name__)
+
+# Length of the period read from the recorder in one query
+HISTORY_CHUNK = timedelta(days=1)
+
+
+def sample_states(
+    states: list[State],
+    start: datetime,
+    steps: int,
+    step_seconds: float,
+    previous: float,
+) -> tuple[np.ndarray, float]:
+    """Sample numeric states at fixed steps from start.
+
+    A state is kept until it changes. previous is the value before the first
+    state, NaN if unknown. States that are not numbers are unknown.
+    Returns the samples, and the value at the end.
+    """
+    if not states:
+        return np.full(steps, previous, dtype=float), previous
+    times = np.empty(len(states))
+    values = np.empty(len(states))
+    for index, state in enumerate(states):
+        times[index] = (state.last_changed - start).total_seconds()
+        try:
+            values[index] = float(state.state)
+        except ValueError:
+            values[index] = np.nan
+    indices = np.searchsorted(times, np.arange(steps) * step_seconds, side="right") - 1
+    samples = np.where(indices >= 0, values[np.maximum(indices, 0)], previous)
+    return samples, float(values[-1])
+
+
+async def async_read_power_history(
+    hass: HomeAssistant,
+    entity_id: str,
+    start: datetime,
+    end: datetime,
+    step_seconds: float = 60,
+) -> np.ndarray:
+    """Read the power (W) of a sensor from the recorder, sampled at fixed steps.
+
+    The history is read one chunk at a time, and each chunk is sampled before
+    the next is read, so that all states are never loaded at once.
+    Unknown values are NaN. A sensor in kW is converted to W.
+    """
+    # pylint: disable=import-outside-toplevel
+    from homeassistant.components.recorder import get_instance, history
+
+    state = hass.states.get(entity_id)
+    scale = (
+        1000.0
+        if state is not None and state.attributes.get("unit_of_measurement") == "kW"
+        else 1.0
+    )
+    chunks = []
+    previous = np.nan
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + HISTORY_CHUNK, end)
+        states = await get_instance(hass).async_add_executor_job(
+            history.state_changes_during_period,
+            hass,
+            chunk_start,
+            chunk_end,
+            entity_id,
+            True,  # no_attributes
+            False,  # descending
+            None,  # limit
+            chunk_start == start,  # include_start_time_state
+        )
+        steps = int((chunk_end - chunk_start).total_seconds() // step_seconds)
+        samples, previous = sample_states(
+            states.get(entity_id, []), chunk_start, steps, step_seconds, previous
+        )
+        chunks.append(samples)
+        chunk_start += timedelta(seconds=steps * step_seconds)
+        if steps == 0:
+            break
+    _LOGGER.debug("Read %s chunks of history of %s", len(chunks), entity_id)
+    return np.concatenate(chunks) * scale if chunks else np.array([])
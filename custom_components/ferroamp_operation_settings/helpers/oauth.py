@@ -0,0 +1,123 @@
+"""OAuth 2.0 helpers (PKCE and tokens)"""
+
+from base64 import urlsafe_b64encode
+from hashlib import sha256
+import secrets
+import string
+import time
+from typing import Any
+from urllib.parse import urlencode
+
+CODE_CHALLENGE_METHOD = "S256"
+SCOPE = "openid"
+
+_UNRESERVED_CHARACTERS = string.ascii_letters + string.digits + "-._~"
+
+
+def create_code_verifier(length: int = 88) -> str:
+    """Create a PKCE code verifier (RFC 7636, section 4.1)."""
+    if not 43 <= length <= 128:
+        raise ValueError("Length must be between 43 and 128")
+    return "".join(secrets.choice(_UNRESERVED_CHARACTERS) for _ in range(length))
+
+
+def create_code_challenge(code_verifier: str) -> str:
+    """Create a S256 PKCE code challenge (RFC 7636, section 4.2)."""
+    digest = sha256(code_verifier.encode("ascii")).digest()
+    return urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+
+def prepare_authorization_uri(
+    base_uri: str,
+    client_id: str,
+    redirect_uri: str,
+    state: str,
+    code_challenge: str,
+    **kwargs: Any,
+) -> str:
+    """Create the URI of an authorization code request."""
+    params = {
+        "response_type": "code",
+        "client_id": client_id,
+        "redirect_uri": redirect_uri,
+        "scope": SCOPE,
+        "state": state,
+        "code_challenge": code_challenge,
+        "code_challenge_method": CODE_CHALLENGE_METHOD,
+    }
+    params.update(kwargs)
+    return f"{base_uri}?{urlencode(params)}"
+
+
+def prepare_token_body(
+    client_id: str, code: str, redirect_uri: str, code_verifier: str
+) -> str:
+    """Create the body of an access token request."""
+    return urlencode(
+        {
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": redirect_uri,
+            "client_id": client_id,
+            "code_verifier": code_verifier,
+        }
+    )
+
+
+def prepare_refresh_body(client_id: str, refresh_token: str) -> str:
+    """Create the body of a refresh token request."""
+    return urlencode(
+        {
+            "grant_type": "refresh_token",
+            "scope": SCOPE,
+            "refresh_token": refresh_token,
+            "client_id": client_id,
+        }
+    )
+
+
+class OAuthTokens:
+    """Access and refresh tokens with precomputed expiration times"""
+
+    __slots__ = ("access_token", "refresh_token", "expires_at", "refresh_expires_at")
+
+    def __init__(
+        self,
+        access_token: str,
+        refresh_token: str | None,
+        expires_at: float,
+        refresh_expires_at: float | None = None,
+    ) -> None:
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.refresh_expires_at = refresh_expires_at
+
+    @classmethod
+    def from_response(
+        cls, json_data: dict[str, Any], now: float | None = None
+    ) -> "OAuthTokens":
+        """Create tokens from a token endpoint response.
+
+        Raises KeyError if there is no access token in the response.
+        """
+        if now is None:
+            now = time.time()
+        expires_in = json_data.get("expires_in")
+        refresh_expires_in = json_data.get("refresh_expires_in")
+        return cls(
+            access_token=json_data["access_token"],
+            refresh_token=json_data.get("refresh_token"),
+            expires_at=now + int(expires_in) if expires_in is not None else now,
+            refresh_expires_at=(
+                now + int(refresh_expires_in)
+                if refresh_expires_in is not None
+                else None
+            ),
+        )
+
+    def expires_within(self, seconds: float, now: float | None = None) -> bool:
+        """Check if the access token expires within the given number of seconds."""
+        if now is None:
+            now = time.time()
+        return self.expires_at - now < seconds
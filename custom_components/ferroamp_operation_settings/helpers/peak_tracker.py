@@ -0,0 +1,172 @@
+"""Tracking of the hourly power peaks of the month"""
+
+from collections import deque
+from datetime import datetime, timedelta
+import heapq
+
+from homeassistant.util import dt as dt_util
+
+from ..const import DEFAULT_PEAK_COUNT
+
+# Hourly means kept, about a month
+HOURS_KEPT = 31 * 24
+
+
+def _hour_of(when: datetime) -> datetime:
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+class PeakTracker:
+    """The hourly mean grid power, and the top hourly means of the month.
+
+    Power samples are integrated over the hour. When an hour is completed, its
+    mean is added to a ring buffer of hourly means, and to a min-heap of the top
+    hourly means of the month, so an update is O(log N) with N peaks.
+    Exported power counts as zero.
+    """
+
+    def __init__(self, count: int = DEFAULT_PEAK_COUNT) -> None:
+        self.count = count
+        self.hours: deque[tuple[str, float]] = deque(maxlen=HOURS_KEPT)
+        self.peaks: list[tuple[float, str]] = []
+        self.month: tuple[int, int] | None = None
+        self._hour_start: datetime | None = None
+        self._energy = 0.0  # Ws during the current hour
+        self._covered = 0.0  # Seconds with known power during the current hour
+        self._last_time: datetime | None = None
+        self._last_power: float | None = None
+
+    def add(self, when: datetime, power: float) -> bool:
+        """Add a power sample (W). Returns True if an hour was completed."""
+        if self._last_time is not None and when < self._last_time:
+            return False
+        hour_start = _hour_of(when)
+        completed = False
+        if self._hour_start is None:
+            self._hour_start = hour_start
+        while self._hour_start < hour_start:
+            hour_end = self._hour_start + timedelta(hours=1)
+            self._integrate(hour_end)
+            completed = self._complete_hour() or completed
+            self._hour_start = hour_end
+        self._integrate(when)
+        self._last_power = max(power, 0.0)
+        return completed
+
+    def _integrate(self, until: datetime) -> None:
+        if self._last_time is not None and self._last_power is not None:
+            seconds = (until - max(self._last_time, self._hour_start)).total_seconds()
+            if seconds > 0:
+                self._energy += self._last_power * seconds
+                self._covered += seconds
+        self._last_time = until
+
+    def _complete_hour(self) -> bool:
+        if self._covered <= 0:
+            return False
+        mean = self._energy / self._covered
+        self._energy = 0.0
+        self._covered = 0.0
+        hour = self._hour_start.isoformat()
+        self.hours.append((hour, mean))
+        month = (self._hour_start.year, self._hour_start.month)
+        if month != self.month:
+            self.month = month
+            self.peaks = []
+        if len(self.peaks) < self.count:
+            heapq.heappush(self.peaks, (mean, hour))
+        elif mean > self.peaks[0][0]:
+            heapq.heapreplace(self.peaks, (mean, hour))
+        return True
+
+    def _current(self, now: datetime) -> tuple[float, float, float]:
+        """Get the energy and the covered seconds until now, and the seconds left."""
+        energy = self._energy
+        covered = self._covered
+        hour_start = _hour_of(now)
+        if self._hour_start != hour_start:
+            # The hour has not got any samples yet.
+            energy = covered = 0.0
+        if self._last_time is not None and self._last_power is not None:
+            seconds = (now - max(self._last_time, hour_start)).total_seconds()
+            if seconds > 0:
+                energy += self._last_power * seconds
+                covered += seconds
+        left = (hour_start + timedelta(hours=1) - now).total_seconds()
+        return energy, covered, left
+
+    def projected(self, now: datetime) -> float | None:
+        """Get the mean of the current hour, if the power stays the same."""
+        if self._last_power is None:
+            return None
+        energy, covered, left = self._current(now)
+        return (energy + self._last_power * left) / (covered + left)
+
+    def target(self, now: datetime) -> float | None:
+        """Get the hourly mean that would not add a new top peak.
+
+        This is the lowest of the top peaks, when the month has got all of them.
+        """
+        if (now.year, now.month) != self.month or len(self.peaks) < self.count:
+            return None
+        return self.peaks[0][0]
+
+    def discharge_threshold(self, now: datetime) -> float | None:
+        """Get the grid power to keep for the rest of the hour, to stay at target."""
+        target = self.target(now)
+        if target is None:
+            return None
+        energy, covered, left = self._current(now)
+        if left <= 0:
+            return target
+        return max((target * (covered + left) - energy) / left, 0.0)
+
+    def as_dict(self) -> dict:
+        """Get the state, to be stored as JSON."""
+        return {
+            "month": list(self.month) if self.month is not None else None,
+            "hours": [[hour, mean] for hour, mean in self.hours],
+            "hour_start": (
+                self._hour_start.isoformat() if self._hour_start is not None else None
+            ),
+            "energy": self._energy,
+            "covered": self._covered,
+            "last_time": (
+                self._last_time.isoformat() if self._last_time is not None else None
+            ),
+        }
+
+    def restore(self, stored: dict) -> None:
+        """Restore a stored state.
+
+        The power is not known for the time since the state was stored, so it is
+        left out until the next sample.
+        """
+        self.month = tuple(stored["month"]) if stored.get("month") else None
+        self.hours = deque(
+            ((hour, mean) for hour, mean in stored.get("hours", [])),
+            maxlen=HOURS_KEPT,
+        )
+        # The peaks are found again, in case the number of peaks has changed.
+        self.peaks = heapq.nlargest(
+            self.count,
+            (
+                (mean, hour)
+                for hour, mean in self.hours
+                if self.month is not None and hour.startswith("%d-%02d" % self.month)
+            ),
+        )
+        heapq.heapify(self.peaks)
+        self._hour_start = (
+            dt_util.parse_datetime(stored["hour_start"])
+            if stored.get("hour_start")
+            else None
+        )
+        self._energy = stored.get("energy", 0.0)
+        self._covered = stored.get("covered", 0.0)
+        self._last_time = (
+            dt_util.parse_datetime(stored["last_time"])
+            if stored.get("last_time")
+            else None
+        )
+        self._last_power = None
@@ -0,0 +1,79 @@
+"""Staggered polling of the Ferroamp portal from many config entries"""
+
+from collections.abc import Hashable
+import itertools
+import math
+import random
+
+# Share of the distance between two slots that a poll is moved at random
+JITTER_SHARE = 0.1
+
+
+class PollScheduler:
+    """Spread the polls of all pollers evenly over the poll interval.
+
+    Each poller gets a slot, and the slots are evenly spaced over the interval,
+    so that N pollers with the same interval poll once per interval / N instead
+    of in bursts. The slots go round the accounts, so that the polls of one
+    account are as far apart as possible, within its rate limit. Each poll is
+    moved at random by a share of the distance between slots. The slots are
+    evenly spaced as a share of the interval of each poller, so pollers with
+    different intervals are only spread approximately.
+    """
+
+    def __init__(
+        self, jitter_share: float = JITTER_SHARE, seed: int | None = None
+    ) -> None:
+        self.jitter_share = jitter_share
+        self._random = random.Random(seed)
+        self._pollers: dict[Hashable, tuple[Hashable, float]] = {}
+        self._phases: dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._pollers)
+
+    def register(self, poller: Hashable, account: Hashable, interval: float) -> None:
+        """Add a poller, or change its interval, and move all to new slots."""
+        self._pollers[poller] = (account, interval)
+        self._assign_slots()
+
+    def unregister(self, poller: Hashable) -> None:
+        """Remove a poller, and move the others to new slots."""
+        if self._pollers.pop(poller, None) is not None:
+            self._assign_slots()
+
+    def _assign_slots(self) -> None:
+        by_account: dict[Hashable, list[Hashable]] = {}
+        for poller, (account, _) in self._pollers.items():
+            by_account.setdefault(account, []).append(poller)
+        order = [
+            poller
+            for pollers in itertools.zip_longest(*by_account.values())
+            for poller in pollers
+            if poller is not None
+        ]
+        self._phases = {
+            poller: index / len(order) for index, poller in enumerate(order)
+        }
+
+    def phase(self, poller: Hashable) -> float:
+        """Get the slot of a poller, as a share of its interval."""
+        return self._phases[poller]
+
+    def next_delay(self, poller: Hashable, now: float, delay: float) -> float:
+        """Get the seconds until the next poll, in the slot of the poller.
+
+        now is a monotonic time, and delay is the wanted delay, e.g. the
+        interval or a longer one after failures. The poll is in the slot that
+        is nearest to now + delay.
+        """
+        _, interval = self._pollers[poller]
+        offset = self._phases[poller] * interval
+        cycle = math.ceil((now + delay - interval / 2 - offset) / interval)
+        jitter = (
+            self._random.uniform(-1, 1)
+            * self.jitter_share
+            * interval
+            / len(self._pollers)
+        )
+        return max(offset + cycle * interval + jitter - now, 0.0)
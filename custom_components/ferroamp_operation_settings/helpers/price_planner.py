@@ -0,0 +1,152 @@
+"""Price-driven planning of battery charging and discharging"""
+
+from datetime import datetime, timedelta
+import logging
+from typing import Any
+
+import numpy as np
+
+from homeassistant.util import dt as dt_util
+
+from ..const import BATTERY_CHARGE, BATTERY_DISCHARGE, BATTERY_OFF, MODE_DEFAULT
+from .profile import PROFILE_BATTERY_POWER_MODE, PROFILE_MODE
+
+_LOGGER = logging.getLogger(__name__)
+
+# Round-trip efficiency of the battery, split equally on charge and discharge
+DEFAULT_EFFICIENCY = 0.9
+
+ACTIONS = [BATTERY_OFF, BATTERY_CHARGE, BATTERY_DISCHARGE]
+
+
+def _parse_entry(entry: Any) -> tuple[datetime, float] | None:
+    if not isinstance(entry, dict):
+        return None
+    start = entry.get("start", entry.get("time", entry.get("startsAt")))
+    value = entry.get("value", entry.get("price", entry.get("total")))
+    if start is None or value is None:
+        return None
+    if not isinstance(start, datetime):
+        start = dt_util.parse_datetime(str(start))
+    if start is None:
+        return None
+    try:
+        return dt_util.as_local(start), float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_prices(attributes: dict) -> tuple[list[datetime], np.ndarray, float]:
+    """Read a price series from the attributes of a price sensor.
+
+    The attributes raw_today and raw_tomorrow (e.g. Nord Pool), or prices, are
+    lists of items with a start time and a value. Returns the start times,
+    the prices and the length of a slot in hours.
+    """
+    entries = []
+    for key in ("raw_today", "raw_tomorrow", "prices"):
+        for entry in attributes.get(key) or []:
+            parsed = _parse_entry(entry)
+            if parsed is not None:
+                entries.append(parsed)
+    entries = sorted(dict(entries).items())
+    if len(entries) < 2:
+        raise ValueError("The price sensor has no price series")
+    starts = [entry[0] for entry in entries]
+    prices = np.array([entry[1] for entry in entries], dtype=float)
+    slot_hours = (
+        min(
+            (later - earlier).total_seconds()
+            for earlier, later in zip(starts, starts[1:])
+        )
+        / 3600
+    )
+    return starts, prices, slot_hours
+
+
+def plan_battery(
+    prices: np.ndarray,
+    slot_hours: float,
+    capacity: float,
+    power: float,
+    soc_low: float,
+    soc_high: float,
+    soc_start: float,
+    efficiency: float = DEFAULT_EFFICIENCY,
+) -> tuple[np.ndarray, np.ndarray, float]:
+    """Find the plan with the lowest cost by dynamic programming over the horizon.
+
+    In each slot, the battery is charged or discharged at full power, or is off.
+    The state of charge is kept between soc_low and soc_high (%). The energy left
+    at the end of the horizon is valued at the median price.
+    Capacity is in kWh and power in W.
+    Returns the index in ACTIONS per slot, the state of charge (%) at the start
+    of each slot, and the cost of the plan.
+    """
+    horizon = len(prices)
+    step = power / 1000 * slot_hours  # kWh per slot
+    low = capacity * soc_low / 100
+    high = capacity * soc_high / 100
+    if step <= 0 or high <= low:
+        raise ValueError("No room to charge or discharge the battery")
+    levels = int((high - low) / step + 1e-9) + 1
+    energies = low + np.arange(levels) * step
+    start = int(
+        np.clip(round((capacity * soc_start / 100 - low) / step), 0, levels - 1)
+    )
+
+    eta = np.sqrt(efficiency)
+    charge_cost = prices * step / eta
+    discharge_cost = -prices * step * eta
+
+    # Cost to go from each level, backwards from the end of the horizon
+    value = -(energies - low) * np.median(prices) * eta
+    policy = np.zeros((horizon, levels), dtype=np.int8)
+    candidates = np.empty((3, levels))
+    for slot in range(horizon - 1, -1, -1):
+        candidates[0] = value
+        candidates[1, :-1] = charge_cost[slot] + value[1:]
+        candidates[1, -1] = np.inf
+        candidates[2, 1:] = discharge_cost[slot] + value[:-1]
+        candidates[2, 0] = np.inf
+        policy[slot] = np.argmin(candidates, axis=0)
+        value = candidates[policy[slot], np.arange(levels)]
+
+    actions = np.zeros(horizon, dtype=np.int8)
+    path = np.zeros(horizon, dtype=int)
+    level = start
+    for slot in range(horizon):
+        path[slot] = level
+        actions[slot] = policy[slot, level]
+        level += {0: 0, 1: 1, 2: -1}[int(actions[slot])]
+    cost = float(np.sum(np.where(actions == 1, charge_cost, 0.0)))
+    cost += float(np.sum(np.where(actions == 2, discharge_cost, 0.0)))
+    return actions, energies[path] / capacity * 100, cost
+
+
+def plan_profiles(
+    starts: list[datetime], actions: np.ndarray, power: float
+) -> list[tuple[datetime, dict]]:
+    """Convert the actions of a plan to settings profiles."""
+    steps = []
+    for start, action in zip(starts, actions):
+        profile = {
+            PROFILE_MODE: MODE_DEFAULT,
+            PROFILE_BATTERY_POWER_MODE: ACTIONS[int(action)],
+        }
+        if ACTIONS[int(action)] == BATTERY_CHARGE:
+            profile["charge_reference"] = float(power)
+        elif ACTIONS[int(action)] == BATTERY_DISCHARGE:
+            profile["discharge_reference"] = float(power)
+        steps.append((start, profile))
+    return steps
+
+
+def remaining(
+    starts: list[datetime], prices: np.ndarray, slot_hours: float, now: datetime
+) -> tuple[list[datetime], np.ndarray]:
+    """Drop the slots that have ended."""
+    first = 0
+    while first < len(starts) and starts[first] + timedelta(hours=slot_hours) <= now:
+        first += 1
+    return starts[first:], prices[first:]
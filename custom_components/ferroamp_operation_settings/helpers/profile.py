@@ -0,0 +1,49 @@
+"""Settings profiles: a set of entity values that are written together"""
+
+import voluptuous as vol
+
+import homeassistant.helpers.config_validation as cv
+
+from ..const import BATTERY_POWER_MODES, MODES
+
+PROFILE_MODE = "mode"
+PROFILE_BATTERY_POWER_MODE = "battery_power_mode"
+
+# Profile keys and the coordinator attributes of the entities they set
+PROFILE_SELECTS = {
+    PROFILE_MODE: "select_mode",
+    PROFILE_BATTERY_POWER_MODE: "select_battery_power_mode",
+}
+PROFILE_NUMBERS = {
+    "ace_threshold": "number_ace_threshold",
+    "discharge_threshold": "number_discharge_threshold",
+    "charge_threshold": "number_charge_threshold",
+    "import_threshold": "number_import_threshold",
+    "export_threshold": "number_export_threshold",
+    "discharge_reference": "number_discharge_reference",
+    "charge_reference": "number_charge_reference",
+    "lower_reference": "number_lower_reference",
+    "upper_reference": "number_upper_reference",
+}
+PROFILE_SWITCHES = {
+    "pv": "switch_pv",
+    "ace": "switch_ace",
+    "limit_import": "switch_limit_import",
+    "limit_export": "switch_limit_export",
+}
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(PROFILE_MODE): vol.In(MODES),
+        vol.Optional(PROFILE_BATTERY_POWER_MODE): vol.In(BATTERY_POWER_MODES),
+        **{vol.Optional(key): vol.Coerce(float) for key in PROFILE_NUMBERS},
+        **{vol.Optional(key): cv.boolean for key in PROFILE_SWITCHES},
+    }
+)
+
+
+def profile_key(profile: dict | None) -> tuple | None:
+    """Create a hashable key of a profile, for comparisons."""
+    if profile is None:
+        return None
+    return tuple(sorted(profile.items()))
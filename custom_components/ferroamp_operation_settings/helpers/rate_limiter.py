@@ -0,0 +1,125 @@
+"""Client-side rate limiting of requests to the Ferroamp portal"""
+
+import asyncio
+import itertools
+import logging
+from time import monotonic
+from typing import SupportsInt
+
+_LOGGER = logging.getLogger(__name__)
+
+ENDPOINT_AUTH = "auth"
+ENDPOINT_READ = "read"
+ENDPOINT_WRITE = "write"
+
+# Requests per second and burst size per endpoint class
+DEFAULT_RATE_LIMITS: dict[str, tuple[float, float]] = {
+    ENDPOINT_AUTH: (0.2, 10),
+    ENDPOINT_READ: (1.0, 5),
+    ENDPOINT_WRITE: (0.1, 3),
+}
+
+
+class TokenBucket:
+    """Token bucket where waiting callers are served by priority, then in order.
+
+    A lower priority value is served first, as by the request scheduler.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic()
+        self._waiters: list[tuple[SupportsInt, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    def configure(self, rate: float, capacity: float) -> None:
+        """Change the rate and the capacity."""
+        self._refill()
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = min(self._tokens, capacity)
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(
+            self._capacity, self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+
+    async def async_acquire(self, priority: SupportsInt = 0) -> float:
+        """Take a token, waiting for it if needed. Returns the time waited."""
+        start = monotonic()
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((priority, next(self._counter), future))
+        if self._timer is None:
+            self._serve()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The token was granted just before the cancellation.
+                self._tokens += 1
+            self._waiters = [
+                waiter for waiter in self._waiters if waiter[2] is not future
+            ]
+            raise
+        return monotonic() - start
+
+    def _serve(self) -> None:
+        """Give the tokens to the waiting callers, and wait for the next token."""
+        self._timer = None
+        self._refill()
+        while self._waiters and self._tokens >= 1:
+            # A priority can rise while waiting, so the order is not kept.
+            waiter = min(self._waiters, key=lambda item: (int(item[0]), item[1]))
+            self._waiters.remove(waiter)
+            if not waiter[2].done():
+                self._tokens -= 1
+                waiter[2].set_result(None)
+        if self._waiters and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                (1 - self._tokens) / self._rate, self._serve
+            )
+
+
+class RateLimiter:
+    """Token buckets per endpoint class of one account"""
+
+    def __init__(self, limits: dict[str, tuple[float, float]] | None = None) -> None:
+        if limits is None:
+            limits = DEFAULT_RATE_LIMITS
+        self._buckets = {
+            endpoint_class: TokenBucket(rate, capacity)
+            for endpoint_class, (rate, capacity) in limits.items()
+        }
+        self.limited = 0
+        self.wait_time = 0.0
+
+    def configure(self, endpoint_class: str, rate: float, capacity: float) -> None:
+        """Change the limit of an endpoint class."""
+        if endpoint_class in self._buckets:
+            self._buckets[endpoint_class].configure(rate, capacity)
+        else:
+            self._buckets[endpoint_class] = TokenBucket(rate, capacity)
+
+    async def async_acquire(
+        self, endpoint_class: str, priority: SupportsInt = 0
+    ) -> None:
+        """Wait until a request of the endpoint class is allowed."""
+        bucket = self._buckets.get(endpoint_class)
+        if bucket is None:
+            return
+        waited = await bucket.async_acquire(priority)
+        if waited > 0.001:
+            self.limited += 1
+            self.wait_time += waited
+            _LOGGER.debug(
+                "%s request delayed %.2fs by rate limit", endpoint_class, waited
+            )
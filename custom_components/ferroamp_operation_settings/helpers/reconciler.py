@@ -0,0 +1,98 @@
+"""Periodic reconciliation of the desired and the actual configuration"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from datetime import datetime
+import logging
+from time import monotonic
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .poll_scheduler import PollScheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+# The interval is at most multiplied by this after failures.
+MAX_BACKOFF_FACTOR = 8
+
+
+class Reconciler:
+    """Run a reconciliation with an interval, and back off after failures.
+
+    The reconcile callable returns True if a drift was corrected, and raises
+    an exception if the reconciliation failed. With a scheduler, the
+    reconciliations are made in a slot of the scheduler, shared with the
+    reconcilers of other config entries.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        interval: float,
+        reconcile: Callable[[], Awaitable[bool]],
+        scheduler: PollScheduler | None = None,
+        account: Hashable = None,
+    ) -> None:
+        self._hass = hass
+        self.interval = interval
+        self._reconcile = reconcile
+        self._scheduler = scheduler
+        self._account = account
+        self._unsub: CALLBACK_TYPE | None = None
+        self._task: asyncio.Task | None = None
+        self._active = False
+        self.failures = 0
+        self.drift = 0
+
+    @property
+    def delay(self) -> float:
+        """Seconds until the next reconciliation."""
+        return self.interval * min(2**self.failures, MAX_BACKOFF_FACTOR)
+
+    def start(self) -> None:
+        """Start reconciling."""
+        self.stop()
+        self._active = True
+        if self._scheduler is not None:
+            self._scheduler.register(self, self._account, self.interval)
+        self._schedule()
+
+    def stop(self) -> None:
+        """Stop reconciling."""
+        self._active = False
+        if self._scheduler is not None:
+            self._scheduler.unregister(self)
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    def _schedule(self) -> None:
+        delay = self.delay
+        if self._scheduler is not None:
+            delay = self._scheduler.next_delay(self, monotonic(), delay)
+        self._unsub = async_call_later(self._hass, delay, self._fire)
+
+    @callback
+    def _fire(self, date_time: datetime) -> None:  # pylint: disable=unused-argument
+        self._unsub = None
+        self._task = self._hass.async_create_task(self.async_run())
+
+    async def async_run(self) -> None:
+        """Reconcile once and schedule the next reconciliation."""
+        try:
+            if await self._reconcile():
+                self.drift += 1
+            self.failures = 0
+        except Exception as exception:  # pylint: disable=broad-except
+            self.failures += 1
+            _LOGGER.warning(
+                "Reconciliation failed, next attempt in %s seconds: %s",
+                self.delay,
+                exception,
+            )
+        if self._active and self._unsub is None:
+            self._schedule()
@@ -0,0 +1,93 @@
+"""Closed-loop control of the battery reference to hold a grid power setpoint"""
+
+from collections import deque
+
+# Weight of a new sample in the averages of the loop timing
+TIMING_WEIGHT = 0.2
+
+# Writes are counted over this many seconds for the write rate
+WRITE_RATE_WINDOW = 3600.0
+
+
+class ReferenceController:
+    """Compute a battery reference that brings the grid power to a setpoint.
+
+    The reference is the battery power in W, positive when charging and
+    negative when discharging. A grid power within the deadband of the
+    setpoint gives no change. When the reference would change between charging
+    and discharging, it must exceed the hysteresis in the new direction, and
+    is otherwise zero. A new reference is not given until min_interval seconds
+    after the last write.
+    """
+
+    def __init__(
+        self,
+        setpoint: float,
+        deadband: float,
+        hysteresis: float,
+        min_interval: float,
+        max_power: float | None = None,
+    ) -> None:
+        self.setpoint = setpoint
+        self.deadband = deadband
+        self.hysteresis = hysteresis
+        self.min_interval = min_interval
+        self.max_power = max_power
+        self.samples = 0
+        self.held = 0
+        self.writes = 0
+        self.interval: float | None = None
+        self.latency: float | None = None
+        self._last_sample: float | None = None
+        self._last_write: float | None = None
+        self._writes: deque[float] = deque()
+
+    def step(self, now: float, grid_power: float, reference: float) -> float | None:
+        """Get a new reference from a grid power sample, or None to keep it.
+
+        now is a monotonic time in seconds, and reference is the current one.
+        """
+        self.samples += 1
+        if self._last_sample is not None:
+            elapsed = now - self._last_sample
+            self.interval = (
+                elapsed
+                if self.interval is None
+                else self.interval + TIMING_WEIGHT * (elapsed - self.interval)
+            )
+        self._last_sample = now
+
+        error = grid_power - self.setpoint
+        if abs(error) <= self.deadband:
+            return None
+        target = reference - error
+        if self.max_power is not None:
+            target = min(max(target, -self.max_power), self.max_power)
+        if target * reference < 0 or reference == 0:
+            # Changing direction, or starting
+            if abs(target) < self.hysteresis:
+                target = 0.0
+        if target == reference:
+            return None
+        if self._last_write is not None and now - self._last_write < self.min_interval:
+            self.held += 1
+            return None
+        return target
+
+    def record_write(self, start: float, end: float) -> None:
+        """Record a write of a new reference, from start to end (monotonic)."""
+        self._last_write = start
+        duration = end - start
+        self.latency = (
+            duration
+            if self.latency is None
+            else self.latency + TIMING_WEIGHT * (duration - self.latency)
+        )
+        self._writes.append(start)
+        self.writes += 1
+
+    def write_rate(self, now: float) -> float:
+        """Get the number of writes per hour, during the last hour."""
+        while self._writes and self._writes[0] < now - WRITE_RATE_WINDOW:
+            self._writes.popleft()
+        return len(self._writes) * 3600 / WRITE_RATE_WINDOW
@@ -0,0 +1,163 @@
+"""Prioritized scheduling of requests to the Ferroamp portal"""
+
+import asyncio
+from collections.abc import Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+import itertools
+import logging
+from time import monotonic
+from typing import AsyncIterator, Union
+
+_LOGGER = logging.getLogger(__name__)
+
+# Lower value is served first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Requests in flight per account
+DEFAULT_MAX_CONCURRENCY = 2
+
+# The portal is considered slow when the average request takes longer than this.
+SLOW_THRESHOLD = 10.0
+LATENCY_SMOOTHING = 0.2
+
+
+class SharedPriority:
+    """Priority of work that is shared by several callers.
+
+    The work is served with the highest priority among the callers that have
+    joined it, also the ones that join while its requests are waiting.
+    """
+
+    def __init__(self) -> None:
+        self._callers: list[Union[int, "SharedPriority"]] = []
+
+    def join(self) -> None:
+        """Add the priority of the calling context."""
+        caller = _request_priority.get()
+        if caller is not self and caller not in self._callers:
+            self._callers.append(caller)
+
+    def __int__(self) -> int:
+        return min(
+            (int(caller) for caller in self._callers), default=PRIORITY_INTERACTIVE
+        )
+
+
+Priority = Union[int, SharedPriority]
+
+_request_priority: ContextVar[Priority] = ContextVar(
+    "ferroamp_request_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+@contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Run the requests made within the context with the given priority.
+
+    Tasks created within the context inherit the priority.
+    """
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def get_request_priority() -> Priority:
+    """Get the priority of requests made in the current context.
+
+    A shared priority can change, so use int() to get its current value.
+    """
+    return _request_priority.get()
+
+
+class RequestShedError(Exception):
+    """A background request was shed because the portal is slow."""
+
+
+class RequestScheduler:
+    """Limit the number of concurrent requests and serve them by priority.
+
+    When the portal is slow, background requests are shed instead of queued
+    as soon as there are other requests in flight.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+        self._max_concurrency = max_concurrency
+        self._active = 0
+        self._waiters: list[tuple[Priority, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self.latency: float | None = None
+        self.shed = 0
+
+    @property
+    def slow(self) -> bool:
+        """True if the portal is slow."""
+        return self.latency is not None and self.latency > SLOW_THRESHOLD
+
+    @property
+    def queued(self) -> int:
+        """Number of requests waiting to be sent."""
+        return sum(1 for waiter in self._waiters if not waiter[2].done())
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority | None = None) -> AsyncIterator[None]:
+        """Wait for a free slot and hold it while the request is made.
+
+        Raises RequestShedError if a background request is shed.
+        """
+        if priority is None:
+            priority = get_request_priority()
+        await self._acquire(priority)
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self._record_latency(monotonic() - start)
+            self._release()
+
+    async def _acquire(self, priority: Priority) -> None:
+        if self._active < self._max_concurrency and not self.queued:
+            self._active += 1
+            return
+        if self.slow:
+            if int(priority) >= PRIORITY_BACKGROUND:
+                self.shed += 1
+                _LOGGER.debug("Background request shed, latency = %.1fs", self.latency)
+                raise RequestShedError()
+            self._shed_waiters()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just before the cancellation.
+                self._release()
+            raise
+
+    def _shed_waiters(self) -> None:
+        """Shed the background requests that are waiting."""
+        for waiter_priority, _, future in self._waiters:
+            if int(waiter_priority) >= PRIORITY_BACKGROUND and not future.done():
+                self.shed += 1
+                future.set_exception(RequestShedError())
+
+    def _release(self) -> None:
+        self._active -= 1
+        while self._waiters and self._active < self._max_concurrency:
+            # A shared priority can rise while waiting, so the order is not kept.
+            waiter = min(self._waiters, key=lambda item: (int(item[0]), item[1]))
+            self._waiters.remove(waiter)
+            future = waiter[2]
+            if not future.done():
+                self._active += 1
+                future.set_result(None)
+
+    def _record_latency(self, elapsed: float) -> None:
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += LATENCY_SMOOTHING * (elapsed - self.latency)
@@ -0,0 +1,240 @@
+"""Time-of-use schedule of settings profiles"""
+
+from abc import ABC, abstractmethod
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import date, datetime, time, timedelta
+import logging
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.util import dt as dt_util
+
+from .profile import PROFILE_SCHEMA, profile_key
+
+_LOGGER = logging.getLogger(__name__)
+
+SLOT_START = "start"
+SLOT_END = "end"
+SLOT_PROFILE = "profile"
+
+MINUTES_PER_DAY = 24 * 60
+
+SLOT_SCHEMA = vol.Schema(
+    {
+        vol.Required(SLOT_START): cv.time,
+        vol.Required(SLOT_END): cv.time,
+        vol.Required(SLOT_PROFILE): PROFILE_SCHEMA,
+    }
+)
+SCHEDULE_SCHEMA = vol.All(cv.ensure_list, [SLOT_SCHEMA])
+
+
+def _minute_of_day(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def serialize_schedule(slots: list[dict]) -> list[dict]:
+    """Convert validated slots to something that can be stored as JSON."""
+    return [
+        {
+            SLOT_START: slot[SLOT_START].strftime("%H:%M"),
+            SLOT_END: slot[SLOT_END].strftime("%H:%M"),
+            SLOT_PROFILE: dict(slot[SLOT_PROFILE]),
+        }
+        for slot in slots
+    ]
+
+
+def compile_schedule(slots: list[dict]) -> list[tuple[int, dict]]:
+    """Compile validated slots into the transitions of a day.
+
+    A transition is the minute of the day and the profile to write. A later slot
+    takes precedence over an earlier one where they overlap. A slot that ends at
+    or before its start continues over midnight. Between slots, the settings
+    are kept, and no transition is made where the profile does not change.
+    """
+    intervals: list[tuple[int, int, dict]] = []
+    for slot in slots:
+        start = _minute_of_day(slot[SLOT_START])
+        end = _minute_of_day(slot[SLOT_END])
+        if end > start:
+            intervals.append((start, end, slot[SLOT_PROFILE]))
+        else:
+            intervals.append((start, MINUTES_PER_DAY, slot[SLOT_PROFILE]))
+            intervals.append((0, end, slot[SLOT_PROFILE]))
+
+    boundaries = sorted(
+        {0, MINUTES_PER_DAY}
+        | {interval[0] for interval in intervals}
+        | {interval[1] for interval in intervals}
+    )
+    segments: list[tuple[int, dict]] = []
+    for segment_start, segment_end in zip(boundaries, boundaries[1:]):
+        profile = None
+        for start, end, slot_profile in intervals:
+            if start <= segment_start and segment_end <= end:
+                profile = slot_profile
+        if profile is not None:
+            segments.append((segment_start, profile))
+
+    if not segments:
+        return []
+
+    # The day wraps around, so the last profile of the day precedes the first.
+    transitions: list[tuple[int, dict]] = []
+    previous = profile_key(segments[-1][1])
+    for minute, profile in segments:
+        key = profile_key(profile)
+        if key != previous:
+            transitions.append((minute, profile))
+            previous = key
+    if not transitions:
+        # The same profile all the time
+        transitions.append(segments[0])
+    return transitions
+
+
+def _at(day: date, minute: int, tzinfo: Any) -> datetime:
+    return datetime.combine(day, time(minute // 60, minute % 60), tzinfo=tzinfo)
+
+
+def next_transition(
+    transitions: list[tuple[int, dict]], now: datetime
+) -> tuple[datetime, dict]:
+    """Get the time and the profile of the first transition after now."""
+    for minute, profile in transitions:
+        when = _at(now.date(), minute, now.tzinfo)
+        if when > now:
+            return when, profile
+    minute, profile = transitions[0]
+    return _at(now.date() + timedelta(days=1), minute, now.tzinfo), profile
+
+
+def current_profile(transitions: list[tuple[int, dict]], now: datetime) -> dict:
+    """Get the profile of the last transition at or before now."""
+    active = transitions[-1][1]
+    for minute, profile in transitions:
+        if _at(now.date(), minute, now.tzinfo) <= now:
+            active = profile
+    return active
+
+
+class _TransitionRunner(ABC):
+    """Write profiles at transitions, using one timer for the next transition"""
+
+    def __init__(
+        self, hass: HomeAssistant, apply: Callable[[dict], Awaitable[Any]]
+    ) -> None:
+        self._hass = hass
+        self._apply = apply
+        self._unsub: CALLBACK_TYPE | None = None
+        self._task: asyncio.Task | None = None
+        self.next_time: datetime | None = None
+
+    @abstractmethod
+    def _next(self, now: datetime) -> tuple[datetime, dict] | None:
+        """Get the time and the profile of the first transition after now."""
+
+    @abstractmethod
+    def _current(self, now: datetime) -> dict | None:
+        """Get the profile that is active now."""
+
+    def start(self, apply_current: bool = False) -> None:
+        """Start, and optionally write the current profile."""
+        self.stop()
+        now = dt_util.now()
+        if apply_current:
+            profile = self._current(now)
+            if profile is not None:
+                self._task = self._hass.async_create_task(self._async_apply(profile))
+        self._schedule(now)
+
+    def stop(self) -> None:
+        """Stop."""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self.next_time = None
+
+    def _schedule(self, now: datetime) -> None:
+        upcoming = self._next(now)
+        if upcoming is None:
+            self.next_time = None
+            return
+        self.next_time, profile = upcoming
+        _LOGGER.debug("Next transition at %s", self.next_time)
+
+        @callback
+        def fire(date_time: datetime) -> None:  # pylint: disable=unused-argument
+            self._unsub = None
+            self._task = self._hass.async_create_task(self._async_apply(profile))
+            self._schedule(dt_util.now())
+
+        self._unsub = async_track_point_in_time(self._hass, fire, self.next_time)
+
+    async def _async_apply(self, profile: dict) -> None:
+        try:
+            await self._apply(profile)
+        except Exception as exception:  # pylint: disable=broad-except
+            _LOGGER.error("Could not apply the scheduled settings: %s", exception)
+
+
+class ScheduleRunner(_TransitionRunner):
+    """Write the profiles of a daily schedule"""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        transitions: list[tuple[int, dict]],
+        apply: Callable[[dict], Awaitable[Any]],
+    ) -> None:
+        super().__init__(hass, apply)
+        self._transitions = transitions
+
+    def _next(self, now: datetime) -> tuple[datetime, dict] | None:
+        if not self._transitions:
+            return None
+        return next_transition(self._transitions, now)
+
+    def _current(self, now: datetime) -> dict | None:
+        if not self._transitions:
+            return None
+        return current_profile(self._transitions, now)
+
+
+class PlanRunner(_TransitionRunner):
+    """Write the profiles of a plan with absolute times"""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        steps: list[tuple[datetime, dict]],
+        apply: Callable[[dict], Awaitable[Any]],
+    ) -> None:
+        super().__init__(hass, apply)
+        # Only the steps that change the profile are transitions.
+        self.steps: list[tuple[datetime, dict]] = []
+        for when, profile in sorted(steps, key=lambda step: step[0]):
+            if not self.steps or profile_key(self.steps[-1][1]) != profile_key(profile):
+                self.steps.append((when, profile))
+
+    def _next(self, now: datetime) -> tuple[datetime, dict] | None:
+        for when, profile in self.steps:
+            if when > now:
+                return when, profile
+        return None
+
+    def _current(self, now: datetime) -> dict | None:
+        active = None
+        for when, profile in self.steps:
+            if when <= now:
+                active = profile
+        return active
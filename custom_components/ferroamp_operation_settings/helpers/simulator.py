@@ -0,0 +1,261 @@
+"""Offline simulation of EMS configurations on historical load and PV data"""
+
+import csv
+import math
+
+import numpy as np
+
+from homeassistant.util import dt as dt_util
+
+from .price_planner import DEFAULT_EFFICIENCY
+
+# Mode numbers of the payload
+EMS_MODE_DEFAULT = 1
+EMS_MODE_PEAK_SHAVING = 2
+
+# Volts per phase, used to estimate the phase current for ACE
+PHASE_VOLTAGE = 230.0
+PHASES = 3
+
+HOURLY_PEAKS = 3
+
+# Steps integrated in one go by bounded_cumsum(), at first and at most
+MIN_WINDOW = 1440
+MAX_WINDOW = 1440 * 32
+
+
+def bounded_cumsum(
+    start: float, deltas: np.ndarray, low: float, high: float
+) -> np.ndarray:
+    """Get the running sum of deltas from start, kept between low and high.
+
+    While only one of the bounds is reached, the sum is that of a walk that is
+    reflected at that bound, which numpy computes from the running maximum of
+    how far the unbounded sum goes past it. The computation only restarts
+    where the other bound is reached, e.g. when a battery goes from full to
+    empty.
+    """
+    result = np.empty(len(deltas))
+    level = min(max(start, low), high)
+    at_high = level >= high
+    index = 0
+    window = MIN_WINDOW
+    while index < len(deltas):
+        end = min(index + window, len(deltas))
+        path = level + np.cumsum(deltas[index:end])
+        if at_high:
+            path -= np.maximum(np.maximum.accumulate(path - high), 0.0)
+            crossed = path < low
+        else:
+            path += np.maximum(np.maximum.accumulate(low - path), 0.0)
+            crossed = path > high
+        first = int(np.argmax(crossed))
+        if not crossed[first]:
+            result[index:end] = path
+            level = float(path[-1])
+            index = end
+            window = min(window * 2, MAX_WINDOW)
+            continue
+        result[index : index + first] = path[:first]
+        at_high = not at_high
+        level = high if at_high else low
+        result[index + first] = level
+        index += first + 1
+        window = MIN_WINDOW
+    return result
+
+
+def battery_request(payload: dict, net: np.ndarray) -> np.ndarray:
+    """Get the battery power (W) that the EMS asks for, positive when charging.
+
+    net is the load minus the PV power. In Default mode, the battery power is
+    the constant powerRef. In Peak Shaving and Self Consumption, the battery is
+    discharged above the high grid threshold and charged below the low, up to
+    the powerRefs. With limitImport, charging is lowered to keep the grid power
+    below the high threshold.
+    """
+    power_ref = payload.get("battery", {}).get("powerRef", {})
+    charge = float(power_ref.get("charge") or 0)
+    discharge = float(power_ref.get("discharge") or 0)
+    grid = payload.get("grid", {})
+    thresholds = grid.get("thresholds", {})
+    high = float(thresholds.get("high") or 0)
+    low = float(thresholds.get("low") or 0)
+
+    if payload.get("mode", EMS_MODE_DEFAULT) == EMS_MODE_DEFAULT:
+        constant = charge if charge > 0 else -discharge
+        request = np.full(len(net), constant, dtype=float)
+    else:
+        request = np.where(
+            net > high,
+            -np.minimum(net - high, discharge),
+            np.where(net < low, np.minimum(low - net, charge), 0.0),
+        )
+    if grid.get("limitImport"):
+        request = np.where(
+            request > 0, np.minimum(request, np.maximum(high - net, 0.0)), request
+        )
+    return request
+
+
+def simulate(
+    payload: dict,
+    load: np.ndarray,
+    pv: np.ndarray,
+    step_seconds: float,
+    capacity: float,
+    soc_start: float,
+    efficiency: float = DEFAULT_EFFICIENCY,
+) -> dict:
+    """Replay load and PV power (W) through a model of the EMS.
+
+    The payload is in the format that update() sends, with or without the
+    outer "payload" key. The capacity of the battery is in kWh, and the state
+    of charge is kept between the socRefs. With limitExport, PV is curtailed to
+    keep the grid power above the low threshold. ACE is counted as the steps
+    where the phase current would be above the ACE threshold, if the phases
+    were balanced, as the data has no phase currents.
+    Returns totals in kWh, peaks in W, the grid power and the state of charge
+    (%) of each step, and the state of charge at the end of each whole hour.
+    """
+    payload = payload.get("payload", payload)
+    load = np.asarray(load, dtype=float)
+    pv = np.asarray(pv, dtype=float)
+    if not payload.get("pv", {}).get("mode", 1):
+        pv = np.zeros(len(load))
+    net = load - pv
+    hours = step_seconds / 3600
+    eta = math.sqrt(efficiency)
+
+    request = battery_request(payload, net)
+    stored = np.where(request > 0, request * eta, request / eta) * hours / 1000
+    soc_ref = payload.get("battery", {}).get("socRef", {})
+    low = capacity * float(soc_ref.get("low", 0)) / 100
+    high = capacity * float(soc_ref.get("high", 100)) / 100
+    start = min(max(capacity * soc_start / 100, low), high)
+    levels = bounded_cumsum(start, stored, low, high)
+    stored = np.diff(levels, prepend=start)
+    battery = np.where(stored > 0, stored / eta, stored * eta) * 1000 / hours
+
+    grid_power = net + battery
+    grid = payload.get("grid", {})
+    curtailed = np.zeros(len(grid_power))
+    if grid.get("limitExport"):
+        export_threshold = float(grid.get("thresholds", {}).get("low") or 0)
+        curtailed = np.clip(export_threshold - grid_power, 0.0, pv)
+        grid_power = grid_power + curtailed
+
+    ace_steps = 0
+    ace = grid.get("ace", {})
+    if ace.get("mode"):
+        phase_current = np.abs(grid_power) / (PHASES * PHASE_VOLTAGE)
+        ace_steps = int(
+            np.count_nonzero(phase_current > float(ace.get("threshold") or 0))
+        )
+
+    steps_per_hour = max(int(round(1 / hours)), 1)
+    whole = len(grid_power) // steps_per_hour * steps_per_hour
+    hourly = grid_power[:whole].reshape(-1, steps_per_hour).mean(axis=1)
+
+    return {
+        "imported": float(np.sum(np.maximum(grid_power, 0.0))) * hours / 1000,
+        "exported": float(np.sum(np.maximum(-grid_power, 0.0))) * hours / 1000,
+        "curtailed": float(np.sum(curtailed)) * hours / 1000,
+        "charged": float(np.sum(np.maximum(battery, 0.0))) * hours / 1000,
+        "discharged": float(np.sum(np.maximum(-battery, 0.0))) * hours / 1000,
+        "grid_peak": float(np.max(grid_power)) if len(grid_power) else 0.0,
+        "hourly_peaks": [float(peak) for peak in np.sort(hourly)[::-1][:HOURLY_PEAKS]],
+        "ace_steps": ace_steps,
+        "grid": grid_power,
+        "soc": levels / capacity * 100,
+        "soc_hourly": levels[steps_per_hour - 1 : whole : steps_per_hour]
+        / capacity
+        * 100,
+    }
+
+
+def _step_seconds(times: np.ndarray) -> float:
+    if len(times) < 2:
+        raise ValueError("At least two samples are needed")
+    return float(np.median(np.diff(times)))
+
+
+def read_csv(
+    path: str,
+    time_column: str = "time",
+    load_column: str = "load",
+    pv_column: str = "pv",
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """Read load and PV power (W) from a CSV file with one row per time step.
+
+    Returns the times (seconds since the epoch), the load, the PV power and the
+    length of a step in seconds.
+    """
+    times, load, pv = [], [], []
+    with open(path, encoding="utf-8", newline="") as file:
+        for row in csv.DictReader(file):
+            when = dt_util.parse_datetime(row[time_column])
+            if when is None:
+                raise ValueError(f"Invalid time {row[time_column]}")
+            times.append(when.timestamp())
+            load.append(float(row[load_column]))
+            pv.append(float(row[pv_column]))
+    times = np.array(times)
+    return times, np.array(load), np.array(pv), _step_seconds(times)
+
+
+def read_history_csv(
+    path: str, load_entity: str, pv_entity: str, step_seconds: float = 60
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """Read load and PV power (W) from a history export of Home Assistant.
+
+    The rows have entity_id, state and last_changed. A state is kept until it
+    changes, and both series are sampled at the same steps.
+    """
+    series: dict[str, tuple[list, list]] = {load_entity: ([], []), pv_entity: ([], [])}
+    with open(path, encoding="utf-8", newline="") as file:
+        for row in csv.DictReader(file):
+            if row["entity_id"] not in series:
+                continue
+            when = dt_util.parse_datetime(row["last_changed"])
+            try:
+                value = float(row["state"])
+            except ValueError:
+                # unavailable or unknown
+                continue
+            if when is not None:
+                series[row["entity_id"]][0].append(when.timestamp())
+                series[row["entity_id"]][1].append(value)
+    for entity_id, (times, _) in series.items():
+        if not times:
+            raise ValueError(f"No states of {entity_id}")
+    start = max(min(times) for times, _ in series.values())
+    end = max(max(times) for times, _ in series.values())
+    steps = np.arange(start, end, step_seconds)
+    sampled = []
+    for times, values in series.values():
+        order = np.argsort(times)
+        times = np.asarray(times)[order]
+        values = np.asarray(values)[order]
+        sampled.append(values[np.searchsorted(times, steps, side="right") - 1])
+    return steps, sampled[0], sampled[1], float(step_seconds)
+
+
+def simulate_file(
+    path: str,
+    payload: dict,
+    capacity: float,
+    soc_start: float,
+    load_entity: str | None = None,
+    pv_entity: str | None = None,
+) -> dict:
+    """Simulate a payload on the data of a CSV file.
+
+    With load_entity and pv_entity, the file is a history export of Home
+    Assistant, and otherwise it has the columns time, load and pv.
+    """
+    if load_entity is not None and pv_entity is not None:
+        _, load, pv, step_seconds = read_history_csv(path, load_entity, pv_entity)
+    else:
+        _, load, pv, step_seconds = read_csv(path)
+    return simulate(payload, load, pv, step_seconds, capacity, soc_start)
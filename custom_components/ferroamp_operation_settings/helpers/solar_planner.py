@@ -0,0 +1,82 @@
+"""State of charge targets from a solar production forecast"""
+
+import math
+
+from .price_planner import DEFAULT_EFFICIENCY
+
+MAX_SOC = 100.0
+
+# Share of the forecasted surplus that is counted on, for forecast errors
+FORECAST_SHARE = 0.8
+
+
+def plan_soc_targets(
+    pv_forecast: float,
+    load_estimate: float,
+    capacity: float,
+    soc_reserve: float,
+    efficiency: float = DEFAULT_EFFICIENCY,
+) -> dict:
+    """Compute the lower and upper socRef for the night before a day.
+
+    The PV forecast and the load estimate of the day are in kWh, and the capacity
+    of the battery in kWh. The part of the battery that the expected PV surplus
+    fills during the day is left empty at night, so that the battery is not charged
+    from the grid before a sunny day. The lower socRef is the reserve (%).
+    Returns the socRefs (%), and the PV surplus that is expected in the battery.
+    """
+    reserve = min(max(soc_reserve, 0.0), MAX_SOC)
+    room = capacity * (MAX_SOC - reserve) / 100
+    surplus = max(pv_forecast - load_estimate, 0.0) * FORECAST_SHARE
+    solar_charge = min(surplus * math.sqrt(efficiency), room)
+    upper = MAX_SOC - solar_charge / capacity * 100 if capacity > 0 else MAX_SOC
+    return {
+        "lower_reference": round(reserve, 1),
+        "upper_reference": round(max(upper, reserve), 1),
+        "solar_charge": round(solar_charge, 2),
+    }
+
+
+def night_charge(targets: dict, capacity: float, soc: float | None) -> float | None:
+    """Get the energy (kWh) to charge from the grid to reach the upper socRef."""
+    if soc is None:
+        return None
+    return round(max(targets["upper_reference"] - soc, 0.0) * capacity / 100, 2)
+
+
+def targets_profile(targets: dict) -> dict:
+    """Create the settings profile of the socRef targets.
+
+    Charging from the grid, e.g. by a schedule at night, stops at the upper socRef.
+    """
+    return {
+        "lower_reference": targets["lower_reference"],
+        "upper_reference": targets["upper_reference"],
+    }
+
+
+class SolarPlanner:
+    """Compute socRef targets, and reuse them while the inputs are unchanged"""
+
+    def __init__(self) -> None:
+        self._key: tuple | None = None
+        self.targets: dict | None = None
+        self.computations = 0
+
+    def plan(
+        self,
+        pv_forecast: float,
+        load_estimate: float,
+        capacity: float,
+        soc_reserve: float,
+    ) -> tuple[dict, bool]:
+        """Get the targets, and if they were recomputed."""
+        key = (round(pv_forecast, 2), round(load_estimate, 2), capacity, soc_reserve)
+        if key == self._key and self.targets is not None:
+            return self.targets, False
+        self._key = key
+        self.targets = plan_soc_targets(
+            pv_forecast, load_estimate, capacity, soc_reserve
+        )
+        self.computations += 1
+        return self.targets, True
@@ -0,0 +1,78 @@
+"""Search for the Peak Shaving thresholds that give the lowest power peaks"""
+
+import numpy as np
+
+from .ems_config import merge_payload
+from .simulator import EMS_MODE_PEAK_SHAVING, simulate
+
+# Number of discharge thresholds tried, between the median and the max power
+DISCHARGE_CANDIDATES = 24
+# Charge thresholds tried, as quantiles of the power, and just below the
+# discharge threshold
+CHARGE_QUANTILES = (0.1, 0.5, 0.9)
+
+THRESHOLD_STEP = 100.0  # W
+
+
+def peak_cost(grid: np.ndarray, step_seconds: float, count: int) -> float:
+    """Get the mean of the top hourly mean powers, as in a peak tariff."""
+    steps_per_hour = max(int(round(3600 / step_seconds)), 1)
+    whole = len(grid) // steps_per_hour * steps_per_hour
+    if whole == 0:
+        return 0.0
+    hourly = grid[:whole].reshape(-1, steps_per_hour).mean(axis=1)
+    return float(np.mean(np.sort(hourly)[-count:]))
+
+
+def optimize_thresholds(
+    grid: np.ndarray,
+    step_seconds: float,
+    payload: dict,
+    capacity: float,
+    soc_start: float,
+    count: int,
+) -> dict:
+    """Find the discharge and charge thresholds with the lowest peak cost.
+
+    grid is the grid power history (W) without the battery, which is the load
+    of the simulation. The battery limits, powerRefs and socRefs, are taken
+    from the payload. Each pair of candidate thresholds is simulated, and the
+    pair with the lowest peak cost, and then the lowest imported energy, wins.
+    """
+    grid = np.nan_to_num(np.asarray(grid, dtype=float), nan=0.0)
+    pv = np.zeros(len(grid))
+    payload = payload.get("payload", payload)
+    highs = np.unique(
+        np.round(
+            np.linspace(np.median(grid), np.max(grid), DISCHARGE_CANDIDATES)
+            / THRESHOLD_STEP
+        )
+        * THRESHOLD_STEP
+    )
+    quantiles = np.round(np.quantile(grid, CHARGE_QUANTILES) / THRESHOLD_STEP)
+    best = None
+    for high in highs:
+        lows = {float(low) for low in quantiles * THRESHOLD_STEP if low < high}
+        lows.add(float(high - THRESHOLD_STEP))
+        for low in sorted(lows):
+            candidate = merge_payload(
+                payload,
+                {
+                    "mode": EMS_MODE_PEAK_SHAVING,
+                    "grid": {"thresholds": {"high": float(high), "low": low}},
+                },
+            )
+            result = simulate(candidate, grid, pv, step_seconds, capacity, soc_start)
+            cost = (peak_cost(result["grid"], step_seconds, count), result["imported"])
+            if best is None or cost < best[0]:
+                best = (cost, float(high), low)
+    if best is None:
+        raise ValueError("No history to optimize from")
+    (peak, imported), high, low = best
+    return {
+        "discharge_threshold": high,
+        "charge_threshold": low,
+        "peak": peak,
+        "baseline_peak": peak_cost(grid, step_seconds, count),
+        "imported": imported,
+    }
@@ -0,0 +1,102 @@
+"""Serialization of writes to a Ferroamp system"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+from typing import Any, TypeVar
+
+from custom_components.ferroamp_operation_settings.helpers.request_scheduler import (
+    SharedPriority,
+    request_priority,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+
+class WriteQueue:
+    """Serialized writes with at most one write in flight and one pending.
+
+    A pending write that is superseded by a newer one is dropped before it is
+    sent. Its caller gets the result of the write that replaced it, and is told
+    that its own payload was not sent. A write is sent with the highest priority
+    of the callers that wait for it.
+    """
+
+    def __init__(self) -> None:
+        self._pending: (
+            tuple[Any, Callable, list[asyncio.Future], SharedPriority] | None
+        ) = None
+        self._worker: asyncio.Task | None = None
+        self._in_flight = False
+        self._listeners: list[Callable[[], None]] = []
+        self.sent = 0
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of writes in flight and pending."""
+        return int(self._in_flight) + int(self._pending is not None)
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Add a listener that is called when the queue changes."""
+        self._listeners.append(listener)
+
+        def remove_listener() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return remove_listener
+
+    def _notify(self) -> None:
+        for listener in list(self._listeners):
+            listener()
+
+    async def async_write(
+        self, payload: Any, writer: Callable[[Any], Awaitable[_T]]
+    ) -> tuple[_T, bool]:
+        """Queue a write and wait for the result.
+
+        Returns the result, and True if the payload was sent or False if it was
+        superseded by the payload of a later call.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        futures = [future]
+        priority = SharedPriority()
+        priority.join()
+        if self._pending is not None:
+            _LOGGER.debug("A pending write is superseded")
+            futures = self._pending[2] + futures
+            with request_priority(self._pending[3]):
+                priority.join()
+            self.dropped += 1
+        self._pending = (payload, writer, futures, priority)
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._async_run())
+        self._notify()
+        return await asyncio.shield(future)
+
+    async def _async_run(self) -> None:
+        while self._pending is not None:
+            payload, writer, futures, priority = self._pending
+            self._pending = None
+            self._in_flight = True
+            self._notify()
+            try:
+                with request_priority(priority):
+                    result = await writer(payload)
+            except Exception as exception:  # pylint: disable=broad-except
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exception)
+            else:
+                # The last caller is the one whose payload was sent.
+                for future in futures:
+                    if not future.done():
+                        future.set_result((result, future is futures[-1]))
+            finally:
+                self._in_flight = False
+                self.sent += 1
+                self._notify()
@@ -55,6 +55,11 @@ class FerroampOperationSettingsSensorStatus(FerroampOperationSettingsSensor):
 
         self._attr_native_value = STATUS_READY
 
+    @property
+    def extra_state_attributes(self):
+        """Return the metrics of the coordinator."""
+        return self.coordinator.get_metrics()
+
     def set_status(self, new_status):
         """Set new status."""
         self._attr_native_value = new_status
@@ -0,0 +1,225 @@
+"""Services of Ferroamp Operation Settings"""
+
+from functools import partial
+import logging
+
+import voluptuous as vol
+
+from homeassistant.const import MAJOR_VERSION, MINOR_VERSION
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+
+from .const import CONF_LOGIN_EMAIL, DEFAULT_OPTIMIZE_WEEKS, DOMAIN
+from .coordinator import FerroampOperationSettingsCoordinator
+from .helpers.fleet import async_run_fleet
+from .helpers.general import get_parameter
+from .helpers.profile import PROFILE_SCHEMA
+from .helpers.schedule import SCHEDULE_SCHEMA
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_CONFIG_ENTRY_IDS = "config_entry_ids"
+ATTR_PROFILE = "profile"
+ATTR_SLOTS = "slots"
+ATTR_PRICE_SENSOR = "price_sensor"
+ATTR_APPLY = "apply"
+ATTR_FILE = "file"
+ATTR_PAYLOAD = "payload"
+ATTR_LOAD_ENTITY = "load_entity"
+ATTR_PV_ENTITY = "pv_entity"
+ATTR_GRID_POWER_SENSOR = "grid_power_sensor"
+ATTR_WEEKS = "weeks"
+
+SERVICE_SET_SCHEDULE = "set_schedule"
+SERVICE_PLAN_PRICES = "plan_prices"
+SERVICE_SIMULATE = "simulate"
+SERVICE_OPTIMIZE_THRESHOLDS = "optimize_thresholds"
+SERVICE_APPLY_SETTINGS = "apply_settings"
+SERVICE_FLEET = "fleet"
+
+SET_SCHEDULE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_SLOTS): SCHEDULE_SCHEMA,
+    }
+)
+
+PLAN_PRICES_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_PRICE_SENSOR): cv.entity_id,
+        vol.Optional(ATTR_APPLY, default=True): cv.boolean,
+    }
+)
+
+SIMULATE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_FILE): cv.string,
+        vol.Optional(ATTR_PAYLOAD): dict,
+        vol.Inclusive(ATTR_LOAD_ENTITY, "history"): cv.entity_id,
+        vol.Inclusive(ATTR_PV_ENTITY, "history"): cv.entity_id,
+    }
+)
+
+OPTIMIZE_THRESHOLDS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_GRID_POWER_SENSOR): cv.entity_id,
+        vol.Optional(ATTR_WEEKS, default=DEFAULT_OPTIMIZE_WEEKS): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=52)
+        ),
+        vol.Optional(ATTR_APPLY, default=False): cv.boolean,
+    }
+)
+
+APPLY_SETTINGS_SCHEMA = PROFILE_SCHEMA.extend(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+FLEET_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_IDS): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_PROFILE): PROFILE_SCHEMA,
+    }
+)
+
+
+def get_coordinator(
+    hass: HomeAssistant, call: ServiceCall
+) -> FerroampOperationSettingsCoordinator:
+    """Get the coordinator of the config entry of a service call.
+
+    The config entry can be left out if there is only one.
+    """
+    coordinators: dict = hass.data.get(DOMAIN, {})
+    entry_id = call.data.get(ATTR_CONFIG_ENTRY_ID)
+    if entry_id is None:
+        if len(coordinators) != 1:
+            raise HomeAssistantError(
+                f"{ATTR_CONFIG_ENTRY_ID} is required when there is not exactly one"
+                " loaded config entry"
+            )
+        return next(iter(coordinators.values()))
+    if entry_id not in coordinators:
+        raise HomeAssistantError(f"Config entry {entry_id} is not loaded")
+    return coordinators[entry_id]
+
+
+async def async_setup_services(hass: HomeAssistant):
+    """Register the services, once for all config entries."""
+
+    if hass.services.has_service(DOMAIN, SERVICE_SET_SCHEDULE):
+        return
+
+    async def async_set_schedule(call: ServiceCall):
+        coordinator = get_coordinator(hass, call)
+        await coordinator.async_set_schedule(call.data[ATTR_SLOTS])
+
+    async def async_plan_prices(call: ServiceCall):
+        coordinator = get_coordinator(hass, call)
+        plan = await coordinator.async_plan_prices(
+            call.data.get(ATTR_PRICE_SENSOR), call.data[ATTR_APPLY]
+        )
+        _LOGGER.debug("Plan: %s", plan)
+        return plan
+
+    async def async_simulate(call: ServiceCall):
+        coordinator = get_coordinator(hass, call)
+        result = await coordinator.async_simulate(
+            call.data[ATTR_FILE],
+            call.data.get(ATTR_PAYLOAD),
+            call.data.get(ATTR_LOAD_ENTITY),
+            call.data.get(ATTR_PV_ENTITY),
+        )
+        _LOGGER.debug("Simulation of %s: %s", call.data[ATTR_FILE], result)
+        return result
+
+    async def async_optimize_thresholds(call: ServiceCall):
+        coordinator = get_coordinator(hass, call)
+        result = await coordinator.async_optimize_thresholds(
+            call.data.get(ATTR_GRID_POWER_SENSOR),
+            call.data[ATTR_WEEKS],
+            call.data[ATTR_APPLY],
+        )
+        _LOGGER.debug("Optimized Peak Shaving thresholds: %s", result)
+        return result
+
+    async def async_apply_settings(call: ServiceCall):
+        coordinator = get_coordinator(hass, call)
+        profile = {
+            key: value
+            for key, value in call.data.items()
+            if key != ATTR_CONFIG_ENTRY_ID
+        }
+        return await coordinator.async_apply_settings(profile)
+
+    async def async_not_loaded(entry_id: str):
+        raise HomeAssistantError(f"Config entry {entry_id} is not loaded")
+
+    async def async_fleet(call: ServiceCall):
+        coordinators: dict = hass.data.get(DOMAIN, {})
+        profile = call.data.get(ATTR_PROFILE)
+        jobs = {}
+        for entry_id in call.data.get(ATTR_CONFIG_ENTRY_IDS, list(coordinators)):
+            coordinator = coordinators.get(entry_id)
+            if coordinator is None:
+                jobs[entry_id] = (None, partial(async_not_loaded, entry_id))
+                continue
+            account = get_parameter(coordinator.config_entry, CONF_LOGIN_EMAIL)
+            if profile is None:
+                jobs[entry_id] = (account, coordinator.async_read_settings)
+            else:
+                jobs[entry_id] = (
+                    account,
+                    partial(coordinator.async_apply_settings, profile),
+                )
+        result = await async_run_fleet(jobs)
+        _LOGGER.info(
+            "Fleet %s: %s succeeded, %s failed",
+            "update" if profile is not None else "read",
+            result["succeeded"],
+            result["failed"],
+        )
+        return result
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_SCHEDULE, async_set_schedule, schema=SET_SCHEDULE_SCHEMA
+    )
+    register_with_response(
+        hass, SERVICE_PLAN_PRICES, async_plan_prices, PLAN_PRICES_SCHEMA
+    )
+    register_with_response(hass, SERVICE_SIMULATE, async_simulate, SIMULATE_SCHEMA)
+    register_with_response(
+        hass,
+        SERVICE_OPTIMIZE_THRESHOLDS,
+        async_optimize_thresholds,
+        OPTIMIZE_THRESHOLDS_SCHEMA,
+    )
+    register_with_response(
+        hass, SERVICE_APPLY_SETTINGS, async_apply_settings, APPLY_SETTINGS_SCHEMA
+    )
+    register_with_response(hass, SERVICE_FLEET, async_fleet, FLEET_SCHEMA)
+
+
+def register_with_response(
+    hass: HomeAssistant, service: str, handler, schema: vol.Schema
+):
+    """Register a service that returns response data, if supported."""
+    if MAJOR_VERSION > 2023 or (MAJOR_VERSION == 2023 and MINOR_VERSION >= 7):
+        # pylint: disable=import-outside-toplevel
+        from homeassistant.core import SupportsResponse
+
+        hass.services.async_register(
+            DOMAIN,
+            service,
+            handler,
+            schema=schema,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+    else:
+        hass.services.async_register(DOMAIN, service, handler, schema=schema)
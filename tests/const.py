@@ -26,3 +26,23 @@ MOCK_CONFIG_ALL_V1 = {
     CONF_LOGIN_EMAIL: "abc@d.c",
     CONF_LOGIN_PASSWORD: "passsword",
 }
+
+MOCK_STORED_DATA = {
+    "_id": 1234,
+    "emsConfig": {
+        "data": {
+            "battery": {
+                "powerRef": {"discharge": 2000, "charge": 0},
+                "socRef": {"high": 95, "low": 20},
+            },
+            "pv": {"mode": 1},
+            "grid": {
+                "limitExport": False,
+                "thresholds": {"high": 5000, "low": 1000},
+                "limitImport": False,
+                "ace": {"threshold": 16, "mode": 0},
+            },
+            "mode": 2,
+        },
+    },
+}
@@ -0,0 +1,82 @@
+"""Benchmark of the device registry listener of the coordinator."""
+
+import logging
+import time
+from unittest.mock import AsyncMock, patch
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import MAJOR_VERSION, MINOR_VERSION
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.helpers.device_registry import async_get as async_device_registry_get
+from homeassistant.helpers.device_registry import DeviceRegistry
+
+from custom_components.ferroamp_operation_settings import (
+    async_setup_entry,
+    async_unload_entry,
+)
+from custom_components.ferroamp_operation_settings.coordinator import (
+    FerroampOperationSettingsCoordinator,
+)
+from custom_components.ferroamp_operation_settings.const import DOMAIN
+
+from tests.const import MOCK_CONFIG_ALL
+
+_LOGGER = logging.getLogger(__name__)
+
+NUMBER_OF_DEVICES = 1000
+
+
+# pylint: disable=unused-argument
+async def test_coordinator_device_registry_benchmark(hass):
+    """Test that only updates of the own device reach the coordinator."""
+
+    # A large device registry
+    other_entry = MockConfigEntry(domain="other", entry_id="other")
+    other_entry.add_to_hass(hass)
+    device_registry: DeviceRegistry = async_device_registry_get(hass)
+    other_devices = [
+        device_registry.async_get_or_create(
+            config_entry_id=other_entry.entry_id,
+            identifiers={("other", f"device{index}")},
+            name=f"Device {index}",
+        )
+        for index in range(NUMBER_OF_DEVICES)
+    ]
+
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test")
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.coordinator.FerroampOperationSettingsCoordinator.device_updated",
+        new_callable=AsyncMock,
+    ) as device_updated:
+        assert await async_setup_entry(hass, config_entry)
+        await hass.async_block_till_done()
+        coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+            config_entry.entry_id
+        ]
+        assert coordinator.get_device_id() is not None
+
+        # Rename all other devices
+        start = time.perf_counter()
+        for device in other_devices:
+            device_registry.async_update_device(device.id, name_by_user="Renamed")
+        await hass.async_block_till_done()
+        elapsed = time.perf_counter() - start
+        _LOGGER.info(
+            "%s device registry updates took %.1f ms", NUMBER_OF_DEVICES, elapsed * 1000
+        )
+        device_updated.assert_not_called()
+
+        # Rename the own device
+        device_registry.async_update_device(
+            coordinator.get_device_id(), name_by_user="New title"
+        )
+        await hass.async_block_till_done()
+        device_updated.assert_called_once()
+
+    assert await async_unload_entry(hass, config_entry)
+    await hass.async_block_till_done()
@@ -1,16 +1,37 @@
 """Test ferroamp_operation_settings api."""
 
+from unittest.mock import AsyncMock, MagicMock, patch
+
 from custom_components.ferroamp_operation_settings.const import (
     CONF_LOGIN_EMAIL,
     CONF_LOGIN_PASSWORD,
     CONF_SYSTEM_ID,
 )
 from custom_components.ferroamp_operation_settings.helpers.api import (
+    AUTH_FAILED_INVALID_CREDENTIALS,
+    OPENID_BASEURL,
+    PORTAL_BASEURL,
     FerroampApiClient,
 )
+from custom_components.ferroamp_operation_settings.helpers.oauth import OAuthTokens
+from custom_components.ferroamp_operation_settings.helpers.rate_limiter import (
+    ENDPOINT_AUTH,
+    ENDPOINT_READ,
+    ENDPOINT_WRITE,
+)
 
 from tests.const import MOCK_CONFIG_ALL
 
+LOGIN_FORM = (
+    '<form id="kc-form-login" action="https://auth.example.com/login">'
+    '<input id="username" name="username"/>'
+    '<input id="password" name="password" type="password"/>'
+    "{error}</form>"
+)
+LOGIN_FORM_INVALID = LOGIN_FORM.format(
+    error='<span id="input-error">Invalid username or password.</span>'
+)
+
 # We can pass fixtures as defined in conftest.py to tell pytest to use the fixture
 # for a given test. We can also leverage fixtures and mocks that are available in
 # Home Assistant using the pytest_homeassistant_custom_component plugin.
@@ -44,3 +65,160 @@ async def test_api_client(hass):
     # Remove access token
     api_client._access_token = None
     assert await api_client.async_set_data(body)
+
+
+async def test_api_client_refresh_tokens(hass):
+    """Test refresh of tokens."""
+
+    api_client: FerroampApiClient = FerroampApiClient(
+        MOCK_CONFIG_ALL[CONF_SYSTEM_ID],
+        MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL],
+        MOCK_CONFIG_ALL[CONF_LOGIN_PASSWORD],
+        None,
+    )
+    api_client._tokens = OAuthTokens("old", "refresh", 0.0)
+    api_client._access_token = "old"
+
+    response = MagicMock()
+    response.status = 200
+    response.json = AsyncMock(
+        return_value={
+            "access_token": "new",
+            "refresh_token": "refresh2",
+            "expires_in": 300,
+        }
+    )
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.ApiClientBase.api_wrapper_post_data",
+        return_value=response,
+    ):
+        await api_client.refresh_tokens()
+    assert api_client._access_token == "new"
+    assert api_client._tokens.refresh_token == "refresh2"
+    assert not api_client._tokens.expires_within(30)
+
+    # Failed refresh falls back to a new login
+    response.status = 400
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.ApiClientBase.api_wrapper_post_data",
+        return_value=response,
+    ), patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.get_new_tokens",
+    ) as get_new_tokens:
+        await api_client.refresh_tokens()
+    get_new_tokens.assert_called_once()
+    assert api_client._access_token is None
+
+
+async def test_api_client_auth_failure(hass):
+    """Test that a terminal login failure stops further logins."""
+
+    api_client: FerroampApiClient = FerroampApiClient(
+        MOCK_CONFIG_ALL[CONF_SYSTEM_ID],
+        MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL],
+        MOCK_CONFIG_ALL[CONF_LOGIN_PASSWORD],
+        None,
+    )
+    assert api_client.auth_failure is None
+
+    response = MagicMock()
+    response.status = 401
+    response.text = AsyncMock(return_value=LOGIN_FORM_INVALID)
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.ApiClientBase.api_wrapper_get_text",
+        return_value='<form action="https://auth.example.com/login"></form>',
+    ) as get_text, patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.ApiClientBase.api_wrapper_post_data",
+        return_value=response,
+    ) as post_data, patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.get_all_cookies",
+        return_value="",
+    ):
+        await api_client.get_new_tokens()
+        assert api_client.auth_failure == AUTH_FAILED_INVALID_CREDENTIALS
+        assert get_text.call_count == 1
+        assert post_data.call_count == 1
+
+        # No more network calls
+        await api_client.get_new_tokens()
+        assert get_text.call_count == 1
+        assert post_data.call_count == 1
+    assert api_client._access_token is None
+
+
+async def test_api_client_transient_auth_failure(hass):
+    """Test that a login failure that is not due to the credentials is retried."""
+
+    api_client: FerroampApiClient = FerroampApiClient(
+        MOCK_CONFIG_ALL[CONF_SYSTEM_ID],
+        MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL],
+        MOCK_CONFIG_ALL[CONF_LOGIN_PASSWORD],
+        None,
+    )
+    response = MagicMock()
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.ApiClientBase.api_wrapper_get_text",
+        return_value='<form action="https://auth.example.com/login"></form>',
+    ), patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.ApiClientBase.api_wrapper_post_data",
+        return_value=response,
+    ) as post_data, patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.get_all_cookies",
+        return_value="",
+    ):
+        # An expired login session
+        response.status = 400
+        response.text = AsyncMock(
+            return_value="<html><p>Cookie not found. Please make sure cookies are"
+            " enabled in your browser.</p></html>"
+        )
+        await api_client.get_new_tokens()
+        assert api_client.auth_failure is None
+
+        # The login form again, without an error of the credentials
+        response.status = 200
+        response.real_url = "https://auth.example.com/login"
+        response.text = AsyncMock(
+            return_value=LOGIN_FORM.format(
+                error='<div class="alert-error">Your login attempt timed out.</div>'
+            )
+        )
+        await api_client.get_new_tokens()
+        assert api_client.auth_failure is None
+        assert post_data.call_count == 2
+
+        # Keycloak answers a wrong password with the login form and status 200
+        response.text = AsyncMock(return_value=LOGIN_FORM_INVALID)
+        await api_client.get_new_tokens()
+        assert api_client.auth_failure == AUTH_FAILED_INVALID_CREDENTIALS
+    assert api_client._access_token is None
+
+
+async def test_api_client_endpoint_class(hass):
+    """Test the rate limit classes of the requests."""
+
+    api_client: FerroampApiClient = FerroampApiClient(
+        MOCK_CONFIG_ALL[CONF_SYSTEM_ID],
+        MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL],
+        MOCK_CONFIG_ALL[CONF_LOGIN_PASSWORD],
+        None,
+    )
+
+    assert api_client.endpoint_class("get_text", PORTAL_BASEURL) == ENDPOINT_AUTH
+    assert (
+        api_client.endpoint_class("post_data", OPENID_BASEURL + "/token")
+        == ENDPOINT_AUTH
+    )
+    assert (
+        api_client.endpoint_class(
+            "get_json", PORTAL_BASEURL + "/service/ems-config/v1/current/1234"
+        )
+        == ENDPOINT_READ
+    )
+    assert (
+        api_client.endpoint_class(
+            "post_json_text",
+            PORTAL_BASEURL + "/service/ems-config/v1/commands/set/1234",
+        )
+        == ENDPOINT_WRITE
+    )
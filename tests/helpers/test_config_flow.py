@@ -1,5 +1,8 @@
 """Test ferroamp_operation_settings/helpers/config_flow.py"""
 
+from time import monotonic
+from unittest.mock import patch
+
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.device_registry import async_get as async_device_registry_get
 from homeassistant.helpers.device_registry import DeviceRegistry
@@ -8,12 +11,21 @@ from homeassistant.helpers.entity_registry import EntityRegistry
 
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
+from custom_components.ferroamp_operation_settings.helpers.api import (
+    FerroampApiClient,
+)
 from custom_components.ferroamp_operation_settings.helpers.config_flow import (
     DeviceNameCreator,
+    FlowValidator,
+    ValidatedClientCache,
 )
 from custom_components.ferroamp_operation_settings.const import (
+    CONF_LOGIN_EMAIL,
+    CONF_LOGIN_PASSWORD,
+    CONF_SYSTEM_ID,
     DOMAIN,
     NAME,
+    VALIDATED_CLIENT_MAX_AGE,
 )
 
 from tests.const import (
@@ -78,3 +90,96 @@ async def test_device_name_creator(hass: HomeAssistant):
     )
     assert (name4 := DeviceNameCreator.create(hass)) not in names
     assert NAME in name4
+
+
+async def test_validated_client_cache(hass: HomeAssistant):
+    """Test the ValidatedClientCache."""
+
+    client = FerroampApiClient(
+        MOCK_CONFIG_ALL[CONF_SYSTEM_ID],
+        MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL],
+        MOCK_CONFIG_ALL[CONF_LOGIN_PASSWORD],
+        None,
+    )
+    ValidatedClientCache.store(hass, "flow", client)
+
+    # Wrong password
+    assert (
+        ValidatedClientCache.pop(
+            hass, MOCK_CONFIG_ALL[CONF_SYSTEM_ID], MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL], "x"
+        )
+        is None
+    )
+    # Correct login information, only once
+    assert (
+        ValidatedClientCache.pop(
+            hass,
+            MOCK_CONFIG_ALL[CONF_SYSTEM_ID],
+            MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL],
+            MOCK_CONFIG_ALL[CONF_LOGIN_PASSWORD],
+        )
+        is client
+    )
+    assert (
+        ValidatedClientCache.pop(
+            hass,
+            MOCK_CONFIG_ALL[CONF_SYSTEM_ID],
+            MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL],
+            MOCK_CONFIG_ALL[CONF_LOGIN_PASSWORD],
+        )
+        is None
+    )
+
+    # Expired client
+    ValidatedClientCache.store(hass, "flow", client)
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.config_flow.monotonic",
+        return_value=monotonic() + VALIDATED_CLIENT_MAX_AGE + 1,
+    ):
+        assert (
+            ValidatedClientCache.pop(
+                hass,
+                MOCK_CONFIG_ALL[CONF_SYSTEM_ID],
+                MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL],
+                MOCK_CONFIG_ALL[CONF_LOGIN_PASSWORD],
+            )
+            is None
+        )
+
+
+async def test_validate_step_user_stores_client(hass: HomeAssistant):
+    """Test that a validated client is stored for the setup."""
+
+    assert await FlowValidator.validate_step_user(hass, MOCK_CONFIG_ALL, "flow") is None
+    client = ValidatedClientCache.pop(
+        hass,
+        MOCK_CONFIG_ALL[CONF_SYSTEM_ID],
+        MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL],
+        MOCK_CONFIG_ALL[CONF_LOGIN_PASSWORD],
+    )
+    assert client is not None
+    assert client.data is not None
+
+
+async def test_device_name_creator_other_devices(hass: HomeAssistant):
+    """Test that only devices of the integration are considered."""
+
+    device_registry: DeviceRegistry = async_device_registry_get(hass)
+    other_entry = MockConfigEntry(domain="other", entry_id="other")
+    other_entry.add_to_hass(hass)
+    for index in range(100):
+        device_registry.async_get_or_create(
+            config_entry_id=other_entry.entry_id,
+            name=f"{NAME} {index}",
+            identifiers={("other", f"device{index}")},
+        )
+    assert DeviceNameCreator.create(hass) == NAME
+
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test")
+    config_entry.add_to_hass(hass)
+    device_registry.async_get_or_create(
+        config_entry_id=config_entry.entry_id,
+        name=f"{NAME} 5",
+        identifiers={(DOMAIN, config_entry.entry_id)},
+    )
+    assert DeviceNameCreator.create(hass) == f"{NAME} 6"
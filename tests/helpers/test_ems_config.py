@@ -0,0 +1,73 @@
+"""Test ferroamp_operation_settings/helpers/ems_config.py"""
+
+from custom_components.ferroamp_operation_settings.helpers.ems_config import (
+    config_matches,
+    fingerprint,
+    get_config,
+    merge_payload,
+    merge_three_way,
+)
+
+from tests.const import MOCK_STORED_DATA
+
+
+async def test_get_config():
+    """Test get_config()."""
+
+    assert get_config(MOCK_STORED_DATA) is MOCK_STORED_DATA["emsConfig"]["data"]
+    assert get_config(None) is None
+    assert get_config({"emsConfig": None}) is None
+
+
+async def test_config_matches():
+    """Test config_matches()."""
+
+    config = get_config(MOCK_STORED_DATA)
+    payload = {
+        "battery": {"powerRef": {"discharge": 2000.0, "charge": 0.0}},
+        "pv": {"mode": 1},
+        "grid": {"limitExport": False},
+        "mode": 2,
+    }
+    assert config_matches(payload, config)
+
+    payload["grid"]["limitExport"] = 0
+    assert not config_matches(payload, config)
+    payload["grid"]["limitExport"] = False
+
+    payload["battery"]["powerRef"]["charge"] = 100.0
+    assert not config_matches(payload, config)
+    payload["battery"]["powerRef"]["charge"] = 0
+
+    payload["unknown"] = 1
+    assert not config_matches(payload, config)
+    assert not config_matches(payload, None)
+
+
+async def test_merge_payload():
+    """Test merge_payload()."""
+
+    config = get_config(MOCK_STORED_DATA)
+    merged = merge_payload(config, {"battery": {"socRef": {"high": 90}}, "mode": 1})
+    assert merged["battery"]["socRef"] == {"high": 90, "low": 20}
+    assert merged["battery"]["powerRef"] == config["battery"]["powerRef"]
+    assert merged["mode"] == 1
+    # The original configuration is not changed
+    assert config["battery"]["socRef"]["high"] == 95
+    assert config["mode"] == 2
+
+
+async def test_fingerprint_and_merge_three_way():
+    """Test fingerprint() and merge_three_way()."""
+
+    config = get_config(MOCK_STORED_DATA)
+    assert fingerprint(config) == fingerprint(merge_payload(config, {"mode": 2.0}))
+    assert fingerprint(config) != fingerprint(merge_payload(config, {"mode": 1}))
+
+    base = {"battery": {"socRef": {"high": 100, "low": 15}}, "mode": 1}
+    local = {"battery": {"socRef": {"high": 100.0, "low": 30.0}}, "mode": 1}
+    merged = merge_three_way(local, base, config)
+    assert merged == {"battery": {"socRef": {"high": 95, "low": 30.0}}, "mode": 2}
+
+    # Without a base configuration, the local values are kept
+    assert merge_three_way(local, None, config) == local
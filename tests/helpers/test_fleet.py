@@ -0,0 +1,45 @@
+"""Test ferroamp_operation_settings/helpers/fleet.py"""
+
+import asyncio
+
+from custom_components.ferroamp_operation_settings.helpers.fleet import (
+    async_run_fleet,
+)
+
+
+async def test_run_fleet():
+    """Test the concurrency per account and partial failures."""
+
+    running: dict[str, int] = {"a": 0, "b": 0}
+    most: dict[str, int] = {"a": 0, "b": 0}
+
+    def job(account: str, value: int):
+        async def run():
+            running[account] += 1
+            most[account] = max(most[account], running[account])
+            await asyncio.sleep(0.01)
+            running[account] -= 1
+            if value < 0:
+                raise ValueError("negative")
+            return value
+
+        return account, run
+
+    jobs = {f"a{index}": job("a", index) for index in range(5)}
+    jobs.update({f"b{index}": job("b", index) for index in range(2)})
+    jobs["b2"] = job("b", -1)
+
+    result = await async_run_fleet(jobs, max_concurrency=2)
+    assert most == {"a": 2, "b": 2}
+    assert result["succeeded"] == 7
+    assert result["failed"] == 1
+    assert result["systems"]["a3"]["success"] is True
+    assert result["systems"]["a3"]["result"] == 3
+    assert result["systems"]["a3"]["latency"] >= 0.01
+    assert result["systems"]["b2"] == {
+        "success": False,
+        "error": "negative",
+        "latency": result["systems"]["b2"]["latency"],
+    }
+    # Accounts run in parallel, five jobs of account a in three rounds
+    assert result["duration"] < 0.1
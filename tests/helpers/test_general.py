@@ -1,8 +1,9 @@
 """Test ferroamp_operation_settings/helpers/general.py"""
 
-
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
+from homeassistant.core import State
+
 from custom_components.ferroamp_operation_settings.const import (
     CONF_SYSTEM_ID,
     CONF_LOGIN_EMAIL,
@@ -11,6 +12,7 @@ from custom_components.ferroamp_operation_settings.const import (
 from custom_components.ferroamp_operation_settings.helpers.general import (
     Validator,
     get_parameter,
+    get_power,
 )
 
 from tests.helpers.const import MOCK_CONFIG_DATA, MOCK_CONFIG_OPTIONS
@@ -38,3 +40,14 @@ async def test_get_parameter(hass):
     assert get_parameter(config_entry, CONF_LOGIN_EMAIL) == "abc@d.e"
     assert get_parameter(config_entry, CONF_LOGIN_PASSWORD) is None
     assert get_parameter(config_entry, CONF_LOGIN_PASSWORD, "password") == "password"
+
+
+async def test_get_power(hass):
+    """Test get_power"""
+
+    assert get_power(None) is None
+    assert get_power(State("sensor.power", "unavailable")) is None
+    assert get_power(State("sensor.power", "1500")) == 1500
+    assert (
+        get_power(State("sensor.power", "1.5", {"unit_of_measurement": "kW"})) == 1500
+    )
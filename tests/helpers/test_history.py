@@ -0,0 +1,70 @@
+"""Test ferroamp_operation_settings/helpers/history.py"""
+
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from homeassistant.core import State
+from homeassistant.util import dt as dt_util
+
+from custom_components.ferroamp_operation_settings.helpers.history import (
+    async_read_power_history,
+    sample_states,
+)
+
+
+def make_state(value: str, when: datetime) -> State:
+    """Create a state of the grid power sensor."""
+    return State("sensor.grid_power", value, last_changed=when, last_updated=when)
+
+
+async def test_sample_states():
+    """Test sampling of states at fixed steps."""
+
+    start = datetime(2024, 1, 1, 0, 0, tzinfo=dt_util.UTC)
+    states = [
+        make_state("1000", start + timedelta(seconds=30)),
+        make_state("unavailable", start + timedelta(minutes=2)),
+        make_state("3000", start + timedelta(minutes=3)),
+    ]
+    samples, last = sample_states(states, start, 5, 60, 500.0)
+    assert np.array_equal(
+        samples, [500.0, 1000.0, np.nan, 3000.0, 3000.0], equal_nan=True
+    )
+    assert last == 3000.0
+
+    samples, last = sample_states([], start, 2, 60, last)
+    assert list(samples) == [3000.0, 3000.0]
+
+
+async def test_async_read_power_history(hass):
+    """Test that the history is read in chunks."""
+
+    start = datetime(2024, 1, 1, 0, 0, tzinfo=dt_util.UTC)
+    hass.states.async_set("sensor.grid_power", "2", {"unit_of_measurement": "kW"})
+    calls = []
+
+    def state_changes_during_period(
+        hass, chunk_start, chunk_end, entity_id, *args
+    ):  # pylint: disable=unused-argument
+        calls.append((chunk_start, chunk_end))
+        return {entity_id: [make_state(str(len(calls)), chunk_start)]}
+
+    recorder = MagicMock()
+    recorder.async_add_executor_job = hass.async_add_executor_job
+    with patch(
+        "homeassistant.components.recorder.get_instance", return_value=recorder
+    ), patch(
+        "homeassistant.components.recorder.history.state_changes_during_period",
+        side_effect=state_changes_during_period,
+    ):
+        samples = await async_read_power_history(
+            hass, "sensor.grid_power", start, start + timedelta(days=2, hours=12)
+        )
+    assert len(calls) == 3
+    assert calls[-1] == (start + timedelta(days=2), start + timedelta(days=2, hours=12))
+    assert len(samples) == 60 * 24 * 2 + 60 * 12
+    # kW is converted to W
+    assert samples[0] == 1000.0
+    assert samples[-1] == 3000.0
@@ -0,0 +1,83 @@
+"""Test ferroamp_operation_settings/helpers/oauth.py"""
+
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from custom_components.ferroamp_operation_settings.helpers.oauth import (
+    OAuthTokens,
+    create_code_challenge,
+    create_code_verifier,
+    prepare_authorization_uri,
+    prepare_refresh_body,
+    prepare_token_body,
+)
+
+
+async def test_code_verifier_and_challenge():
+    """Test the PKCE helpers."""
+
+    code_verifier = create_code_verifier(88)
+    assert len(code_verifier) == 88
+    assert create_code_verifier(88) != code_verifier
+
+    with pytest.raises(ValueError):
+        create_code_verifier(42)
+
+    # Example from RFC 7636, Appendix B
+    assert (
+        create_code_challenge("dBjftJeZ4CVP-mB92K27uhbUJU1p1r_wW1gFWFOEjXk")
+        == "E9Melhoa2OwvFrEMTJguCHaoeK1t8URWbuGJSstw-cM"
+    )
+
+
+async def test_prepare_requests():
+    """Test the request builders."""
+
+    uri = prepare_authorization_uri(
+        "https://auth.example.com/auth",
+        client_id="client",
+        redirect_uri="https://portal.example.com/app?session_state=a&code=b",
+        state="state",
+        code_challenge="challenge",
+        response_mode="fragment",
+    )
+    params = parse_qs(urlparse(uri).query)
+    assert params["response_type"] == ["code"]
+    assert params["client_id"] == ["client"]
+    assert params["redirect_uri"] == [
+        "https://portal.example.com/app?session_state=a&code=b"
+    ]
+    assert params["code_challenge_method"] == ["S256"]
+    assert params["response_mode"] == ["fragment"]
+
+    params = parse_qs(prepare_token_body("client", "code", "https://a.b/", "verifier"))
+    assert params["grant_type"] == ["authorization_code"]
+    assert params["code_verifier"] == ["verifier"]
+
+    params = parse_qs(prepare_refresh_body("client", "refresh"))
+    assert params["grant_type"] == ["refresh_token"]
+    assert params["refresh_token"] == ["refresh"]
+
+
+async def test_tokens():
+    """Test OAuthTokens."""
+
+    tokens = OAuthTokens.from_response(
+        {
+            "access_token": "access",
+            "refresh_token": "refresh",
+            "expires_in": 300,
+            "refresh_expires_in": 1800,
+        },
+        now=1000.0,
+    )
+    assert tokens.access_token == "access"
+    assert tokens.refresh_token == "refresh"
+    assert tokens.expires_at == 1300.0
+    assert tokens.refresh_expires_at == 2800.0
+    assert not tokens.expires_within(30, now=1200.0)
+    assert tokens.expires_within(30, now=1280.0)
+
+    with pytest.raises(KeyError):
+        OAuthTokens.from_response({"expires_in": 300})
@@ -0,0 +1,77 @@
+"""Test ferroamp_operation_settings/helpers/peak_tracker.py"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.ferroamp_operation_settings.helpers.peak_tracker import (
+    PeakTracker,
+)
+
+
+def track(tracker: PeakTracker, start: datetime, means: list[float]):
+    """Add samples that give the hourly means, from start."""
+    for hour, mean in enumerate(means):
+        tracker.add(start + timedelta(hours=hour), mean)
+
+
+async def test_peak_tracker():
+    """Test the hourly means and the top peaks."""
+
+    start = datetime(2024, 1, 10, 0, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    tracker = PeakTracker(3)
+    track(tracker, start, [1000, 3000, 2000, 500, 4000, 1500])
+    # The last hour is not completed
+    assert len(tracker.hours) == 5
+    assert sorted(tracker.peaks) == [
+        (2000, (start + timedelta(hours=2)).isoformat()),
+        (3000, (start + timedelta(hours=1)).isoformat()),
+        (4000, (start + timedelta(hours=4)).isoformat()),
+    ]
+
+    now = start + timedelta(hours=5, minutes=30)
+    assert tracker.target(now) == 2000
+    assert tracker.projected(now) == pytest.approx(1500)
+    # 1500 W for half an hour, so 2500 W can be used for the rest of the hour
+    assert tracker.discharge_threshold(now) == pytest.approx(2500)
+
+    # Samples within an hour are weighted by time
+    tracker.add(start + timedelta(hours=5, minutes=45), 5500)
+    tracker.add(start + timedelta(hours=6), 0)
+    assert tracker.hours[-1][1] == pytest.approx(2500)
+    assert tracker.peaks[0][0] == pytest.approx(2500)
+
+    # Exported power counts as zero
+    tracker.add(start + timedelta(hours=7), -3000)
+    assert tracker.hours[-1][1] == 0
+
+    # A new month starts without peaks
+    tracker.add(datetime(2024, 2, 1, 0, 30, tzinfo=dt_util.DEFAULT_TIME_ZONE), 100)
+    tracker.add(datetime(2024, 2, 1, 1, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE), 100)
+    assert tracker.month == (2024, 2)
+    assert len(tracker.peaks) == 1
+    assert (
+        tracker.target(datetime(2024, 2, 1, 1, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE))
+        is None
+    )
+
+
+async def test_peak_tracker_restore():
+    """Test that the state can be stored and restored."""
+
+    start = datetime(2024, 1, 10, 0, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    tracker = PeakTracker(3)
+    track(tracker, start, [1000, 3000, 2000, 500, 4000])
+    tracker.add(start + timedelta(hours=4, minutes=30), 0)
+
+    restored = PeakTracker(2)
+    restored.restore(tracker.as_dict())
+    assert list(restored.hours) == list(tracker.hours)
+    assert sorted(mean for mean, _ in restored.peaks) == [2000, 3000]
+    # The power since the state was stored is not known
+    assert restored.projected(start + timedelta(hours=4, minutes=45)) is None
+    restored.add(start + timedelta(hours=4, minutes=45), 1000)
+    restored.add(start + timedelta(hours=5), 0)
+    assert restored.hours[-1][1] == pytest.approx((4000 * 30 + 1000 * 15) / 45)
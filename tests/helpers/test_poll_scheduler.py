@@ -0,0 +1,132 @@
+"""Test ferroamp_operation_settings/helpers/poll_scheduler.py"""
+
+import heapq
+import logging
+
+import numpy as np
+import pytest
+
+from custom_components.ferroamp_operation_settings.helpers.poll_scheduler import (
+    PollScheduler,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def test_poll_scheduler():
+    """Test the slots, the accounts and the delays."""
+
+    scheduler = PollScheduler(jitter_share=0.0)
+    for index in range(4):
+        scheduler.register(f"a{index}", "a", 60)
+    scheduler.register("b0", "b", 60)
+    scheduler.register("b1", "b", 60)
+    assert len(scheduler) == 6
+    # The slots go round the accounts
+    phases = sorted(["a0", "a1", "a2", "a3", "b0", "b1"], key=scheduler.phase)
+    assert phases == ["a0", "b0", "a1", "b1", "a2", "a3"]
+    assert scheduler.phase("a1") == pytest.approx(2 / 6)
+
+    # The poll is in the slot nearest to the wanted delay
+    assert scheduler.next_delay("a1", 980, 60) == pytest.approx(1040 - 980)
+    assert scheduler.next_delay("a1", 981, 60) == pytest.approx(1040 - 981)
+    assert scheduler.next_delay("a1", 1000, 60) == pytest.approx(1040 - 1000)
+    assert scheduler.next_delay("b0", 980, 60) == pytest.approx(1030 - 980)
+    assert scheduler.next_delay("b0", 980, 120) == pytest.approx(1090 - 980)
+
+    scheduler.unregister("b0")
+    scheduler.unregister("unknown")
+    assert len(scheduler) == 5
+    assert scheduler.phase("b1") == pytest.approx(1 / 5)
+
+    # The jitter is a share of the distance between slots
+    scheduler = PollScheduler(jitter_share=0.1, seed=1)
+    for index in range(10):
+        scheduler.register(index, "a", 100)
+    for _ in range(100):
+        delay = scheduler.next_delay(3, 0, 100)
+        assert 130 - 1 <= delay <= 130 + 1
+
+
+def simulate_polls(
+    scheduler: PollScheduler | None,
+    pollers: int,
+    accounts: int,
+    interval: float,
+    duration: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Simulate pollers that all start at time 0.
+
+    Returns the times and the accounts of the polls.
+    """
+    queue = []
+    for index in range(pollers):
+        if scheduler is not None:
+            scheduler.register(index, index % accounts, interval)
+    for index in range(pollers):
+        delay = (
+            scheduler.next_delay(index, 0.0, interval)
+            if scheduler is not None
+            else interval
+        )
+        heapq.heappush(queue, (delay, index))
+    times, owners = [], []
+    while queue[0][0] < duration:
+        now, index = heapq.heappop(queue)
+        times.append(now)
+        owners.append(index % accounts)
+        delay = (
+            scheduler.next_delay(index, now, interval)
+            if scheduler is not None
+            else interval
+        )
+        heapq.heappush(queue, (now + delay, index))
+    return np.array(times), np.array(owners)
+
+
+def rate_profile(times: np.ndarray, start: float, end: float, bucket: float) -> dict:
+    """Get the polls per bucket of time, from start to end."""
+    times = times[times >= start]
+    counts = np.bincount(
+        ((times - start) // bucket).astype(int), minlength=int((end - start) // bucket)
+    )
+    return {
+        "mean": float(np.mean(counts)),
+        "max": int(np.max(counts)),
+        "empty": float(np.mean(counts == 0)),
+    }
+
+
+async def test_poll_scheduler_benchmark():
+    """Test the request rate of 100 config entries of 10 accounts.
+
+    Unscheduled pollers that start together poll in bursts, while scheduled
+    pollers keep a steady rate.
+    """
+
+    pollers, accounts, interval, duration, bucket = 100, 10, 300.0, 3600.0, 10.0
+
+    times, _ = simulate_polls(None, pollers, accounts, interval, duration)
+    unscheduled = rate_profile(times, interval, duration, bucket)
+
+    times, owners = simulate_polls(
+        PollScheduler(seed=1), pollers, accounts, interval, duration
+    )
+    # After the first polls
+    scheduled = rate_profile(times, interval, duration, bucket)
+    _LOGGER.info(
+        "Polls per %.0f s of %s entries, unscheduled: %s, scheduled: %s",
+        bucket,
+        pollers,
+        unscheduled,
+        scheduled,
+    )
+
+    assert unscheduled["max"] == pollers
+    assert scheduled["mean"] == pytest.approx(pollers * bucket / interval, rel=0.1)
+    assert scheduled["max"] <= 5
+    assert scheduled["empty"] == 0
+    # The polls of one account are ten slots apart
+    for account in range(accounts):
+        gaps = np.diff(times[owners == account])
+        assert np.min(gaps) >= 10 * interval / pollers * 0.8
@@ -0,0 +1,119 @@
+"""Test ferroamp_operation_settings/helpers/price_planner.py"""
+
+from datetime import timedelta
+from itertools import product
+import time
+
+import numpy as np
+import pytest
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.ferroamp_operation_settings.const import (
+    BATTERY_CHARGE,
+    BATTERY_DISCHARGE,
+    BATTERY_OFF,
+)
+from custom_components.ferroamp_operation_settings.helpers.price_planner import (
+    ACTIONS,
+    DEFAULT_EFFICIENCY,
+    parse_prices,
+    plan_battery,
+    plan_profiles,
+    remaining,
+)
+
+
+def nordpool_attributes(prices, start, slot=timedelta(hours=1)):
+    """Create attributes like those of a Nord Pool sensor."""
+    return {
+        "raw_today": [
+            {
+                "start": (start + index * slot).isoformat(),
+                "end": (start + (index + 1) * slot).isoformat(),
+                "value": price,
+            }
+            for index, price in enumerate(prices)
+        ],
+        "raw_tomorrow": [],
+    }
+
+
+async def test_parse_prices():
+    """Test parse_prices() and remaining()."""
+
+    start = dt_util.start_of_local_day()
+    attributes = nordpool_attributes([1.0, 2.0, 3.0, 4.0], start, timedelta(minutes=15))
+    attributes["raw_tomorrow"] = [{"start": "invalid", "value": 1}, {"value": 2}]
+    starts, prices, slot_hours = parse_prices(attributes)
+    assert starts[0] == start
+    assert list(prices) == [1.0, 2.0, 3.0, 4.0]
+    assert slot_hours == 0.25
+
+    starts, prices = remaining(
+        starts, prices, slot_hours, start + timedelta(minutes=20)
+    )
+    assert list(prices) == [2.0, 3.0, 4.0]
+
+    with pytest.raises(ValueError):
+        parse_prices({"raw_today": []})
+
+
+def brute_force(prices, levels, start):
+    """Lowest cost by trying all plans."""
+    eta = np.sqrt(DEFAULT_EFFICIENCY)
+    best = None
+    for plan in product((0, 1, -1), repeat=len(prices)):
+        level = start
+        cost = 0.0
+        for price, move in zip(prices, plan):
+            level += move
+            if not 0 <= level < levels:
+                break
+            cost += price / eta if move == 1 else -price * eta if move == -1 else 0
+        else:
+            cost -= level * np.median(prices) * eta
+            if best is None or cost < best:
+                best = cost
+    return best
+
+
+async def test_plan_battery():
+    """Test that the plan is optimal and keeps the state of charge limits."""
+
+    prices = np.array([1.0, 0.5, 3.0, 4.0, 0.2, 0.1, 5.0, 2.0])
+    # 1 kWh per slot, and 3 levels between 20% and 40% of 10 kWh
+    actions, socs, cost = plan_battery(prices, 1.0, 10.0, 1000.0, 20.0, 40.0, 20.0)
+    assert len(actions) == len(prices)
+    assert np.all(socs >= 20.0 - 1e-9) and np.all(socs <= 40.0 + 1e-9)
+    value = cost - (socs[-1] / 10 - 2 + {0: 0, 1: 1, 2: -1}[int(actions[-1])]) * (
+        np.median(prices) * np.sqrt(DEFAULT_EFFICIENCY)
+    )
+    assert value == pytest.approx(brute_force(prices, 3, 0))
+    assert ACTIONS[int(actions[5])] == BATTERY_CHARGE
+    assert ACTIONS[int(actions[6])] == BATTERY_DISCHARGE
+
+    with pytest.raises(ValueError):
+        plan_battery(prices, 1.0, 10.0, 1000.0, 40.0, 40.0, 40.0)
+
+
+async def test_plan_battery_benchmark():
+    """Test that two days of 15 minute prices are planned in milliseconds."""
+
+    prices = np.random.default_rng(1).uniform(0.0, 5.0, 192)
+    start = time.perf_counter()
+    actions, _, _ = plan_battery(prices, 0.25, 15.0, 3000.0, 10.0, 95.0, 50.0)
+    assert time.perf_counter() - start < 0.1
+    assert len(actions) == 192
+
+
+async def test_plan_profiles():
+    """Test the conversion of a plan to profiles."""
+
+    start = dt_util.start_of_local_day()
+    starts = [start, start + timedelta(hours=1), start + timedelta(hours=2)]
+    steps = plan_profiles(starts, np.array([1, 0, 2]), 2500.0)
+    assert steps[0][1]["battery_power_mode"] == BATTERY_CHARGE
+    assert steps[0][1]["charge_reference"] == 2500.0
+    assert steps[1][1]["battery_power_mode"] == BATTERY_OFF
+    assert steps[2][1]["discharge_reference"] == 2500.0
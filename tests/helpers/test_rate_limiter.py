@@ -0,0 +1,77 @@
+"""Test ferroamp_operation_settings/helpers/rate_limiter.py"""
+
+import asyncio
+
+from custom_components.ferroamp_operation_settings.helpers.rate_limiter import (
+    ENDPOINT_READ,
+    ENDPOINT_WRITE,
+    RateLimiter,
+    TokenBucket,
+)
+
+
+async def test_token_bucket():
+    """Test that callers wait for tokens in order."""
+
+    bucket = TokenBucket(rate=50.0, capacity=2)
+    order = []
+
+    async def acquire(index):
+        waited = await bucket.async_acquire()
+        order.append(index)
+        return waited
+
+    waits = await asyncio.gather(*[acquire(index) for index in range(4)])
+    assert order == [0, 1, 2, 3]
+    # The burst is served at once, the rest has to wait.
+    assert waits[0] < 0.01
+    assert waits[1] < 0.01
+    assert waits[2] > 0.01
+    assert waits[3] > waits[2]
+
+
+async def test_token_bucket_priority():
+    """Test that waiting callers with a lower priority value are served first."""
+
+    bucket = TokenBucket(rate=50.0, capacity=1)
+    order = []
+
+    async def acquire(name, priority):
+        await bucket.async_acquire(priority)
+        order.append(name)
+
+    await acquire("first", 1)
+    tasks = [
+        asyncio.create_task(acquire("background", 1)),
+        asyncio.create_task(acquire("interactive", 0)),
+    ]
+    await asyncio.gather(*tasks)
+    assert order == ["first", "interactive", "background"]
+
+    # A cancelled caller does not take a token
+    task = asyncio.create_task(acquire("cancelled", 1))
+    await asyncio.sleep(0)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await acquire("last", 1)
+    assert order[-1] == "last"
+
+
+async def test_rate_limiter():
+    """Test the rate limiter of an account."""
+
+    limiter = RateLimiter({ENDPOINT_WRITE: (50.0, 1)})
+
+    # No limit of unknown classes
+    await limiter.async_acquire(ENDPOINT_READ)
+    await limiter.async_acquire(ENDPOINT_WRITE)
+    assert limiter.limited == 0
+
+    await limiter.async_acquire(ENDPOINT_WRITE)
+    assert limiter.limited == 1
+    assert limiter.wait_time > 0.01
+
+    limiter.configure(ENDPOINT_READ, 50.0, 1)
+    await limiter.async_acquire(ENDPOINT_READ)
+    await limiter.async_acquire(ENDPOINT_READ)
+    assert limiter.limited == 2
@@ -0,0 +1,78 @@
+"""Test ferroamp_operation_settings/helpers/reconciler.py"""
+
+from datetime import timedelta
+from unittest.mock import AsyncMock
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.ferroamp_operation_settings.helpers.poll_scheduler import (
+    PollScheduler,
+)
+from custom_components.ferroamp_operation_settings.helpers.reconciler import (
+    MAX_BACKOFF_FACTOR,
+    Reconciler,
+)
+
+
+async def test_reconciler(hass: HomeAssistant):
+    """Test the interval, the drift counter and the backoff."""
+
+    reconcile = AsyncMock(return_value=False)
+    reconciler = Reconciler(hass, 60, reconcile)
+    reconciler.start()
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=61))
+    await hass.async_block_till_done()
+    assert reconcile.call_count == 1
+    assert reconciler.drift == 0
+
+    reconcile.return_value = True
+    await reconciler.async_run()
+    assert reconciler.drift == 1
+    assert reconciler.delay == 60
+
+    reconcile.side_effect = Exception("Failed")
+    for _ in range(5):
+        await reconciler.async_run()
+    assert reconciler.failures == 5
+    assert reconciler.delay == 60 * MAX_BACKOFF_FACTOR
+    assert reconciler.drift == 1
+
+    reconcile.side_effect = None
+    await reconciler.async_run()
+    assert reconciler.failures == 0
+
+    reconciler.stop()
+    calls = reconcile.call_count
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(hours=1))
+    await hass.async_block_till_done()
+    assert reconcile.call_count == calls
+
+
+async def test_reconciler_scheduler(hass: HomeAssistant):
+    """Test that reconcilers share the slots of a scheduler."""
+
+    scheduler = PollScheduler()
+    reconcile = AsyncMock(return_value=False)
+    reconcilers = [
+        Reconciler(hass, 60, reconcile, scheduler, "abc@d.e") for _ in range(3)
+    ]
+    for reconciler in reconcilers:
+        reconciler.start()
+    assert len(scheduler) == 3
+    assert sorted(scheduler.phase(reconciler) for reconciler in reconcilers) == [
+        0,
+        1 / 3,
+        2 / 3,
+    ]
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=95))
+    await hass.async_block_till_done()
+    assert reconcile.call_count == 3
+
+    for reconciler in reconcilers:
+        reconciler.stop()
+    assert len(scheduler) == 0
@@ -0,0 +1,48 @@
+"""Test ferroamp_operation_settings/helpers/reference_controller.py"""
+
+import pytest
+
+from custom_components.ferroamp_operation_settings.helpers.reference_controller import (
+    ReferenceController,
+)
+
+
+async def test_reference_controller():
+    """Test the deadband, the minimum interval, the hysteresis and the limits."""
+
+    controller = ReferenceController(0, 200, 300, 60, max_power=5000)
+    # Within the deadband
+    assert controller.step(0, 100, 0) is None
+    # Importing, so the battery is discharged
+    assert controller.step(10, 1000, 0) == -1000
+    controller.record_write(10, 10.5)
+    assert controller.latency == pytest.approx(0.5)
+    # Too soon after the last write
+    assert controller.step(20, 800, -1000) is None
+    assert controller.held == 1
+    assert controller.step(70, 800, -1000) == -1800
+    controller.record_write(70, 71.5)
+    assert controller.latency == pytest.approx(0.5 + 0.2 * (1.5 - 0.5))
+    assert controller.interval == pytest.approx(10 + 0.2 * (50 - 10))
+    assert controller.samples == 4
+
+    # Charging below the hysteresis is off
+    assert controller.step(200, -250, -100) == 0
+    # But not when already charging
+    assert controller.step(200, -250, 100) == 350
+    # Limited by the battery power
+    assert controller.step(300, 8000, -1000) == -5000
+    # An unchanged reference is not written
+    assert controller.step(400, 8000, -5000) is None
+
+
+async def test_reference_controller_write_rate():
+    """Test the number of writes per hour."""
+
+    controller = ReferenceController(0, 200, 300, 60)
+    controller.record_write(10, 11)
+    controller.record_write(70, 71)
+    assert controller.writes == 2
+    assert controller.write_rate(100) == 2
+    assert controller.write_rate(3650) == 1
+    assert controller.write_rate(7200) == 0
@@ -0,0 +1,142 @@
+"""Test ferroamp_operation_settings/helpers/request_scheduler.py"""
+
+import asyncio
+
+import pytest
+
+from custom_components.ferroamp_operation_settings.helpers.request_scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    SLOW_THRESHOLD,
+    RequestScheduler,
+    RequestShedError,
+    SharedPriority,
+    get_request_priority,
+    request_priority,
+)
+
+
+async def test_request_priority():
+    """Test the priority of the context."""
+
+    assert get_request_priority() == PRIORITY_INTERACTIVE
+    with request_priority(PRIORITY_BACKGROUND):
+        assert get_request_priority() == PRIORITY_BACKGROUND
+    assert get_request_priority() == PRIORITY_INTERACTIVE
+
+
+async def test_scheduler_priority():
+    """Test that interactive requests are served before background requests."""
+
+    scheduler = RequestScheduler(max_concurrency=1)
+    release = asyncio.Event()
+    order = []
+
+    async def request(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+            await release.wait()
+
+    first = asyncio.create_task(request("first", PRIORITY_BACKGROUND))
+    await asyncio.sleep(0)
+    background = asyncio.create_task(request("background", PRIORITY_BACKGROUND))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(request("interactive", PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    assert scheduler.queued == 2
+
+    release.set()
+    await asyncio.gather(first, background, interactive)
+    assert order == ["first", "interactive", "background"]
+    assert scheduler.queued == 0
+    assert scheduler.latency is not None
+
+
+async def test_scheduler_shed():
+    """Test that background requests are shed when the portal is slow."""
+
+    scheduler = RequestScheduler(max_concurrency=1)
+    scheduler.latency = SLOW_THRESHOLD + 1
+    release = asyncio.Event()
+
+    async def request(priority):
+        async with scheduler.slot(priority):
+            await release.wait()
+
+    first = asyncio.create_task(request(PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+
+    # A new background request is shed
+    with pytest.raises(RequestShedError):
+        await request(PRIORITY_BACKGROUND)
+    assert scheduler.shed == 1
+
+    # An idle scheduler does not shed
+    release.set()
+    await first
+    release.clear()
+    first = asyncio.create_task(request(PRIORITY_BACKGROUND))
+    await asyncio.sleep(0)
+    assert scheduler.shed == 1
+
+    # A waiting background request is shed by an interactive request
+    waiting = asyncio.create_task(request(PRIORITY_BACKGROUND))
+    await asyncio.sleep(0)
+    assert scheduler.queued == 1
+    scheduler.latency = SLOW_THRESHOLD + 1
+    interactive = asyncio.create_task(request(PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    with pytest.raises(RequestShedError):
+        await waiting
+    assert scheduler.shed == 2
+
+    release.set()
+    await asyncio.gather(first, interactive)
+
+
+async def test_shared_priority():
+    """Test that shared work gets the highest priority of its callers."""
+
+    shared = SharedPriority()
+    with request_priority(PRIORITY_BACKGROUND):
+        shared.join()
+    assert int(shared) == PRIORITY_BACKGROUND
+
+    scheduler = RequestScheduler(max_concurrency=1)
+    release = asyncio.Event()
+    order = []
+
+    async def request(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+            await release.wait()
+
+    first = asyncio.create_task(request("first", PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(request("interactive", PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    joined = asyncio.create_task(request("joined", shared))
+    await asyncio.sleep(0)
+
+    # A joined interactive caller is not shed when the portal is slow
+    shared.join()
+    assert int(shared) == PRIORITY_INTERACTIVE
+    scheduler.latency = SLOW_THRESHOLD + 1
+    with pytest.raises(RequestShedError):
+        await request("background", PRIORITY_BACKGROUND)
+    assert scheduler.shed == 1
+
+    release.set()
+    await asyncio.gather(first, interactive, joined)
+    assert order == ["first", "interactive", "joined"]
+
+    # Shared priorities can be nested
+    outer = SharedPriority()
+    with request_priority(PRIORITY_BACKGROUND):
+        outer.join()
+    inner = SharedPriority()
+    with request_priority(outer):
+        inner.join()
+    assert int(inner) == PRIORITY_BACKGROUND
+    outer.join()
+    assert int(inner) == PRIORITY_INTERACTIVE
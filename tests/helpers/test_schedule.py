@@ -0,0 +1,111 @@
+"""Test ferroamp_operation_settings/helpers/schedule.py"""
+
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.ferroamp_operation_settings.helpers.schedule import (
+    SCHEDULE_SCHEMA,
+    ScheduleRunner,
+    compile_schedule,
+    current_profile,
+    next_transition,
+    serialize_schedule,
+)
+
+NIGHT = {"mode": "Default", "battery_power_mode": "Charge", "charge_reference": 3000}
+DAY = {"mode": "Peak Shaving"}
+EVENING = {"mode": "Self Consumption"}
+
+
+async def test_compile_schedule():
+    """Test the compilation of slots into transitions."""
+
+    slots = SCHEDULE_SCHEMA(
+        [
+            {"start": "22:00", "end": "06:00", "profile": NIGHT},
+            {"start": "06:00", "end": "12:00", "profile": DAY},
+            {"start": "12:00", "end": "17:00", "profile": DAY},
+            {"start": "17:00", "end": "20:00", "profile": EVENING},
+        ]
+    )
+    transitions = compile_schedule(slots)
+    # Adjacent identical slots are merged, and the night slot wraps midnight.
+    # No transition at 20:00, since nothing is changed until 22:00.
+    assert [minute for minute, _ in transitions] == [6 * 60, 17 * 60, 22 * 60]
+    assert transitions[0][1]["mode"] == "Peak Shaving"
+    assert transitions[2][1]["charge_reference"] == 3000.0
+
+    # A later slot takes precedence
+    slots.append(
+        SCHEDULE_SCHEMA([{"start": "08:00", "end": "09:00", "profile": NIGHT}])[0]
+    )
+    transitions = compile_schedule(slots)
+    assert [minute for minute, _ in transitions] == [
+        6 * 60,
+        8 * 60,
+        9 * 60,
+        17 * 60,
+        22 * 60,
+    ]
+
+    # One profile all day
+    all_day = SCHEDULE_SCHEMA([{"start": "00:00", "end": "00:00", "profile": DAY}])
+    assert compile_schedule(all_day) == [(0, DAY)]
+    assert compile_schedule([]) == []
+
+    # Serialized slots can be validated again
+    assert SCHEDULE_SCHEMA(serialize_schedule(slots)) == slots
+
+
+async def test_next_transition():
+    """Test next_transition() and current_profile()."""
+
+    transitions = [(6 * 60, DAY), (22 * 60, NIGHT)]
+    now = datetime(2024, 1, 1, 12, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    assert next_transition(transitions, now) == (now.replace(hour=22), NIGHT)
+    assert current_profile(transitions, now) == DAY
+
+    now = datetime(2024, 1, 1, 23, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    when, profile = next_transition(transitions, now)
+    assert when == datetime(2024, 1, 2, 6, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    assert profile == DAY
+    assert current_profile(transitions, now) == NIGHT
+
+    now = datetime(2024, 1, 1, 3, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    assert current_profile(transitions, now) == NIGHT
+
+
+async def test_schedule_runner(hass: HomeAssistant):
+    """Test that the runner writes each profile at its transition."""
+
+    apply = AsyncMock()
+    now = dt_util.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    transitions = [(6 * 60, DAY), (22 * 60, NIGHT)]
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.schedule.dt_util.now",
+        return_value=now,
+    ):
+        runner = ScheduleRunner(hass, transitions, apply)
+        runner.start(apply_current=True)
+        await hass.async_block_till_done()
+    apply.assert_called_once_with(DAY)
+    assert runner.next_time == now.replace(hour=22)
+
+    later = now.replace(hour=22) + timedelta(seconds=1)
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.schedule.dt_util.now",
+        return_value=later,
+    ):
+        async_fire_time_changed(hass, later)
+        await hass.async_block_till_done()
+    assert apply.call_count == 2
+    apply.assert_called_with(NIGHT)
+    assert runner.next_time == now.replace(hour=6) + timedelta(days=1)
+
+    runner.stop()
+    assert runner.next_time is None
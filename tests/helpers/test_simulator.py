@@ -0,0 +1,144 @@
+"""Test ferroamp_operation_settings/helpers/simulator.py"""
+
+import time
+
+import numpy as np
+import pytest
+
+from custom_components.ferroamp_operation_settings.helpers.simulator import (
+    bounded_cumsum,
+    read_csv,
+    read_history_csv,
+    simulate,
+)
+
+
+def make_payload(mode=2, high=2000, low=0, **grid):
+    """Create a payload like the one update() sends."""
+    return {
+        "payload": {
+            "battery": {
+                "powerRef": {"discharge": 3000, "charge": 3000},
+                "socRef": {"high": 100, "low": 0},
+            },
+            "pv": {"mode": 1},
+            "grid": {
+                "limitExport": False,
+                "thresholds": {"high": high, "low": low},
+                "limitImport": False,
+                "ace": {"threshold": 16, "mode": 0},
+                **grid,
+            },
+            "mode": mode,
+        }
+    }
+
+
+async def test_bounded_cumsum():
+    """Test the running sum against a loop."""
+
+    deltas = np.random.default_rng(1).normal(0.05, 1.0, 10000)
+    expected = []
+    level = 5.0
+    for delta in deltas:
+        level = min(max(level + delta, 0.0), 10.0)
+        expected.append(level)
+    assert np.allclose(bounded_cumsum(5.0, deltas, 0.0, 10.0), expected)
+    assert np.allclose(bounded_cumsum(20.0, np.ones(3), 0.0, 10.0), [10, 10, 10])
+
+
+async def test_simulate_peak_shaving():
+    """Test that peaks above the threshold are shaved while there is energy."""
+
+    load = np.array([1000.0, 4000.0, 4000.0, 4000.0, 0.0])
+    result = simulate(
+        make_payload(low=1000), load, np.zeros(5), 3600, 4.0, 50.0, efficiency=1.0
+    )
+    # 2 kWh in the battery shaves 2000 W for one hour
+    assert list(result["grid"]) == [1000.0, 2000.0, 4000.0, 4000.0, 1000.0]
+    assert list(result["soc"]) == [50.0, 0.0, 0.0, 0.0, 25.0]
+    assert list(result["soc_hourly"]) == list(result["soc"])
+    assert result["grid_peak"] == 4000.0
+    assert result["imported"] == pytest.approx(12.0)
+    assert result["discharged"] == pytest.approx(2.0)
+    assert result["charged"] == pytest.approx(1.0)
+
+    # With limitImport, charging stays below the high threshold
+    result = simulate(
+        make_payload(low=5000, limitImport=True),
+        np.full(3, 500.0),
+        np.zeros(3),
+        3600,
+        10.0,
+        0,
+    )
+    assert np.allclose(result["grid"], [2000.0, 2000.0, 2000.0])
+
+
+async def test_simulate_self_consumption():
+    """Test charging from PV, limitExport and ACE."""
+
+    load = np.full(4, 500.0)
+    pv = np.array([0.0, 4000.0, 4000.0, 0.0])
+    payload = make_payload(mode=3, high=0, low=0)
+    result = simulate(payload, load, pv, 3600, 4.0, 0.0, efficiency=1.0)
+    assert list(result["soc"]) == [0.0, 75.0, 100.0, 87.5]
+    assert list(result["grid"]) == [500.0, -500.0, -2500.0, 0.0]
+    assert result["exported"] == pytest.approx(3.0)
+
+    payload["payload"]["grid"]["limitExport"] = True
+    payload["payload"]["grid"]["ace"]["mode"] = 1
+    payload["payload"]["grid"]["ace"]["threshold"] = 0.5
+    result = simulate(payload, load, pv, 3600, 4.0, 0.0, efficiency=1.0)
+    assert result["exported"] == 0
+    assert result["curtailed"] == pytest.approx(3.0)
+    assert result["ace_steps"] == 1
+
+
+async def test_simulate_benchmark():
+    """Test that a year of 1 minute data is simulated in seconds."""
+
+    steps = 365 * 24 * 60
+    minutes = np.arange(steps)
+    pv = np.maximum(np.sin(minutes % 1440 / 1440 * 2 * np.pi - np.pi / 2), 0) * 5000
+    load = np.random.default_rng(2).gamma(2.0, 500.0, steps)
+    start = time.perf_counter()
+    result = simulate(make_payload(mode=3), load, pv, 60, 15.0, 50.0)
+    assert time.perf_counter() - start < 2.0
+    assert len(result["soc"]) == steps
+    assert len(result["soc_hourly"]) == 365 * 24
+    assert result["soc_hourly"][0] == result["soc"][59]
+    assert len(result["hourly_peaks"]) == 3
+
+
+async def test_read_csv(tmp_path):
+    """Test reading CSV files."""
+
+    path = tmp_path / "data.csv"
+    path.write_text(
+        "time,load,pv\n"
+        "2024-06-01T12:00:00+00:00,1000,200\n"
+        "2024-06-01T12:01:00+00:00,1100,300\n"
+        "2024-06-01T12:02:00+00:00,1200,400\n",
+        encoding="utf-8",
+    )
+    _, load, pv, step_seconds = read_csv(str(path))
+    assert list(load) == [1000, 1100, 1200]
+    assert list(pv) == [200, 300, 400]
+    assert step_seconds == 60
+
+    path = tmp_path / "history.csv"
+    path.write_text(
+        "entity_id,state,last_changed\n"
+        "sensor.load,1000,2024-06-01T12:00:00.000Z\n"
+        "sensor.pv,0,2024-06-01T12:00:00.000Z\n"
+        "sensor.load,2000,2024-06-01T12:01:30.000Z\n"
+        "sensor.pv,unavailable,2024-06-01T12:02:00.000Z\n"
+        "sensor.other,5,2024-06-01T12:02:00.000Z\n"
+        "sensor.pv,500,2024-06-01T12:03:00.000Z\n",
+        encoding="utf-8",
+    )
+    _, load, pv, step_seconds = read_history_csv(str(path), "sensor.load", "sensor.pv")
+    assert list(load) == [1000, 1000, 2000]
+    assert list(pv) == [0, 0, 0]
+    assert step_seconds == 60
@@ -0,0 +1,54 @@
+"""Test ferroamp_operation_settings/helpers/solar_planner.py"""
+
+import pytest
+
+from custom_components.ferroamp_operation_settings.helpers.solar_planner import (
+    FORECAST_SHARE,
+    SolarPlanner,
+    night_charge,
+    plan_soc_targets,
+    targets_profile,
+)
+
+
+async def test_plan_soc_targets():
+    """Test the socRef targets."""
+
+    # No PV surplus, the battery is charged fully at night
+    targets = plan_soc_targets(5.0, 12.0, 10.0, 20.0)
+    assert targets == {
+        "lower_reference": 20.0,
+        "upper_reference": 100.0,
+        "solar_charge": 0.0,
+    }
+    assert night_charge(targets, 10.0, 30.0) == 7.0
+    assert night_charge(targets, 10.0, None) is None
+
+    # Some PV surplus
+    targets = plan_soc_targets(10.0, 5.0, 10.0, 20.0, efficiency=1.0)
+    assert targets["solar_charge"] == pytest.approx(5.0 * FORECAST_SHARE)
+    assert targets["upper_reference"] == pytest.approx(100 - 50 * FORECAST_SHARE)
+    assert targets_profile(targets) == {
+        "lower_reference": 20.0,
+        "upper_reference": targets["upper_reference"],
+    }
+
+    # More PV surplus than room in the battery. No grid charging.
+    targets = plan_soc_targets(50.0, 5.0, 10.0, 20.0)
+    assert targets["upper_reference"] == 20.0
+    assert targets["solar_charge"] == 8.0
+    assert night_charge(targets, 10.0, 50.0) == 0.0
+
+
+async def test_solar_planner():
+    """Test that the targets are only computed when the inputs change."""
+
+    planner = SolarPlanner()
+    targets, computed = planner.plan(10.0, 5.0, 10.0, 20.0)
+    assert computed
+    assert planner.plan(10.0, 5.0, 10.0, 20.0) == (targets, False)
+    assert planner.plan(10.001, 5.0, 10.0, 20.0) == (targets, False)
+    assert planner.computations == 1
+    _, computed = planner.plan(12.0, 5.0, 10.0, 20.0)
+    assert computed
+    assert planner.computations == 2
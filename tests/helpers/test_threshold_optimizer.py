@@ -0,0 +1,52 @@
+"""Test ferroamp_operation_settings/helpers/threshold_optimizer.py"""
+
+import time
+
+import numpy as np
+
+from custom_components.ferroamp_operation_settings.helpers.threshold_optimizer import (
+    optimize_thresholds,
+    peak_cost,
+)
+
+PAYLOAD = {
+    "battery": {
+        "powerRef": {"discharge": 3000, "charge": 3000},
+        "socRef": {"high": 100, "low": 10},
+    },
+    "pv": {"mode": 1},
+    "grid": {
+        "limitExport": False,
+        "thresholds": {"high": 0, "low": 0},
+        "limitImport": False,
+        "ace": {"threshold": 16, "mode": 0},
+    },
+    "mode": 1,
+}
+
+
+async def test_peak_cost():
+    """Test the mean of the top hourly means."""
+
+    grid = np.repeat([1000.0, 5000.0, 2000.0, 4000.0], 60)
+    assert peak_cost(grid, 60, 2) == 4500.0
+    assert peak_cost(grid[:30], 60, 2) == 0.0
+
+
+async def test_optimize_thresholds():
+    """Test that the thresholds lower the peaks within the battery limits."""
+
+    minutes = np.arange(4 * 7 * 1440)
+    evening = (minutes % 1440 >= 1020) & (minutes % 1440 < 1140)
+    grid = np.random.default_rng(3).gamma(2.0, 500.0, len(minutes))
+    grid = grid + np.where(evening, 4000.0, 0.0)
+    grid[:10] = np.nan
+
+    start = time.perf_counter()
+    result = optimize_thresholds(grid, 60, PAYLOAD, 10.0, 50.0, 3)
+    assert time.perf_counter() - start < 5.0
+
+    assert result["charge_threshold"] < result["discharge_threshold"]
+    assert result["peak"] < result["baseline_peak"] - 2000
+    # The battery can not shave more than the discharge reference
+    assert result["peak"] > result["baseline_peak"] - 3000
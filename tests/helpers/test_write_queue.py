@@ -0,0 +1,97 @@
+"""Test ferroamp_operation_settings/helpers/write_queue.py"""
+
+import asyncio
+
+import pytest
+
+from custom_components.ferroamp_operation_settings.helpers.request_scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    get_request_priority,
+    request_priority,
+)
+from custom_components.ferroamp_operation_settings.helpers.write_queue import (
+    WriteQueue,
+)
+
+
+async def test_write_queue_latest_wins():
+    """Test that a superseded pending write is dropped."""
+
+    queue = WriteQueue()
+    release = asyncio.Event()
+    written = []
+    depths = []
+    queue.add_listener(lambda: depths.append(queue.depth))
+
+    async def writer(payload):
+        await release.wait()
+        written.append(payload)
+        return payload
+
+    task_a = asyncio.create_task(queue.async_write("A", writer))
+    await asyncio.sleep(0)
+    assert queue.depth == 1
+
+    task_b = asyncio.create_task(queue.async_write("B", writer))
+    task_c = asyncio.create_task(queue.async_write("C", writer))
+    await asyncio.sleep(0)
+    assert queue.depth == 2
+
+    release.set()
+    assert await task_a == ("A", True)
+    # B was superseded by C before it was sent
+    assert await task_b == ("C", False)
+    assert await task_c == ("C", True)
+
+    assert written == ["A", "C"]
+    assert queue.sent == 2
+    assert queue.dropped == 1
+    assert queue.depth == 0
+    assert max(depths) == 2
+
+
+async def test_write_queue_exception():
+    """Test that an exception reaches the caller and does not stop the queue."""
+
+    queue = WriteQueue()
+    remove_listener = queue.add_listener(lambda: None)
+    remove_listener()
+
+    async def failing_writer(payload):
+        raise ValueError(payload)
+
+    async def writer(payload):
+        return payload
+
+    with pytest.raises(ValueError):
+        await queue.async_write("A", failing_writer)
+    assert await queue.async_write("B", writer) == ("B", True)
+    assert queue.sent == 2
+
+
+async def test_write_queue_priority():
+    """Test that a write is sent with the highest priority of its callers."""
+
+    queue = WriteQueue()
+    release = asyncio.Event()
+    priorities = {}
+
+    async def writer(payload):
+        await release.wait()
+        priorities[payload] = int(get_request_priority())
+        return payload
+
+    async def background_write(payload):
+        with request_priority(PRIORITY_BACKGROUND):
+            return await queue.async_write(payload, writer)
+
+    task_a = asyncio.create_task(background_write("A"))
+    await asyncio.sleep(0)
+    task_b = asyncio.create_task(background_write("B"))
+    await asyncio.sleep(0)
+    task_c = asyncio.create_task(queue.async_write("C", writer))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(task_a, task_b, task_c)
+    assert priorities == {"A": PRIORITY_BACKGROUND, "C": PRIORITY_INTERACTIVE}
@@ -9,7 +9,12 @@ from homeassistant.data_entry_flow import FlowResultType
 import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
-from custom_components.ferroamp_operation_settings.const import DOMAIN
+from custom_components.ferroamp_operation_settings.const import (
+    CONF_LOGIN_EMAIL,
+    CONF_LOGIN_PASSWORD,
+    CONF_PEAK_COUNT,
+    DOMAIN,
+)
 
 from .const import (
     MOCK_CONFIG_ALL,
@@ -114,3 +119,106 @@ async def test_successful_config_flow_option(hass: HomeAssistant):
     if "errors" in result.keys():
         assert len(result["errors"]) == 0
     assert result["result"]
+
+
+async def test_config_flow_option_without_login(hass: HomeAssistant):
+    """Test that an option flow only logs in when the login information changes."""
+
+    config_entry: config_entries.ConfigEntry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test"
+    )
+    config_entry.add_to_hass(hass)
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.config_flow.FlowValidator.validate_step_user",
+        return_value=None,
+    ) as validate_step_user:
+        result = await hass.config_entries.options.async_init(
+            handler="test", context={"source": "init"}
+        )
+        result = await hass.config_entries.options.async_configure(
+            result["flow_id"], user_input={**MOCK_OPTIONS_ALL, CONF_PEAK_COUNT: 2}
+        )
+        assert result["type"] == FlowResultType.CREATE_ENTRY
+        assert validate_step_user.call_count == 0
+
+        result = await hass.config_entries.options.async_init(
+            handler="test", context={"source": "init"}
+        )
+        result = await hass.config_entries.options.async_configure(
+            result["flow_id"],
+            user_input={**MOCK_OPTIONS_ALL, CONF_LOGIN_PASSWORD: "new_password"},
+        )
+        assert result["type"] == FlowResultType.CREATE_ENTRY
+        assert validate_step_user.call_count == 1
+
+
+# Simulate a successful reauth flow
+async def test_successful_reauth_flow(hass: HomeAssistant, bypass_validate_step_user):
+    """Test a reauth flow."""
+
+    config_entry: config_entries.ConfigEntry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_ALL, options=MOCK_OPTIONS_ALL, entry_id="test"
+    )
+    config_entry.add_to_hass(hass)
+
+    # Initialize a reauth flow
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN,
+        context={"source": config_entries.SOURCE_REAUTH, "entry_id": "test"},
+        data=config_entry.data,
+    )
+
+    # Check that the reauth flow shows the reauth_confirm form
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "reauth_confirm"
+
+    with patch(
+        "homeassistant.config_entries.ConfigEntries.async_reload", return_value=True
+    ):
+        result = await hass.config_entries.flow.async_configure(
+            result["flow_id"],
+            user_input={
+                CONF_LOGIN_EMAIL: "new@d.c",
+                CONF_LOGIN_PASSWORD: "new_password",
+            },
+        )
+
+    # Check that the credentials are updated both in data and options
+    assert result["type"] == FlowResultType.ABORT
+    assert result["reason"] == "reauth_successful"
+    assert config_entry.data[CONF_LOGIN_EMAIL] == "new@d.c"
+    assert config_entry.options[CONF_LOGIN_PASSWORD] == "new_password"
+
+
+# Simulate an unsuccessful reauth flow
+async def test_unsuccessful_reauth_flow(hass: HomeAssistant):
+    """Test a reauth flow with incorrect login information."""
+
+    config_entry: config_entries.ConfigEntry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test"
+    )
+    config_entry.add_to_hass(hass)
+
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN,
+        context={"source": config_entries.SOURCE_REAUTH, "entry_id": "test"},
+        data=config_entry.data,
+    )
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.config_flow.FlowValidator.validate_step_user",
+        return_value=("base", "login_failed"),
+    ):
+        result = await hass.config_entries.flow.async_configure(
+            result["flow_id"],
+            user_input={
+                CONF_LOGIN_EMAIL: "new@d.c",
+                CONF_LOGIN_PASSWORD: "new_password",
+            },
+        )
+
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "reauth_confirm"
+    assert result["errors"] == {"base": "login_failed"}
+    assert config_entry.data[CONF_LOGIN_EMAIL] == MOCK_CONFIG_ALL[CONF_LOGIN_EMAIL]
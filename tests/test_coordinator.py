@@ -1,8 +1,18 @@
 """Test ferroamp_operation_settings coordinator."""
-from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+import asyncio
+from datetime import datetime, timedelta
+from time import monotonic
+from unittest.mock import AsyncMock, patch
+
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
 
 from homeassistant.const import MAJOR_VERSION, MINOR_VERSION
-from homeassistant.config_entries import ConfigEntryState
+from homeassistant.config_entries import SOURCE_REAUTH, ConfigEntryState
+from homeassistant.util import dt as dt_util
 
 from custom_components.ferroamp_operation_settings import (
     async_setup_entry,
@@ -12,10 +22,47 @@ from custom_components.ferroamp_operation_settings.coordinator import (
     FerroampOperationSettingsCoordinator,
 )
 from custom_components.ferroamp_operation_settings.const import (
+    BATTERY_DISCHARGE,
+    BATTERY_OFF,
+    CONF_AUTH_RATE_LIMIT,
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_POWER,
+    CONF_CONFIRM_WRITES,
+    CONF_CONFLICT_MODE,
+    CONF_CONTROLLER_SENSOR,
+    CONF_GRID_POWER_SENSOR,
+    CONFLICT_MODE_MERGE,
+    CONFLICT_MODE_REPORT,
+    CONF_LOAD_SENSOR,
+    CONF_PEAK_COUNT,
+    CONF_PV_FORECAST_SENSOR,
+    CONF_READ_RATE_LIMIT,
+    CONF_RECONCILE_INTERVAL,
+    CONF_SOC_RESERVE,
+    CONF_SOC_SENSOR,
+    DEFAULT_WRITE_RATE_LIMIT,
     DOMAIN,
+    MODE_DEFAULT,
+    MODE_PEAK_SHAVING,
+    GET_DATA_MAX_AGE,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+    STATUS_ACCEPTED,
+    STATUS_APPLIED,
+    STATUS_CONFLICT,
+    STATUS_FAILED,
+    STATUS_SUCCESS,
+)
+from custom_components.ferroamp_operation_settings.helpers.api import (
+    AUTH_FAILED_INVALID_CREDENTIALS,
+)
+from custom_components.ferroamp_operation_settings.helpers.rate_limiter import (
+    ENDPOINT_AUTH,
+    ENDPOINT_READ,
+    ENDPOINT_WRITE,
 )
 
-from tests.const import MOCK_CONFIG_ALL
+from tests.const import MOCK_CONFIG_ALL, MOCK_STORED_DATA
 
 # We can pass fixtures as defined in conftest.py to tell pytest to use the fixture
 # for a given test. We can also leverage fixtures and mocks that are available in
@@ -53,3 +100,673 @@ async def test_coordinator(hass):
     # Unload the entry and verify that the data has been removed
     assert await async_unload_entry(hass, config_entry)
     assert config_entry.entry_id not in hass.data[DOMAIN]
+
+
+async def test_coordinator_auth_failure(hass):
+    """Test that a terminal login failure starts a reauth flow."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test", title="none"
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+
+    # pylint: disable=protected-access
+    coordinator.api._auth_failure = AUTH_FAILED_INVALID_CREDENTIALS
+    # Do not reuse the configuration fetched during setup
+    coordinator._last_fetch = None
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.get_access_token",
+        return_value=None,
+    ):
+        await coordinator.get_data()
+        await hass.async_block_till_done()
+        assert not coordinator.last_update_success
+        assert coordinator.sensor_status.native_value == STATUS_FAILED
+        flows = hass.config_entries.flow.async_progress()
+        assert len(flows) == 1
+        assert flows[0]["context"]["source"] == SOURCE_REAUTH
+
+        await coordinator.update()
+        await hass.async_block_till_done()
+        # The reauth flow is not started twice
+        assert len(hass.config_entries.flow.async_progress()) == 1
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_coordinator_concurrent_get_data(hass):
+    """Test that concurrent and repeated reads share one request."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test", title="none"
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    # pylint: disable=protected-access
+    coordinator._last_fetch = None
+
+    async def slow_get_data():
+        await asyncio.sleep(0.01)
+        return MOCK_STORED_DATA
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_get_data",
+        side_effect=slow_get_data,
+    ) as async_get_data, patch(
+        "custom_components.ferroamp_operation_settings.coordinator.FerroampOperationSettingsCoordinator.update_entities",
+    ) as update_entities:
+        # Concurrent reads
+        await asyncio.gather(
+            coordinator.get_data(), coordinator.get_data(), coordinator.async_fetch()
+        )
+        assert async_get_data.call_count == 1
+        assert update_entities.call_count == 1
+
+        # A read within GET_DATA_MAX_AGE seconds uses the fetched configuration
+        await coordinator.get_data()
+        assert async_get_data.call_count == 1
+        assert update_entities.call_count == 2
+
+        # A later read fetches again
+        with patch(
+            "custom_components.ferroamp_operation_settings.coordinator.monotonic",
+            return_value=monotonic() + GET_DATA_MAX_AGE,
+        ):
+            await coordinator.get_data()
+        assert async_get_data.call_count == 2
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_coordinator_confirm_writes(hass):
+    """Test the read-back of an update."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={CONF_CONFIRM_WRITES: True},
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    await coordinator.update_entities()
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.coordinator.FerroampOperationSettingsCoordinator.async_sleep_local",
+        new_callable=AsyncMock,
+    ):
+        # The read-back configuration matches the update
+        await coordinator.update()
+        assert await coordinator.confirm_task
+        assert coordinator.sensor_status.native_value == STATUS_APPLIED
+        assert coordinator.get_metrics()["apply_latency"] is not None
+
+        # The read-back configuration does not match the update
+        await coordinator.number_upper_reference.async_set_native_value(90)
+        with patch(
+            "custom_components.ferroamp_operation_settings.coordinator.CONFIRM_TIMEOUT",
+            0.01,
+        ):
+            await coordinator.update()
+            assert not await coordinator.confirm_task
+        assert coordinator.sensor_status.native_value == STATUS_ACCEPTED
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_coordinator_overlapping_updates(hass):
+    """Test that only the update that was sent is applied and confirmed."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={CONF_CONFIRM_WRITES: True},
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    await coordinator.update_entities()
+
+    release = asyncio.Event()
+    written = []
+
+    async def slow_set_data(body):
+        await release.wait()
+        written.append(body["payload"]["battery"]["socRef"]["high"])
+        return True
+
+    confirmed = []
+
+    async def confirm(payload, start):
+        confirmed.append(payload["battery"]["socRef"]["high"])
+        await asyncio.Event().wait()
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        side_effect=slow_set_data,
+    ), patch.object(coordinator, "async_confirm", side_effect=confirm):
+        tasks = []
+        for value in (70, 80, 90):
+            await coordinator.number_upper_reference.async_set_native_value(value)
+            tasks.append(hass.async_create_task(coordinator.update()))
+            await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+        await asyncio.sleep(0)
+
+        # The superseded update reports the outcome of the write that replaced it
+        assert [result["sent"] for result in results] == [True, False, True]
+        assert all(result["updated"] for result in results)
+        assert all(result["status"] == STATUS_ACCEPTED for result in results)
+
+    # The update to 80 was superseded by the update to 90 before it was sent
+    assert written == [70, 90]
+    assert confirmed == [70, 90]
+    assert coordinator.data["emsConfig"]["data"]["battery"]["socRef"]["high"] == 90
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        side_effect=slow_set_data,
+    ), patch.object(coordinator, "async_confirm", side_effect=confirm):
+        # Concurrent settings report the update they were sent with
+        release.clear()
+        tasks = [
+            hass.async_create_task(
+                coordinator.async_apply_settings({"upper_reference": value})
+            )
+            for value in (60, 65)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        responses = await asyncio.gather(*tasks)
+        assert [response["updated"] for response in responses] == [True, True]
+        assert [response["status"] for response in responses] == [
+            STATUS_ACCEPTED,
+            STATUS_ACCEPTED,
+        ]
+
+    assert written[-1] == 65
+    assert not coordinator.confirm_task.done()
+    coordinator.confirm_task.cancel()
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_coordinator_optimistic_data(hass):
+    """Test that an accepted update is merged into the fetched configuration."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test", title="none"
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    await coordinator.update_entities()
+    data_version = coordinator.data_version
+
+    await coordinator.number_upper_reference.async_set_native_value(90)
+    await coordinator.update()
+    assert coordinator.data["emsConfig"]["data"]["battery"]["socRef"]["high"] == 90
+    assert coordinator.data_version == data_version + 1
+    assert coordinator.get_metrics()["data_optimistic"]
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_get_data",
+        return_value=MOCK_STORED_DATA,
+    ) as async_get_data:
+        # A read right after the update uses the merged configuration
+        assert await coordinator.async_fetch()
+        assert async_get_data.call_count == 0
+
+        # A fetched configuration that differs from the update is a conflict
+        # pylint: disable=protected-access
+        coordinator._last_fetch = None
+        assert await coordinator.async_fetch()
+        assert async_get_data.call_count == 1
+        assert coordinator.conflicts == 1
+        assert not coordinator.get_metrics()["data_optimistic"]
+        assert coordinator.data_version == data_version + 2
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_coordinator_conflict_report(hass):
+    """Test that an update is not sent if the configuration was changed elsewhere."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={CONF_CONFLICT_MODE: CONFLICT_MODE_REPORT},
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    await coordinator.update_entities()
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data:
+        # No changes elsewhere
+        await coordinator.update()
+        assert async_set_data.call_count == 1
+        assert coordinator.sensor_status.native_value == STATUS_SUCCESS
+
+        # A second update, before the first has been applied
+        await coordinator.update()
+        assert async_set_data.call_count == 2
+
+        # Changes elsewhere
+        with patch(
+            "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_get_data",
+            return_value=MOCK_STORED_DATA,
+        ):
+            await coordinator.update()
+        assert async_set_data.call_count == 2
+        assert coordinator.sensor_status.native_value == STATUS_CONFLICT
+        assert coordinator.conflicts == 1
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_coordinator_conflict_merge(hass):
+    """Test that an update is merged with changes made elsewhere."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={CONF_CONFLICT_MODE: CONFLICT_MODE_MERGE},
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    await coordinator.update_entities()
+    await coordinator.number_lower_reference.async_set_native_value(30)
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data, patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_get_data",
+        return_value=MOCK_STORED_DATA,
+    ):
+        await coordinator.update()
+        payload = async_set_data.call_args.args[0]["payload"]
+        # Changed in Home Assistant
+        assert payload["battery"]["socRef"]["low"] == 30
+        # Changed elsewhere
+        assert payload["battery"]["socRef"]["high"] == 95
+        assert payload["grid"]["thresholds"]["high"] == 5000
+        assert payload["mode"] == 2
+        assert coordinator.conflicts == 1
+
+        # The entities show the merged configuration
+        assert coordinator.select_mode.current_option == MODE_PEAK_SHAVING
+        assert coordinator.number_upper_reference.value == 95
+        assert coordinator.number_lower_reference.value == 30
+
+        # The remote configuration is not a conflict until the update is applied
+        await coordinator.update()
+        assert async_set_data.call_count == 2
+        assert coordinator.conflicts == 1
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_coordinator_reconcile(hass):
+    """Test that a drifted configuration is corrected."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={CONF_RECONCILE_INTERVAL: 10},
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    assert coordinator.reconciler is not None
+    assert coordinator.reconciler.interval == 600
+    await coordinator.update_entities()
+
+    # pylint: disable=protected-access
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data:
+        # No drift
+        coordinator._last_fetch = None
+        assert not await coordinator.async_reconcile()
+        assert async_set_data.call_count == 0
+
+        # Drift
+        coordinator._last_fetch = None
+        with patch(
+            "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_get_data",
+            return_value=MOCK_STORED_DATA,
+        ):
+            assert await coordinator.async_reconcile()
+        assert async_set_data.call_count == 1
+        payload = async_set_data.call_args.args[0]["payload"]
+        assert payload["battery"]["socRef"]["high"] == 100
+        assert payload["mode"] == 1
+
+    assert await async_unload_entry(hass, config_entry)
+    assert coordinator.reconciler.failures == 0
+
+
+async def test_coordinator_rate_limits(hass):
+    """Test that the rate limit options are applied per endpoint class and account."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={CONF_AUTH_RATE_LIMIT: 6, CONF_READ_RATE_LIMIT: 30},
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+
+    # Another config entry of the same account, with a lower read limit
+    MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={CONF_READ_RATE_LIMIT: 20},
+        entry_id="other",
+        title="other",
+    ).add_to_hass(hass)
+
+    with patch.object(coordinator.api.rate_limiter, "configure") as configure:
+        coordinator.apply_rate_limit()
+    assert configure.call_count == 3
+    limits = {call.args[0]: call.args[1] for call in configure.call_args_list}
+    assert limits == {
+        ENDPOINT_AUTH: 6 / 60,
+        ENDPOINT_READ: 20 / 60,
+        ENDPOINT_WRITE: DEFAULT_WRITE_RATE_LIMIT / 60,
+    }
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_coordinator_solar_planner(hass, freezer):
+    """Test that the socRef targets follow the PV forecast during the night."""
+    # Sunrise is at about 05:40 at the location of the tests
+    night = datetime(2024, 6, 1, 1, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    freezer.move_to(night - timedelta(hours=12))
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={
+            CONF_PV_FORECAST_SENSOR: "sensor.pv_tomorrow",
+            CONF_LOAD_SENSOR: "sensor.load_tomorrow",
+            CONF_SOC_SENSOR: "sensor.soc",
+            CONF_BATTERY_CAPACITY: 10.0,
+            CONF_SOC_RESERVE: 20,
+        },
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    assert coordinator.solar_profile is None
+    upper_reference = coordinator.number_upper_reference.value
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data:
+        # Nothing is applied during the day
+        hass.states.async_set("sensor.soc", "30")
+        hass.states.async_set("sensor.load_tomorrow", "12")
+        hass.states.async_set("sensor.pv_tomorrow", "5")
+        await hass.async_block_till_done()
+        assert coordinator.solar_profile is None
+        assert async_set_data.call_count == 0
+
+        # A cloudy day, applied at sunset
+        freezer.move_to(night)
+        async_fire_time_changed(hass, night)
+        await hass.async_block_till_done()
+        assert coordinator.solar_profile["upper_reference"] == 100
+        assert coordinator.solar_profile["lower_reference"] == 20
+        assert coordinator.get_metrics()["solar_night_charge"] == 7.0
+        assert async_set_data.call_count == 1
+
+        # A sunny day. Less is charged at night.
+        hass.states.async_set("sensor.pv_tomorrow", "17")
+        await hass.async_block_till_done()
+        assert coordinator.solar_profile["upper_reference"] < 100
+        payload = async_set_data.call_args.args[0]["payload"]
+        assert payload["battery"]["socRef"]["high"] == (
+            coordinator.solar_profile["upper_reference"]
+        )
+        assert payload["battery"]["socRef"]["low"] == 20
+        assert async_set_data.call_count == 2
+        computations = coordinator.solar_planner.computations
+
+        # Only the attributes are changed. Nothing is computed or written.
+        hass.states.async_set("sensor.pv_tomorrow", "17", {"updated": "now"})
+        await hass.async_block_till_done()
+        assert coordinator.solar_planner.computations == computations
+        assert async_set_data.call_count == 2
+
+        # Upper Reference is restored before sunrise
+        morning = night + timedelta(hours=4)
+        freezer.move_to(morning)
+        async_fire_time_changed(hass, morning)
+        await hass.async_block_till_done()
+        assert coordinator.solar_profile is None
+        assert async_set_data.call_count == 3
+        assert coordinator.number_upper_reference.value == upper_reference
+
+    assert await async_unload_entry(hass, config_entry)
+    assert coordinator.solar_profile is None
+
+
+async def test_coordinator_peak_tracker(hass, hass_storage, freezer):
+    """Test that the Discharge Threshold follows the power peaks of the month."""
+    start = datetime(2024, 1, 10, 12, 0, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    freezer.move_to(start)
+    hass_storage[f"{STORAGE_KEY}.test.peaks"] = {
+        "version": STORAGE_VERSION,
+        "minor_version": 1,
+        "key": f"{STORAGE_KEY}.test.peaks",
+        "data": {
+            "month": [2024, 1],
+            "hours": [
+                [(start - timedelta(hours=24)).isoformat(), 3000.0],
+                [(start - timedelta(hours=20)).isoformat(), 2000.0],
+                [(start - timedelta(hours=2)).isoformat(), 1000.0],
+            ],
+            "hour_start": None,
+            "energy": 0.0,
+            "covered": 0.0,
+            "last_time": None,
+        },
+    }
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={CONF_GRID_POWER_SENSOR: "sensor.grid_power", CONF_PEAK_COUNT: 2},
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    assert coordinator.peak_tracker.target(start) == 2000
+    await coordinator.select_mode.async_select_option(MODE_PEAK_SHAVING)
+    await coordinator.number_discharge_threshold.async_set_native_value(5000)
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data:
+        # A projected mean below the target is not shaved
+        hass.states.async_set("sensor.grid_power", "1000")
+        await hass.async_block_till_done()
+        assert async_set_data.call_count == 0
+
+        # A high load. The threshold is lowered to keep the hour at the target.
+        freezer.move_to(start + timedelta(minutes=10))
+        hass.states.async_set("sensor.grid_power", "4.0", {"unit_of_measurement": "kW"})
+        await hass.async_block_till_done()
+        assert coordinator.peak_tracker.projected(dt_util.now()) == 3500
+        assert coordinator.number_discharge_threshold.value == 2200
+        payload = async_set_data.call_args.args[0]["payload"]
+        assert payload["grid"]["thresholds"]["high"] == 2200
+
+        # Not changed again within the minimum interval
+        freezer.move_to(start + timedelta(minutes=12))
+        hass.states.async_set("sensor.grid_power", "5000")
+        await hass.async_block_till_done()
+        assert async_set_data.call_count == 1
+
+        freezer.move_to(start + timedelta(minutes=16))
+        hass.states.async_set("sensor.grid_power", "5001")
+        await hass.async_block_till_done()
+        assert coordinator.number_discharge_threshold.value == 1800
+        assert async_set_data.call_count == 2
+
+        # The projected mean is below the target again
+        freezer.move_to(start + timedelta(minutes=22))
+        hass.states.async_set("sensor.grid_power", "0")
+        await hass.async_block_till_done()
+        assert async_set_data.call_count == 2
+
+    # The state is stored
+    freezer.tick(timedelta(minutes=5))
+    await coordinator.async_apply_peak_tracker()
+    assert hass_storage[f"{STORAGE_KEY}.test.peaks"]["data"]["covered"] == 1320
+    assert await async_unload_entry(hass, config_entry)
+    assert coordinator.peak_tracker is None
+
+
+async def test_coordinator_reference_controller(hass):
+    """Test that the battery reference holds the grid power at the setpoint."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={
+            CONF_CONTROLLER_SENSOR: "sensor.fast_grid_power",
+            CONF_BATTERY_POWER: 3000,
+        },
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    await coordinator.select_mode.async_select_option(MODE_DEFAULT)
+    await coordinator.select_battery_power_mode.async_select_option(BATTERY_OFF)
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data:
+        hass.states.async_set("sensor.fast_grid_power", "1500")
+        await hass.async_block_till_done()
+        assert coordinator.select_battery_power_mode.current_option == BATTERY_DISCHARGE
+        assert coordinator.number_discharge_reference.value == 1500
+        payload = async_set_data.call_args.args[0]["payload"]
+        assert payload["battery"]["powerRef"]["discharge"] == 1500
+
+        # Not written again within the minimum interval
+        hass.states.async_set(
+            "sensor.fast_grid_power", "4.0", {"unit_of_measurement": "kW"}
+        )
+        await hass.async_block_till_done()
+        assert async_set_data.call_count == 1
+
+        # Only in Default mode
+        await coordinator.select_mode.async_select_option(MODE_PEAK_SHAVING)
+        hass.states.async_set("sensor.fast_grid_power", "2000")
+        await hass.async_block_till_done()
+        assert async_set_data.call_count == 1
+
+    metrics = coordinator.get_metrics()
+    assert metrics["controller_writes"] == 1
+    assert metrics["controller_held"] == 1
+    assert metrics["controller_write_rate"] == 1
+    assert metrics["controller_latency"] is not None
+    assert await async_unload_entry(hass, config_entry)
+    assert coordinator.reference_controller is None
@@ -1,24 +1,44 @@
 """Test ferroamp_operation_settings setup process."""
 
-from pytest_homeassistant_custom_component.common import MockConfigEntry
+from datetime import timedelta
+from unittest.mock import patch
+
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
 
 from homeassistant.const import MAJOR_VERSION, MINOR_VERSION
 from homeassistant.config_entries import ConfigEntryState
+from homeassistant.util import dt as dt_util
 
 from custom_components.ferroamp_operation_settings import (
     async_migrate_entry,
     async_reload_entry,
+    async_remove_entry,
     async_setup_entry,
     async_unload_entry,
 )
-from custom_components.ferroamp_operation_settings.const import DOMAIN
+from custom_components.ferroamp_operation_settings.const import (
+    CONF_LOGIN_PASSWORD,
+    DATA_SAVE_DELAY,
+    DOMAIN,
+    MODE_DEFAULT,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+)
 from custom_components.ferroamp_operation_settings.coordinator import (
     FerroampOperationSettingsCoordinator,
 )
+from custom_components.ferroamp_operation_settings.helpers.config_flow import (
+    FlowValidator,
+)
 
 from .const import (
     MOCK_CONFIG_ALL,
     MOCK_CONFIG_ALL_V1,
+    MOCK_OPTIONS_ALL,
+    MOCK_STORED_DATA,
 )
 
 
@@ -178,3 +198,111 @@ async def test_setup_new_integration_name(hass):
     assert await async_unload_entry(hass, config_entry)
     await hass.async_block_till_done()
     assert config_entry.entry_id not in hass.data[DOMAIN]
+
+
+async def test_setup_restores_stored_data(hass, hass_storage):
+    """Test that setup starts with the stored configuration."""
+    hass_storage[f"{STORAGE_KEY}.test"] = {
+        "version": STORAGE_VERSION,
+        "minor_version": 1,
+        "key": f"{STORAGE_KEY}.test",
+        "data": MOCK_STORED_DATA,
+    }
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test")
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    # The Ferroamp cloud can not be reached
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.get_access_token",
+        return_value=None,
+    ):
+        assert await async_setup_entry(hass, config_entry)
+        await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    assert coordinator.data == MOCK_STORED_DATA
+    assert not coordinator.last_update_success
+
+    # Get data replaces and stores the configuration, after a delay
+    await coordinator.get_data()
+    assert coordinator.data["emsConfig"]["data"]["mode"] == 1
+    assert hass_storage[f"{STORAGE_KEY}.test"]["data"] == MOCK_STORED_DATA
+    async_fire_time_changed(
+        hass, dt_util.utcnow() + timedelta(seconds=DATA_SAVE_DELAY + 1)
+    )
+    await hass.async_block_till_done()
+    assert hass_storage[f"{STORAGE_KEY}.test"]["data"] == coordinator.data
+    assert coordinator.select_mode.current_option == MODE_DEFAULT
+
+    assert await async_unload_entry(hass, config_entry)
+    await hass.async_block_till_done()
+
+    # The stored configuration is removed with the entry
+    await async_remove_entry(hass, config_entry)
+    assert f"{STORAGE_KEY}.test" not in hass_storage
+
+
+async def test_setup_reuses_validated_client(hass):
+    """Test that setup reuses the client that was validated in the config flow."""
+    assert await FlowValidator.validate_step_user(hass, MOCK_CONFIG_ALL, "flow") is None
+
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test")
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_get_data",
+    ) as async_get_data:
+        assert await async_setup_entry(hass, config_entry)
+        await hass.async_block_till_done()
+    # No new login and no new fetch
+    async_get_data.assert_not_called()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    assert coordinator.data is not None
+    assert coordinator.last_update_success
+
+    assert await async_unload_entry(hass, config_entry)
+    await hass.async_block_till_done()
+
+
+async def test_reload_entry_keeps_client(hass):
+    """Test that only changed login information rebuilds the client."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test")
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+
+    # A new title is applied in place
+    hass.config_entries.async_update_entry(config_entry, title="New title")
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN][config_entry.entry_id] is coordinator
+    device = next(iter(hass.data["device_registry"].devices.values()))
+    assert device.name_by_user == "New title" or device.name == "New title"
+
+    # Same login information in the options
+    hass.config_entries.async_update_entry(config_entry, options=MOCK_OPTIONS_ALL)
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN][config_entry.entry_id] is coordinator
+
+    # New login information
+    hass.config_entries.async_update_entry(
+        config_entry, options={**MOCK_OPTIONS_ALL, CONF_LOGIN_PASSWORD: "new"}
+    )
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN][config_entry.entry_id] is not coordinator
+    assert isinstance(
+        hass.data[DOMAIN][config_entry.entry_id], FerroampOperationSettingsCoordinator
+    )
+
+    assert await async_unload_entry(hass, config_entry)
+    await hass.async_block_till_done()
@@ -0,0 +1,470 @@
+"""Test ferroamp_operation_settings services."""
+
+from datetime import timedelta
+from unittest.mock import patch
+
+import numpy as np
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import MAJOR_VERSION, MINOR_VERSION
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from custom_components.ferroamp_operation_settings import (
+    async_setup_entry,
+    async_unload_entry,
+)
+from custom_components.ferroamp_operation_settings.coordinator import (
+    FerroampOperationSettingsCoordinator,
+)
+from custom_components.ferroamp_operation_settings.const import (
+    BATTERY_CHARGE,
+    BATTERY_DISCHARGE,
+    BATTERY_OFF,
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_POWER,
+    CONF_GRID_POWER_SENSOR,
+    CONF_PRICE_SENSOR,
+    CONF_SOC_SENSOR,
+    CONF_SYSTEM_ID,
+    DOMAIN,
+    MODE_SELF_CONSUMPTION,
+)
+from custom_components.ferroamp_operation_settings.services import (
+    SERVICE_APPLY_SETTINGS,
+    SERVICE_FLEET,
+    SERVICE_OPTIMIZE_THRESHOLDS,
+    SERVICE_PLAN_PRICES,
+    SERVICE_SET_SCHEDULE,
+    SERVICE_SIMULATE,
+)
+
+from .const import MOCK_CONFIG_ALL
+
+
+# pylint: disable=unused-argument
+async def test_set_schedule(hass, hass_storage):
+    """Test the set_schedule service."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test", title="none"
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    assert coordinator.schedule_runner is None
+
+    profile = {
+        "mode": MODE_SELF_CONSUMPTION,
+        "battery_power_mode": BATTERY_CHARGE,
+        "upper_reference": 90,
+        "limit_export": True,
+    }
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data:
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_SET_SCHEDULE,
+            {"slots": [{"start": "00:00", "end": "00:00", "profile": profile}]},
+            blocking=True,
+        )
+        await hass.async_block_till_done()
+
+        # The current profile is written at once
+        assert async_set_data.call_count == 1
+        payload = async_set_data.call_args.args[0]["payload"]
+        assert payload["mode"] == 3
+        assert payload["battery"]["socRef"]["high"] == 90
+        assert payload["grid"]["limitExport"] is True
+        assert coordinator.schedule_runner is not None
+        assert coordinator.get_metrics()["schedule_next_transition"] is not None
+        assert hass_storage[f"{DOMAIN}.test.schedule"]["data"][0]["start"] == "00:00"
+
+        # An empty list removes the schedule
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_SET_SCHEDULE,
+            {"config_entry_id": "test", "slots": []},
+            blocking=True,
+        )
+        assert coordinator.schedule_runner is None
+
+        with pytest.raises(HomeAssistantError):
+            await hass.services.async_call(
+                DOMAIN,
+                SERVICE_SET_SCHEDULE,
+                {"config_entry_id": "unknown", "slots": []},
+                blocking=True,
+            )
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_plan_prices(hass, hass_storage):
+    """Test the plan_prices service."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={
+            CONF_PRICE_SENSOR: "sensor.nordpool",
+            CONF_SOC_SENSOR: "sensor.soc",
+            CONF_BATTERY_CAPACITY: 10.0,
+            CONF_BATTERY_POWER: 5000.0,
+        },
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+
+    with pytest.raises(HomeAssistantError):
+        await hass.services.async_call(DOMAIN, SERVICE_PLAN_PRICES, {}, blocking=True)
+
+    # Cheap now, expensive in two hours
+    start = dt_util.now().replace(minute=0, second=0, microsecond=0)
+    hass.states.async_set(
+        "sensor.nordpool",
+        "1.0",
+        {
+            "raw_today": [
+                {"start": (start + timedelta(hours=hour)).isoformat(), "value": price}
+                for hour, price in enumerate([0.5, 0.6, 4.0, 5.0])
+            ]
+        },
+    )
+    hass.states.async_set("sensor.soc", "50")
+    await coordinator.number_lower_reference.async_set_native_value(50)
+    await coordinator.number_upper_reference.async_set_native_value(100)
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data:
+        plan = await coordinator.async_plan_prices(apply=False)
+        assert [slot["action"] for slot in plan["slots"]] == [
+            BATTERY_CHARGE,
+            BATTERY_OFF,
+            BATTERY_OFF,
+            BATTERY_DISCHARGE,
+        ]
+        assert plan["slots"][1]["soc"] == 100.0
+        assert coordinator.plan_runner is None
+
+        response = await hass.services.async_call(
+            DOMAIN,
+            SERVICE_PLAN_PRICES,
+            {"apply": False},
+            blocking=True,
+            return_response=True,
+        )
+        assert response == plan
+        assert coordinator.plan_runner is None
+
+        await hass.services.async_call(DOMAIN, SERVICE_PLAN_PRICES, {}, blocking=True)
+        await hass.async_block_till_done()
+
+        # The current step is written at once
+        assert async_set_data.call_count == 1
+        payload = async_set_data.call_args.args[0]["payload"]
+        assert payload["battery"]["powerRef"]["charge"] == 5000
+        assert coordinator.plan_runner is not None
+        assert coordinator.get_metrics()["plan_next_transition"] is not None
+
+    assert await async_unload_entry(hass, config_entry)
+    assert coordinator.plan_runner is None
+
+
+async def test_simulate(hass, tmp_path):
+    """Test the simulate service."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={CONF_BATTERY_CAPACITY: 10.0, CONF_SOC_SENSOR: "sensor.soc"},
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+
+    path = tmp_path / "data.csv"
+    path.write_text(
+        "time,load,pv\n"
+        "2024-06-01T12:00:00+00:00,6000,0\n"
+        "2024-06-01T12:01:00+00:00,6000,0\n"
+        "2024-06-01T12:02:00+00:00,1000,0\n",
+        encoding="utf-8",
+    )
+
+    # The file must be in an allowed directory
+    with pytest.raises(HomeAssistantError):
+        await hass.services.async_call(
+            DOMAIN, SERVICE_SIMULATE, {"file": str(path)}, blocking=True
+        )
+    hass.config.allowlist_external_dirs = {str(tmp_path)}
+
+    hass.states.async_set("sensor.soc", "50")
+    await coordinator.number_lower_reference.async_set_native_value(10)
+    await coordinator.number_upper_reference.async_set_native_value(90)
+    result = await coordinator.async_simulate(
+        str(path),
+        {
+            "mode": 2,
+            "battery": {"powerRef": {"discharge": 2000, "charge": 2000}},
+            "grid": {"thresholds": {"high": 5000, "low": 0}},
+        },
+    )
+    assert result["grid_peak"] == 5000
+    assert result["discharged"] == pytest.approx(1000 * 2 / 60 / 1000, abs=0.01)
+    assert result["soc_end"] == result["soc_min"] < 50.0
+
+    # Less than an hour of data has no hourly state of charge
+    assert result["soc_hourly"] == []
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_SIMULATE,
+        {"file": str(path)},
+        blocking=True,
+        return_response=True,
+    )
+    assert response["soc_min"] <= response["soc_end"] <= response["soc_max"]
+    assert response["soc_hourly"] == []
+
+    with pytest.raises(HomeAssistantError):
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_SIMULATE,
+            {"file": str(tmp_path / "none.csv")},
+            blocking=True,
+        )
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_optimize_thresholds(hass):
+    """Test the optimize_thresholds service."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=MOCK_CONFIG_ALL,
+        options={
+            CONF_BATTERY_CAPACITY: 10.0,
+            CONF_GRID_POWER_SENSOR: "sensor.grid_power",
+        },
+        entry_id="test",
+        title="none",
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    await coordinator.number_discharge_reference.async_set_native_value(3000)
+    await coordinator.number_charge_reference.async_set_native_value(3000)
+    await coordinator.number_lower_reference.async_set_native_value(10)
+    await coordinator.number_upper_reference.async_set_native_value(100)
+
+    # A peak of 5000 W during two hours each evening
+    minutes = np.arange(7 * 1440)
+    grid = np.where((minutes % 1440 >= 1020) & (minutes % 1440 < 1140), 5000.0, 500.0)
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.coordinator.async_read_power_history",
+        return_value=grid,
+    ) as read_history, patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data:
+        result = await coordinator.async_optimize_thresholds(weeks=1)
+        assert read_history.call_args.args[1] == "sensor.grid_power"
+        assert result["baseline_peak"] == 5000
+        assert result["peak"] < 5000
+        assert async_set_data.call_count == 0
+
+        response = await hass.services.async_call(
+            DOMAIN,
+            SERVICE_OPTIMIZE_THRESHOLDS,
+            {"weeks": 1, "apply": True},
+            blocking=True,
+            return_response=True,
+        )
+        assert response == result
+        assert async_set_data.call_count == 1
+        assert coordinator.number_discharge_threshold.value == (
+            result["discharge_threshold"]
+        )
+        assert coordinator.number_charge_threshold.value == result["charge_threshold"]
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.coordinator.async_read_power_history",
+        return_value=np.full(100, np.nan),
+    ), pytest.raises(HomeAssistantError):
+        await coordinator.async_optimize_thresholds()
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_apply_settings(hass):
+    """Test the apply_settings service."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data=MOCK_CONFIG_ALL, entry_id="test", title="none"
+    )
+    if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+        config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+    config_entry.add_to_hass(hass)
+
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+    coordinator: FerroampOperationSettingsCoordinator = hass.data[DOMAIN][
+        config_entry.entry_id
+    ]
+    profile = {
+        "mode": MODE_SELF_CONSUMPTION,
+        "battery_power_mode": BATTERY_CHARGE,
+        "charge_reference": 2500,
+        "upper_reference": 90,
+        "limit_export": True,
+    }
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data:
+        response = await hass.services.async_call(
+            DOMAIN,
+            SERVICE_APPLY_SETTINGS,
+            profile,
+            blocking=True,
+            return_response=True,
+        )
+        assert async_set_data.call_count == 1
+        payload = async_set_data.call_args.args[0]["payload"]
+        assert payload["mode"] == 3
+        assert payload["battery"]["socRef"]["high"] == 90
+        assert payload["grid"]["limitExport"] is True
+        assert coordinator.number_charge_reference.value == 2500
+        assert response["updated"] is True
+        assert response["changed"]["upper_reference"] == 90
+        assert response["duration"] >= 0
+
+        # Only the changed settings are applied, and nothing is sent without changes
+        response = await hass.services.async_call(
+            DOMAIN,
+            SERVICE_APPLY_SETTINGS,
+            profile,
+            blocking=True,
+            return_response=True,
+        )
+        assert async_set_data.call_count == 1
+        assert response == {
+            "changed": {},
+            "updated": False,
+            "status": None,
+            "duration": 0.0,
+        }
+        response = await hass.services.async_call(
+            DOMAIN,
+            SERVICE_APPLY_SETTINGS,
+            {**profile, "upper_reference": 95},
+            blocking=True,
+            return_response=True,
+        )
+        assert async_set_data.call_count == 2
+        assert response["changed"] == {"upper_reference": 95}
+
+        # Values out of range are rejected
+        with pytest.raises(HomeAssistantError):
+            await hass.services.async_call(
+                DOMAIN,
+                SERVICE_APPLY_SETTINGS,
+                {"lower_reference": 2},
+                blocking=True,
+            )
+        assert async_set_data.call_count == 2
+
+    assert await async_unload_entry(hass, config_entry)
+
+
+async def test_fleet(hass):
+    """Test the fleet service."""
+    config_entries = [
+        MockConfigEntry(
+            domain=DOMAIN,
+            data={**MOCK_CONFIG_ALL, CONF_SYSTEM_ID: system_id},
+            entry_id=entry_id,
+            title=entry_id,
+        )
+        for entry_id, system_id in (("test", 1234), ("test2", 1235))
+    ]
+    for config_entry in config_entries:
+        if MAJOR_VERSION > 2024 or (MAJOR_VERSION == 2024 and MINOR_VERSION >= 7):
+            config_entry.mock_state(hass=hass, state=ConfigEntryState.LOADED)
+        config_entry.add_to_hass(hass)
+        assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+
+    with patch(
+        "custom_components.ferroamp_operation_settings.helpers.api.FerroampApiClient.async_set_data",
+        return_value=True,
+    ) as async_set_data:
+        response = await hass.services.async_call(
+            DOMAIN,
+            SERVICE_FLEET,
+            {
+                "config_entry_ids": ["test", "test2", "unknown"],
+                "profile": {"mode": MODE_SELF_CONSUMPTION, "upper_reference": 90},
+            },
+            blocking=True,
+            return_response=True,
+        )
+        assert async_set_data.call_count == 2
+        assert response["succeeded"] == 2
+        assert response["failed"] == 1
+        assert response["systems"]["test2"]["result"]["changed"] == {
+            "mode": MODE_SELF_CONSUMPTION,
+            "upper_reference": 90,
+        }
+        assert response["systems"]["test"]["latency"] >= 0
+        assert "not loaded" in response["systems"]["unknown"]["error"]
+
+        # Without a profile, the settings of all systems are read
+        response = await hass.services.async_call(
+            DOMAIN, SERVICE_FLEET, {}, blocking=True, return_response=True
+        )
+        assert async_set_data.call_count == 2
+        assert set(response["systems"]) == {"test", "test2"}
+        assert response["succeeded"] == 2
+        # Including the accepted update
+        settings = response["systems"]["test"]["result"]
+        assert settings["mode"] == MODE_SELF_CONSUMPTION
+        assert settings["upper_reference"] == 90
+
+    for config_entry in config_entries:
+        assert await async_unload_entry(hass, config_entry)